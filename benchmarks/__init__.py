@@ -0,0 +1,7 @@
+"""
+Performance benchmarks of the TicTacToe game engines and players
+
+Run them from the root of the project with:
+
+    python -m benchmarks.run_benchmarks --output results.json --baseline baseline.json
+"""
@@ -0,0 +1,110 @@
+"""
+The benchmarks of the game engine: the cost of the winning line check
+across a grid of board and winning line sizes
+"""
+from __future__ import print_function
+
+import random
+import timeit
+
+from games import TicTacToeGame
+from players import TicTacToeComputerRandom
+
+from .benchmark_results import make_metric
+
+
+def fill_board(game, rng):
+    """
+    Fill half of the seats of the board of a game with random moves of both players
+
+    @param game: the instance of TicTacToeGame
+    @param rng: the random number generator
+    @return: a list with the row and column of every filled seat
+    """
+    seats = [(row, col) for row in range(game.board_size) for col in range(game.board_size)]
+    rng.shuffle(seats)
+    seats = seats[:len(seats) // 2]
+    for idx, (row, col) in enumerate(seats):
+        game.board.set_seat(idx % 2, row, col)
+        if game.bitboard is not None:
+            game.bitboard.set_seat(idx % 2, row, col)
+    return seats
+
+
+def benchmark_win_check(board_sizes, num_of_calls, num_of_repeats=3, seed=0):
+    """
+    Measure the cost of the winning line check after a move, for both engines.
+    For every board size, all the winning line sizes from 3 to the board size are measured.
+    The best of the repeats is kept, as the slower ones are noise of the machine.
+
+    @param board_sizes: a list with the board sizes
+    @param num_of_calls: the number of checks per board and winning line size
+    @param num_of_repeats: the number of times the checks are repeated
+    @param seed: the random seed of the filled boards
+    @return: a dictionary with the metrics
+    """
+    results = {}
+    players = (TicTacToeComputerRandom(), TicTacToeComputerRandom())
+    for board_size in board_sizes:
+        for win_size in range(3, board_size + 1):
+            for engine in (TicTacToeGame.ENGINE_LIST, TicTacToeGame.ENGINE_BITBOARD):
+                game = TicTacToeGame(players[0], players[1], board_size=board_size,
+                                     win_size=win_size, be_verbose=False, engine=engine)
+                seats = fill_board(game, random.Random(seed))
+                if engine == TicTacToeGame.ENGINE_LIST:
+                    # the check of the list engine is private to the game
+                    have_we_a_winner = game._TicTacToeGame__have_we_a_winner
+                    checks = [(have_we_a_winner, (x,)) for x in seats]
+                else:
+                    have_we_a_winner = game.bitboard.have_we_a_winner
+                    checks = [(have_we_a_winner, (idx % 2, row, col))
+                              for idx, (row, col) in enumerate(seats)]
+                num_of_rounds = max(num_of_calls // len(checks), 1)
+                elapsed_time = None
+                for _ in range(num_of_repeats):
+                    start_time = timeit.default_timer()
+                    for _ in range(num_of_rounds):
+                        for check, args in checks:
+                            check(*args)
+                    repeat_time = timeit.default_timer() - start_time
+                    if elapsed_time is None or repeat_time < elapsed_time:
+                        elapsed_time = repeat_time
+                name = 'win_check/{}/{}x{}-win{}/ns_per_call'.format(engine, board_size,
+                                                                     board_size, win_size)
+                results[name] = make_metric(elapsed_time / (num_of_rounds * len(checks)) * 1e9,
+                                            'ns', False)
+    return results
+
+
+def benchmark_early_draw(board_sizes, num_of_games, seed=0):
+    """
+    Measure the length and the cost of the games of two random players, with and without
+    the early draw detection of the game engine. The winning line size is the board size,
+    so most games end in a draw.
+
+    @param board_sizes: a list with the board sizes
+    @param num_of_games: the number of games per board size and detection mode
+    @param seed: the random seed of the games
+    @return: a dictionary with the metrics
+    """
+    results = {}
+    players = (TicTacToeComputerRandom(), TicTacToeComputerRandom())
+    for board_size in board_sizes:
+        for early_draw in (False, True):
+            random.seed(seed)
+            num_of_moves = 0
+            start_time = timeit.default_timer()
+            for _ in range(num_of_games):
+                game = TicTacToeGame(players[0], players[1], board_size=board_size,
+                                     win_size=board_size, be_verbose=False,
+                                     engine=TicTacToeGame.ENGINE_BITBOARD, early_draw=early_draw)
+                game.play()
+                num_of_moves += game.num_of_moves
+            elapsed_time = timeit.default_timer() - start_time
+            name = 'early_draw/{}/{}x{}-win{}'.format('on' if early_draw else 'off', board_size,
+                                                     board_size, board_size)
+            results[name + '/moves_per_game'] = make_metric(num_of_moves / float(num_of_games),
+                                                            'moves', False)
+            results[name + '/us_per_game'] = make_metric(elapsed_time / num_of_games * 1e6,
+                                                         'us', False)
+    return results
@@ -0,0 +1,151 @@
+"""
+The benchmarks of the players: the throughput of every pairing
+and the latency of every player's moves
+"""
+from __future__ import print_function
+
+import timeit
+
+from games import TicTacToeGame
+from players import get_player_class
+from players.abstract_tictactoe_player import AbstractTicTacToePlayer
+
+from .benchmark_results import make_metric
+
+
+class TicTacToeTimedPlayer(AbstractTicTacToePlayer):
+    """
+    A wrapper of a player that records the latency of every move
+    """
+
+
+    def __init__(self, player):
+        """
+        Constructor
+
+        @param player: the instance of the wrapped player
+        """
+        self.player = player
+        self.move_latencies = []
+        self.player_id = None
+
+
+    def end_of_game(self, winning_player_id):
+        """
+        End of game.
+
+        @param winning_player_id: the winning player ID (symbol), given by the game engine
+        """
+        self.player.end_of_game(winning_player_id)
+
+
+    def get_next_move(self, game_state):
+        """
+        Get the next move of the wrapped player and record its latency
+
+        @param game_state: the current game state given by the game engine
+        @return: a list with the x and y values of the selected seat
+        """
+        start_time = timeit.default_timer()
+        next_move = self.player.get_next_move(game_state)
+        self.move_latencies.append(timeit.default_timer() - start_time)
+        return next_move
+
+
+    def set_player_id(self, player_id):
+        """
+        Set the player's symbol in game
+
+        @param player_id: the symbol used by the player
+        """
+        self.player_id = player_id
+        self.player.set_player_id(player_id)
+
+
+def get_percentile(values, percentile):
+    """
+    Get a percentile of a list of values (nearest rank)
+
+    @param values: a non-empty list with the values
+    @param percentile: the percentile [0, 100]
+    @return: the value
+    """
+    values = sorted(values)
+    rank = int(round(percentile / 100. * (len(values) - 1)))
+    return values[rank]
+
+
+def play_games(player_names, num_of_games, engine):
+    """
+    Play games between two new instances of the players, swapping their seats after every game
+
+    @param player_names: a tuple with the registered names of the two players
+    @param num_of_games: the number of games
+    @param engine: the engine used by the game
+    @return: a tuple with the timed players and the elapsed time in seconds
+    """
+    players = [TicTacToeTimedPlayer(get_player_class(x)()) for x in player_names]
+    timed_players = list(players)
+    start_time = timeit.default_timer()
+    for _ in range(num_of_games):
+        TicTacToeGame(players[0], players[1], be_verbose=False, engine=engine).play()
+        players.reverse()
+    return timed_players, timeit.default_timer() - start_time
+
+
+def benchmark_pairings(player_names, num_of_games, engine):
+    """
+    Measure the games and moves per second of every pairing of the players
+
+    @param player_names: a list with the registered names of the players
+    @param num_of_games: the number of games per pairing
+    @param engine: the engine used by the game
+    @return: a tuple with a dictionary with the metrics and a dictionary
+             with the reason of every skipped pairing
+    """
+    results = {}
+    skipped = {}
+    for p1_name in player_names:
+        for p2_name in player_names:
+            name = 'pairing/{}-vs-{}'.format(p1_name, p2_name)
+            try:
+                timed_players, elapsed_time = play_games((p1_name, p2_name), num_of_games, engine)
+            except Exception as e:
+                skipped[name] = '{}: {}'.format(type(e).__name__, e)
+                continue
+            num_of_moves = sum(len(x.move_latencies) for x in timed_players)
+            results[name + '/games_per_sec'] = make_metric(num_of_games / elapsed_time,
+                                                           'games/s', True)
+            results[name + '/moves_per_sec'] = make_metric(num_of_moves / elapsed_time,
+                                                           'moves/s', True)
+    return results, skipped
+
+
+def benchmark_move_latency(player_names, num_of_games, engine, opponent_name='Random'):
+    """
+    Measure the latency percentiles of the moves of every player,
+    playing against the same opponent
+
+    @param player_names: a list with the registered names of the players
+    @param num_of_games: the number of games per player
+    @param engine: the engine used by the game
+    @param opponent_name: the registered name of the opponent
+    @return: a tuple with a dictionary with the metrics and a dictionary
+             with the reason of every skipped player
+    """
+    results = {}
+    skipped = {}
+    for player_name in player_names:
+        name = 'latency/{}'.format(player_name)
+        try:
+            timed_players = play_games((player_name, opponent_name), num_of_games, engine)[0]
+        except Exception as e:
+            skipped[name] = '{}: {}'.format(type(e).__name__, e)
+            continue
+        move_latencies = timed_players[0].move_latencies
+        for percentile in (50, 90, 99):
+            # the tail of a few hundred moves is mostly noise, so it is informational
+            results['{}/p{}_us'.format(name, percentile)] = \
+                make_metric(get_percentile(move_latencies, percentile) * 1e6, 'us',
+                            False if percentile < 99 else None)
+    return results, skipped
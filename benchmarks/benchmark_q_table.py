@@ -0,0 +1,36 @@
+"""
+The benchmarks of the tabular players: the memory of their Q-Values per state
+"""
+from __future__ import print_function
+
+from games import TicTacToeGame
+from players import TicTacToeComputerNaive, TicTacToeComputerQLearning, TicTacToeComputerRandom
+
+from .benchmark_results import make_metric
+
+
+def benchmark_q_table_memory(num_of_games, board_size=3, win_size=3):
+    """
+    Measure the memory of the Q-Values per stored key of the tabular players,
+    after training them against the random player
+
+    @param num_of_games: the number of training games
+    @param board_size: the number of rows and columns of the board
+    @param win_size: the winning line size
+    @return: a dictionary with the metrics
+    """
+    results = {}
+    for player_class in (TicTacToeComputerNaive, TicTacToeComputerQLearning):
+        players = [player_class(), TicTacToeComputerRandom()]
+        for _ in range(num_of_games):
+            TicTacToeGame(players[0], players[1], board_size=board_size, win_size=win_size,
+                          be_verbose=False).play()
+            players.reverse()
+        q_values = [x for x in players if isinstance(x, player_class)][0].q_values
+        name = 'q_table/{}/{}x{}-win{}'.format(player_class.__name__, board_size, board_size,
+                                               win_size)
+        results[name + '/bytes_per_state'] = \
+            make_metric(q_values.get_memory_size() / float(len(q_values)), 'bytes', False)
+        # fewer states (e.g. with symmetries) is not a regression, so it is informational
+        results[name + '/states'] = make_metric(len(q_values), 'states', None)
+    return results
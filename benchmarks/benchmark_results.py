@@ -0,0 +1,100 @@
+"""
+The results of the benchmarks: the metrics, their JSON files
+and the comparison against a baseline
+"""
+from __future__ import print_function
+
+import json
+import platform
+import statistics
+import sys
+import time
+
+
+def make_metric(value, unit, higher_is_better):
+    """
+    Make a metric of a benchmark
+
+    @param value: the measured value
+    @param unit: the unit of the value, e.g. 'games/s'
+    @param higher_is_better: boolean value, True if a higher value is an improvement,
+                             or None for an informational metric, which never regresses
+    @return: a dictionary with the metric
+    """
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def combine_results(runs):
+    """
+    Combine the metrics of repeated runs into their medians, so that a single
+    noisy run of a metric neither fails nor passes the comparison with a baseline
+
+    @param runs: a list with a dictionary with the metrics of every run
+    @return: a dictionary with the metrics, where the value of every metric
+             is the median of its runs and its 'samples' are the values of the runs
+    """
+    results = {}
+    for run in runs:
+        for name, metric in run.items():
+            if name not in results:
+                results[name] = dict(metric, samples=[])
+            results[name]['samples'].append(metric['value'])
+    for metric in results.values():
+        metric['value'] = statistics.median(metric['samples'])
+    return results
+
+
+def compare_results(results, baseline, threshold):
+    """
+    Compare the metrics of a run against the ones of a baseline run.
+    A metric regresses when it is worse than the baseline by more than the threshold
+    (the informational metrics are not compared).
+
+    @param results: a dictionary with the metrics of the run
+    @param baseline: a dictionary with the metrics of the baseline run
+    @param threshold: the allowed relative difference, e.g. 0.1 for 10%
+    @return: a list with a tuple (name, baseline value, value, relative change)
+             for every regressed metric
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        metric = results[name]
+        if metric['higher_is_better'] is None:
+            continue
+        baseline_value = baseline[name]['value']
+        if not baseline_value:
+            continue
+        change = (metric['value'] - baseline_value) / float(baseline_value)
+        if not metric['higher_is_better']:
+            change = -change
+        if change < -threshold:
+            regressions.append((name, baseline_value, metric['value'], change))
+    return regressions
+
+
+def load_results(path):
+    """
+    Load the metrics of a run from a JSON file written by save_results
+
+    @param path: the path of the file
+    @return: a dictionary with the metrics
+    """
+    with open(path) as results_file:
+        return json.load(results_file)['metrics']
+
+
+def save_results(path, results):
+    """
+    Save the metrics of a run into a JSON file, along with the details of the machine
+
+    @param path: the path of the file
+    @param results: a dictionary with the metrics
+    """
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python': sys.version.split()[0],
+              'platform': platform.platform(),
+              'metrics': results}
+    with open(path, 'w') as results_file:
+        json.dump(report, results_file, indent=2, sort_keys=True)
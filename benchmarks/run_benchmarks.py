@@ -0,0 +1,163 @@
+"""
+Run the benchmarks, write their results as JSON and
+compare them against the results of a baseline run
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+from games import TicTacToeGame
+from players import get_player_names
+
+from .benchmark_engine import benchmark_early_draw, benchmark_win_check
+from .benchmark_players import benchmark_move_latency, benchmark_pairings
+from .benchmark_q_table import benchmark_q_table_memory
+from .benchmark_results import combine_results, compare_results, load_results, save_results
+
+
+def run_benchmarks(player_names, num_of_games, engine, board_sizes, num_of_calls,
+                   num_of_training_games, num_of_repeats=5):
+    """
+    Run all the benchmarks, repeatedly, and combine the runs into the medians of the metrics
+
+    @param player_names: a list with the registered names of the benchmarked players
+    @param num_of_games: the number of games per pairing and per latency measurement
+    @param engine: the engine used by the games
+    @param board_sizes: a list with the board sizes of the winning line check
+                        and of the early draw detection
+    @param num_of_calls: the number of winning line checks per board and winning line size
+    @param num_of_training_games: the number of training games of the tabular players
+    @param num_of_repeats: the number of runs of the benchmarks
+    @return: a dictionary with the metrics
+    """
+    runs = []
+    for repeat in range(num_of_repeats):
+        print("Run {} of {}".format(repeat + 1, num_of_repeats))
+        runs.append(run_benchmarks_once(player_names, num_of_games, engine, board_sizes,
+                                        num_of_calls, num_of_training_games))
+    return combine_results(runs)
+
+
+def run_benchmarks_once(player_names, num_of_games, engine, board_sizes, num_of_calls,
+                        num_of_training_games):
+    """
+    Run all the benchmarks once
+
+    @param player_names: a list with the registered names of the benchmarked players
+    @param num_of_games: the number of games per pairing and per latency measurement
+    @param engine: the engine used by the games
+    @param board_sizes: a list with the board sizes of the winning line check
+                        and of the early draw detection
+    @param num_of_calls: the number of winning line checks per board and winning line size
+    @param num_of_training_games: the number of training games of the tabular players
+    @return: a dictionary with the metrics
+    """
+    results = {}
+    print("Benchmarking the pairings of {}...".format(', '.join(player_names)))
+    pairing_results, skipped = benchmark_pairings(player_names, num_of_games, engine)
+    results.update(pairing_results)
+    print("Benchmarking the move latency...")
+    latency_results, latency_skipped = benchmark_move_latency(player_names, num_of_games, engine)
+    results.update(latency_results)
+    skipped.update(latency_skipped)
+    print("Benchmarking the winning line check...")
+    results.update(benchmark_win_check(board_sizes, num_of_calls))
+    print("Benchmarking the early draw detection...")
+    results.update(benchmark_early_draw(board_sizes, num_of_games))
+    print("Benchmarking the Q-Values memory...")
+    results.update(benchmark_q_table_memory(num_of_training_games))
+    for name in sorted(skipped):
+        print("Skipped {} ({})".format(name, skipped[name]))
+    return results
+
+
+def print_results(results):
+    """
+    Print the metrics
+
+    @param results: a dictionary with the metrics
+    """
+    for name in sorted(results):
+        print("{:<60} {:>14.2f} {}".format(name, results[name]['value'], results[name]['unit']))
+
+
+def main(player_names, num_of_games, engine, board_sizes, num_of_calls, num_of_training_games,
+         output=None, baseline=None, threshold=0.1, num_of_repeats=5):
+    results = run_benchmarks(player_names, num_of_games, engine, board_sizes, num_of_calls,
+                             num_of_training_games, num_of_repeats)
+    print_results(results)
+    if output:
+        save_results(output, results)
+        print("The results are written to {}".format(output))
+    if baseline:
+        if not os.path.exists(baseline):
+            print("No baseline found at {}".format(baseline))
+            return 0
+        regressions = compare_results(results, load_results(baseline), threshold)
+        for name, baseline_value, value, change in regressions:
+            print("REGRESSION {}: {:.2f} -> {:.2f} ({:+.1%})".format(name, baseline_value,
+                                                                     value, change))
+        if regressions:
+            return 1
+        print("No regressions against {} (threshold {:.0%})".format(baseline, threshold))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the Tic-Tac-Toe engines and players')
+    parser.add_argument('--players',
+                          nargs='+',
+                          dest='players',
+                          choices=get_player_names(),
+                          default=['Naive', 'Random', 'Q-Learning', 'Minimax', 'MCTS'],
+                          help='Players of the pairing and latency benchmarks',)
+    parser.add_argument('-g', '--games',
+                          type=int,
+                          dest='games',
+                          default=50,
+                          help='Number of games per pairing and per latency measurement',)
+    parser.add_argument('-e', '--engine',
+                          dest='engine',
+                          choices=(TicTacToeGame.ENGINE_LIST, TicTacToeGame.ENGINE_BITBOARD),
+                          default=TicTacToeGame.ENGINE_LIST,
+                          help='Game engine of the pairing and latency benchmarks',)
+    parser.add_argument('--board-sizes',
+                          type=int,
+                          nargs='+',
+                          dest='board_sizes',
+                          default=[3, 4, 5, 7],
+                          help='Board sizes of the winning line check and early draw benchmarks',)
+    parser.add_argument('--calls',
+                          type=int,
+                          dest='calls',
+                          default=20000,
+                          help='Number of winning line checks per board and winning line size',)
+    parser.add_argument('--training-games',
+                          type=int,
+                          dest='training_games',
+                          default=5000,
+                          help='Number of training games of the Q-Values memory benchmark',)
+    parser.add_argument('-r', '--repeats',
+                          type=int,
+                          dest='repeats',
+                          default=5,
+                          help='Number of runs of the benchmarks, whose medians are reported and compared',)
+    parser.add_argument('-o', '--output',
+                          dest='output',
+                          metavar='PATH',
+                          help='Write the results as JSON to PATH',)
+    parser.add_argument('--baseline',
+                          dest='baseline',
+                          metavar='PATH',
+                          help='Compare the results against the JSON results at PATH',)
+    parser.add_argument('--threshold',
+                          type=float,
+                          dest='threshold',
+                          default=0.1,
+                          help='Relative slowdown of a metric reported as a regression',)
+    args = parser.parse_args()
+    sys.exit(main(args.players, args.games, args.engine, args.board_sizes, args.calls,
+                  args.training_games, output=args.output, baseline=args.baseline,
+                  threshold=args.threshold, num_of_repeats=args.repeats))
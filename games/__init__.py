@@ -1,6 +1,36 @@
 """
 TicTacToe Games
+
+The game engines are imported on first use only, so the NumPy batch engine
+does not slow down the start of the runs that play one game at a time.
 """
-from games.tictactoe_game import TicTacToeGame
+import importlib
+
+game_classes = {
+    'TicTacToeBatchGame': 'games.tictactoe_batch_game',
+    'TicTacToeGame': 'games.tictactoe_game',
+    'TicTacToeGameState': 'games.tictactoe_game_state',
+    'TicTacToeProfiler': 'games.tictactoe_profiler',
+    'TicTacToeRecordReader': 'games.tictactoe_recorder',
+    'TicTacToeRecorder': 'games.tictactoe_recorder',
+    'TicTacToeServer': 'games.tictactoe_server',
+    'TicTacToeServerGame': 'games.tictactoe_server',
+}
+
+
+def __getattr__(name):
+    """
+    Import a game engine class on first access (e.g. from games import TicTacToeGame)
+
+    @param name: the name of the class
+    @return: the class
+    """
+    if name not in game_classes:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    game_class = getattr(importlib.import_module(game_classes[name]), name)
+    globals()[name] = game_class
+    return game_class
+
 
-__all__ = ['TicTacToeGame']
+__all__ = ['TicTacToeBatchGame', 'TicTacToeGame', 'TicTacToeGameState', 'TicTacToeProfiler',
+           'TicTacToeRecordReader', 'TicTacToeRecorder', 'TicTacToeServer', 'TicTacToeServerGame']
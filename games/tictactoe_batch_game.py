@@ -0,0 +1,161 @@
+"""
+The vectorized implementation of the Tic-Tac-Toe game engine,
+which plays a batch of games at once using NumPy
+"""
+import numpy as np
+
+from games.tictactoe_bitboard import TicTacToeBitboard
+
+
+class TicTacToeBatchGame(object):
+    """
+    The vectorized implementation of the Tic-Tac-Toe game engine.
+
+    The boards of all games are kept in a single (N, board_size, board_size)
+    int8 array. The players should support the batched protocol:
+
+      - get_next_moves(game_states, game_ids): the game states are given as an
+        (M, board_size, board_size) int8 array from the point of view of the
+        player, where EMPTY_SEAT is a free seat, COM_PLAYER_ID a seat occupied
+        by the player itself and OPPONENT_PLAYER_ID a seat occupied by the opponent.
+        It returns a sequence with the row and column of the next move of each game.
+      - end_of_games(game_ids, winners): the winner of each game, either
+        COM_PLAYER_ID, OPPONENT_PLAYER_ID or EMPTY_SEAT for a draw.
+    """
+
+    RESULT_DRAW = -1
+
+    EMPTY_SEAT = 0
+    COM_PLAYER_ID = 1
+    OPPONENT_PLAYER_ID = 2
+
+
+    def __init__(self, p1, p2, num_of_games, board_size=3, win_size=3, player_symbol=('X', 'O')):
+        """
+        Constructor
+
+        @param p1: the instance of Player 1
+        @param p2: the instance of Player 2
+        @param num_of_games: the number of games played at once
+        @board_size: the number of rows and columns of the board (>= 3)
+        @win_size: the winning line size. This value should be equal or less than
+                   the number of rows and columns of the board and at least 3
+        @player_symbol: a list with the players' symbol
+        """
+        self.players = (p1, p2)
+        for player in self.players:
+            if not hasattr(player, 'get_next_moves'):
+                raise ValueError("Player {} does not support batched games"
+                                 .format(type(player).__name__))
+        self.num_of_games = num_of_games
+        self.board_size = board_size
+        self.win_size = win_size
+        self.player_symbol = player_symbol
+        self.win_lines = np.array(TicTacToeBitboard.get_win_lines(board_size, win_size),
+                                  dtype=np.intp)
+
+        self.game_id = 0
+        [self.players[x].set_player_id(self.player_symbol[x]) for x in range(len(self.players))]
+        self.__init_boards()
+
+
+    def __init_boards(self):
+        """
+        Initialize game boards with default value
+        """
+        self.boards = np.zeros((self.num_of_games, self.board_size, self.board_size),
+                               dtype=np.int8)
+
+
+    def __get_game_states(self, which_player, game_ids):
+        """
+        Get the game states from the point of view of a player
+
+        @param which_player: Either the first (0) or the second (1) player
+        @param game_ids: an array with the indexes of the games
+        @return: an (M, board_size, board_size) int8 array with the game states
+        """
+        game_states = self.boards[game_ids]
+        if which_player == 1:
+            occupied_seats = game_states != self.EMPTY_SEAT
+            game_states[occupied_seats] = self.COM_PLAYER_ID + self.OPPONENT_PLAYER_ID \
+                                          - game_states[occupied_seats]
+        return game_states
+
+
+    def __apply_moves(self, which_player, game_ids, moves):
+        """
+        Apply the valid moves on the game boards
+
+        @param which_player: Either the first (0) or the second (1) player
+        @param game_ids: an array with the indexes of the games
+        @param moves: a sequence with the row and column of the move of each game
+        @return: a boolean array, True for every game whose move was invalid
+        """
+        moves = np.asarray(moves, dtype=np.intp).reshape(len(game_ids), 2)
+        rows, cols = moves[:, 0], moves[:, 1]
+        is_valid = (rows >= 0) & (rows < self.board_size) & (cols >= 0) & (cols < self.board_size)
+        is_valid[is_valid] = self.boards[game_ids[is_valid], rows[is_valid], cols[is_valid]] \
+                             == self.EMPTY_SEAT
+        self.boards[game_ids[is_valid], rows[is_valid], cols[is_valid]] = which_player + 1
+        return ~is_valid
+
+
+    def __have_we_a_winner(self, which_player, game_ids):
+        """
+        Check if a player has completed a winning line
+
+        @param which_player: Either the first (0) or the second (1) player
+        @param game_ids: an array with the indexes of the games
+        @return: a boolean array, True for every game won by the player
+        """
+        player_seats = self.boards[game_ids].reshape(len(game_ids), -1) == which_player + 1
+        return player_seats[:, self.win_lines].all(axis=2).any(axis=1)
+
+
+    def __end_of_games(self, game_ids, winning_player):
+        """
+        End of games
+
+        @param game_ids: an array with the indexes of the finished games
+        @param winning_player: Either the first (0) or the second (1) player or RESULT_DRAW
+        """
+        for which_player, player in enumerate(self.players):
+            winner = self.EMPTY_SEAT
+            if winning_player == which_player:
+                winner = self.COM_PLAYER_ID
+            elif winning_player != self.RESULT_DRAW:
+                winner = self.OPPONENT_PLAYER_ID
+            player.end_of_games(game_ids, [winner] * len(game_ids))
+
+
+    def play(self):
+        """
+        Let's play ball!
+
+        @return: an int8 array with the winning player of each game,
+                 either the first (0) or the second (1) player or RESULT_DRAW
+        """
+        results = np.full(self.num_of_games, self.RESULT_DRAW, dtype=np.int8)
+        active_games = np.arange(self.num_of_games)
+        turn = 0
+        self.game_id += 1
+        while len(active_games):
+            which_player = turn % 2
+            pending_games = active_games
+            while len(pending_games):
+                game_states = self.__get_game_states(which_player, pending_games)
+                moves = self.players[which_player].get_next_moves(game_states, pending_games)
+                pending_games = pending_games[self.__apply_moves(which_player, pending_games, moves)]
+            have_we_a_winner = self.__have_we_a_winner(which_player, active_games)
+            if have_we_a_winner.any():
+                won_games = active_games[have_we_a_winner]
+                results[won_games] = which_player
+                self.__end_of_games(won_games, which_player)
+                active_games = active_games[~have_we_a_winner]
+            turn += 1
+            if turn >= self.board_size * self.board_size and len(active_games):
+                self.__end_of_games(active_games, self.RESULT_DRAW)
+                break
+        self.__init_boards()
+        return results
@@ -0,0 +1,153 @@
+"""
+The bitboard implementation of the Tic-Tac-Toe board
+"""
+
+
+class TicTacToeBitboard(object):
+    """
+    The bitboard implementation of the Tic-Tac-Toe board.
+    The seats of each player are kept in an integer bitmask, where the bit
+    (row * board_size + col) is set for every seat occupied by the player.
+    The winning lines passing through every seat are precomputed once
+    per board_size/win_size, so a win check is a few AND/compare operations.
+    """
+
+    __win_lines_cache = {}
+    __seat_win_masks_cache = {}
+    __seat_line_sets_cache = {}
+
+
+    def __init__(self, board_size=3, win_size=3):
+        """
+        Constructor
+
+        @param board_size: the number of rows and columns of the board (>= 3)
+        @param win_size: the winning line size
+        """
+        self.board_size = board_size
+        self.win_size = win_size
+        self.seat_win_masks = self.get_seat_win_masks(board_size, win_size)
+        self.reset()
+
+
+    @staticmethod
+    def get_win_lines(board_size, win_size):
+        """
+        Get all the winning lines of the board
+
+        @param board_size: the number of rows and columns of the board
+        @param win_size: the winning line size
+        @return: a tuple with the winning lines. Each line is a tuple
+                 with the seat indexes (row * board_size + col) of the line.
+        """
+        key = (board_size, win_size)
+        cache = TicTacToeBitboard.__win_lines_cache
+        if key not in cache:
+            directions = ((0, 1), (1, 0), (1, 1), (1, -1))
+            win_lines = []
+            for row in range(board_size):
+                for col in range(board_size):
+                    for d_row, d_col in directions:
+                        end_row = row + d_row * (win_size - 1)
+                        end_col = col + d_col * (win_size - 1)
+                        if not 0 <= end_row < board_size or not 0 <= end_col < board_size:
+                            continue
+                        win_lines.append(tuple((row + d_row * x) * board_size + col + d_col * x
+                                               for x in range(win_size)))
+            cache[key] = tuple(win_lines)
+        return cache[key]
+
+
+    @staticmethod
+    def get_seat_win_masks(board_size, win_size):
+        """
+        Get the bitmasks of the winning lines passing through each seat
+
+        @param board_size: the number of rows and columns of the board
+        @param win_size: the winning line size
+        @return: a tuple indexed by the seat index (row * board_size + col).
+                 Each item is a tuple with the bitmasks of the winning lines
+                 that contain the seat.
+        """
+        key = (board_size, win_size)
+        cache = TicTacToeBitboard.__seat_win_masks_cache
+        if key not in cache:
+            seat_win_masks = [[] for _ in range(board_size * board_size)]
+            for line in TicTacToeBitboard.get_win_lines(board_size, win_size):
+                line_mask = sum(1 << seat for seat in line)
+                for seat in line:
+                    seat_win_masks[seat].append(line_mask)
+            cache[key] = tuple(tuple(x) for x in seat_win_masks)
+        return cache[key]
+
+
+    @staticmethod
+    def get_seat_line_sets(board_size, win_size):
+        """
+        Get the sets of the winning lines passing through each seat
+
+        @param board_size: the number of rows and columns of the board
+        @param win_size: the winning line size
+        @return: a tuple indexed by the seat index (row * board_size + col).
+                 Each item is an integer bitset, where the bit x is set if the
+                 winning line x (of get_win_lines) contains the seat.
+        """
+        key = (board_size, win_size)
+        cache = TicTacToeBitboard.__seat_line_sets_cache
+        if key not in cache:
+            seat_line_sets = [0] * (board_size * board_size)
+            for idx, line in enumerate(TicTacToeBitboard.get_win_lines(board_size, win_size)):
+                for seat in line:
+                    seat_line_sets[seat] |= 1 << idx
+            cache[key] = tuple(seat_line_sets)
+        return cache[key]
+
+
+    def reset(self):
+        """
+        Reset the board to its initial (empty) state
+        """
+        self.player_masks = [0, 0]
+        self.occupied_mask = 0
+
+
+    def is_seat_occupied(self, row, col):
+        """
+        Check if seat is occupied
+
+        @param row: Number of row
+        @param col: Number of col
+        @return: boolean value
+        """
+        return bool(self.occupied_mask >> (row * self.board_size + col) & 1)
+
+
+    def have_we_a_winner(self, which_player, row, col):
+        """
+        Check if the last move of the player completed a winning line
+
+        @param which_player: Either the first (0) or the second (1) player
+        @param row: the row number of the last move
+        @param col: the column number of the last move
+        @return: boolean value
+        """
+        player_mask = self.player_masks[which_player]
+        for line_mask in self.seat_win_masks[row * self.board_size + col]:
+            if player_mask & line_mask == line_mask:
+                return True
+        return False
+
+
+    def set_seat(self, which_player, row, col):
+        """
+        Occupy a seat on behalf of a player
+
+        @param which_player: Either the first (0) or the second (1) player
+        @param row: Number of row
+        @param col: Number of col
+        @return: boolean value, True if the move completed a winning line
+        """
+        seat_bit = 1 << (row * self.board_size + col)
+        self.player_masks[which_player] |= seat_bit
+        self.occupied_mask |= seat_bit
+        return self.have_we_a_winner(which_player, row, col)
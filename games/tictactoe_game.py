@@ -5,13 +5,20 @@ from __future__ import print_function
 
 import os
 
+from games.tictactoe_bitboard import TicTacToeBitboard
+from games.tictactoe_game_state import TicTacToeGameState
+
 
 class TicTacToeGame(object):
 
     RESULT_DRAW = None
 
+    ENGINE_LIST = 'list'
+    ENGINE_BITBOARD = 'bitboard'
+
 
-    def __init__(self, p1, p2, board_size=3, win_size=3, player_symbol=('X', 'O'), be_verbose=True):
+    def __init__(self, p1, p2, board_size=3, win_size=3, player_symbol=('X', 'O'), be_verbose=True,
+                 engine=ENGINE_LIST, profiler=None, recorder=None, early_draw=False):
         """
         Constructor
 
@@ -22,14 +29,43 @@ class TicTacToeGame(object):
                    the number of rows and columns of the board and at least 3 
         @player_symbol: a list with the players' symbol
         @be_verbose: boolean value for verbosity
+        @engine: the engine used for checking the winning lines, either
+                 'list' (scan of the board) or 'bitboard' (bitmask per player)
+        @profiler: an instance of TicTacToeProfiler for timing the phases of the games,
+                   or None for no timing at all
+        @recorder: an instance of TicTacToeRecorder for recording the games,
+                   or None for no recording at all
+        @early_draw: boolean value, True for ending a game as a draw as soon as
+                     no player can complete a winning line, instead of when the board is full
         """
+        if engine not in (self.ENGINE_LIST, self.ENGINE_BITBOARD):
+            raise ValueError("Unknown engine: {}".format(engine))
+        if recorder is not None and recorder.board_size != board_size:
+            raise ValueError("The recorder is for board size {}, not {}".format(
+                recorder.board_size, board_size))
         self.board_size = board_size
         self.win_size = win_size
         self.player_symbol = player_symbol
         self.be_verbose = be_verbose
+        self.engine = engine
+
+        self.bitboard = None
+        if engine == self.ENGINE_BITBOARD:
+            self.bitboard = TicTacToeBitboard(board_size, win_size)
+
+        self.early_draw = early_draw
+        self.seat_line_sets = None
+        self.open_lines = None
+        if early_draw:
+            self.seat_line_sets = TicTacToeBitboard.get_seat_line_sets(board_size, win_size)
 
         self.players = (p1, p2)
+        self.player_labels = tuple(type(x).__name__ for x in self.players)
+        self.profiler = profiler
+        self.recorder = recorder
+        self.board = TicTacToeGameState(board_size, player_symbol, win_size)
         self.game_id = 0
+        self.num_of_moves = 0
         [self.players[x].set_player_id(self.player_symbol[x]) for x in range(len(self.players))]
         self.__init_board()
 
@@ -38,7 +74,29 @@ class TicTacToeGame(object):
         """
         Initialize game board with default value
         """
-        self.board = [[None] * self.board_size for _ in range(self.board_size)]
+        self.board.reset()
+        if self.bitboard is not None:
+            self.bitboard.reset()
+        if self.early_draw:
+            # the sets of the winning lines that each player can still complete
+            all_lines = (1 << len(TicTacToeBitboard.get_win_lines(self.board_size,
+                                                                  self.win_size))) - 1
+            self.open_lines = [all_lines, all_lines]
+
+
+    def __block_lines(self, which_player, row, col):
+        """
+        Update the winning lines that each player can still complete after a move:
+        a seat of a player blocks all the lines passing through it for the opponent
+
+        @param which_player: Either the first (0) or the second (1) player
+        @param row: the row number of the move
+        @param col: the column number of the move
+        @return: boolean value, True if any player can still complete a winning line
+        """
+        open_lines = self.open_lines
+        open_lines[1 - which_player] &= ~self.seat_line_sets[row * self.board_size + col]
+        return bool(open_lines[0] or open_lines[1])
 
 
     def print_board(self):
@@ -62,7 +120,7 @@ class TicTacToeGame(object):
         @param seat: a list with the x and y values of the seat  
         @return: boolean value
         """
-        return self.board[seat[0]][seat[1]] is not None
+        return not self.board.is_seat_free(seat[0], seat[1])
 
 
     def __is_input_valid(self, row, col):
@@ -158,15 +216,29 @@ class TicTacToeGame(object):
         @param winning_player: Either the first (0) or the second (1) player
         """
         self.print_board()
+        self.num_of_moves = self.board.get_num_of_moves()
+        if self.recorder is not None:
+            self.recorder.record(self.player_labels,
+                                 [row * self.board_size + col
+                                  for row, col in self.board.get_moves()],
+                                 winning_player)
         if winning_player is not self.RESULT_DRAW:
             if self.be_verbose: 
                 print("Game {}: Player {} is the winner!".format(self.game_id, winning_player + 1))
-            winning_player_symbol = self.player_symbol[winning_player]
-            [x.end_of_game(winning_player_symbol) for x in self.players]
+            winning_player_id = self.player_symbol[winning_player]
         else:
             if self.be_verbose:
                 print("Game {}: This is a draw!".format(self.game_id))
-            [x.end_of_game(self.RESULT_DRAW) for x in self.players]
+            winning_player_id = self.RESULT_DRAW
+        profiler = self.profiler
+        if profiler is None:
+            [x.end_of_game(winning_player_id) for x in self.players]
+        else:
+            for which_player, player in enumerate(self.players):
+                start_time = profiler.timer()
+                player.end_of_game(winning_player_id)
+                profiler.add(profiler.PHASE_END_OF_GAME, self.player_labels[which_player],
+                             profiler.timer() - start_time)
         self.__init_board()
 
 
@@ -177,21 +249,43 @@ class TicTacToeGame(object):
         result = self.RESULT_DRAW
         turn = 0
         self.game_id += 1
+        profiler = self.profiler
         while True:
             self.print_board()
             which_player = turn % 2
+            if profiler is not None:
+                start_time = profiler.timer()
             row, col = self.players[which_player].get_next_move(self.board)
-            if not self.__is_input_valid(row, col):
+            if profiler is not None:
+                move_time = profiler.timer()
+                profiler.add(profiler.PHASE_MOVE, self.player_labels[which_player],
+                             move_time - start_time)
+            is_input_valid = self.__is_input_valid(row, col)
+            if profiler is not None:
+                validation_time = profiler.timer()
+                profiler.add(profiler.PHASE_VALIDATION, profiler.ENGINE_LABEL,
+                             validation_time - move_time)
+            if not is_input_valid:
+                if profiler is not None:
+                    profiler.increment('invalid_moves', self.player_labels[which_player])
                 continue
             row = int(row)
             col = int(col)
-            self.board[row][col] = self.player_symbol[which_player]
-            if self.__have_we_a_winner((row, col)):
+            self.board.set_seat(which_player, row, col)
+            if self.bitboard is not None:
+                have_we_a_winner = self.bitboard.set_seat(which_player, row, col)
+            else:
+                have_we_a_winner = self.__have_we_a_winner((row, col))
+            is_line_open = not self.early_draw or self.__block_lines(which_player, row, col)
+            if profiler is not None:
+                profiler.add(profiler.PHASE_WIN_CHECK, profiler.ENGINE_LABEL,
+                             profiler.timer() - validation_time)
+            if have_we_a_winner:
                 self.__end_of_game(which_player)
                 result = which_player
                 break
             turn += 1
-            if turn >= self.board_size * self.board_size:
+            if turn >= self.board_size * self.board_size or not is_line_open:
                 self.__end_of_game(self.RESULT_DRAW)
                 break
         return result
@@ -0,0 +1,219 @@
+"""
+The read-only view of the game state, which the Tic-Tac-Toe game engine gives to the players
+"""
+
+
+class TicTacToeGameState(object):
+    """
+    The read-only view of the game state, which the Tic-Tac-Toe game engine gives to the players.
+
+    The view is a sequence of rows like the 2D list board (game_state[row][col] is the
+    symbol of a player or None), but the rows are tuples, so the players cannot change
+    the board and need not copy it. The engine updates the view once per move (set_seat)
+    in constant time: the free seats are kept in a list with swap-remove, and the row
+    tuples and the free seats tuple are built when a player asks for them (and cached
+    until the next move). So the players may also get the free seats, the moves, the
+    seat bitmasks and the position key of the game without scanning the board:
+      - the free seats are a tuple of (row, col) seats in row major order,
+      - the bit (row * board_size + col) of the bitmask of a player is set for every seat
+        occupied by the player,
+      - the position key is a base-3 integer with one digit per seat (the first seat is
+        the most significant digit), which is 0 for a free seat, 1 for a seat of the
+        player and 2 for a seat of the opponent, from the point of view of either player.
+    """
+
+    EMPTY_SEAT = 0
+    COM_PLAYER_ID = 1
+    OPPONENT_PLAYER_ID = 2
+
+    # the seat weights and the seats of a board size, as the engine creates a view per game
+    layouts = {}
+
+
+    def __init__(self, board_size=3, player_symbol=('X', 'O'), win_size=None):
+        """
+        Constructor
+
+        @param board_size: the number of rows and columns of the board
+        @param player_symbol: a list with the players' symbol
+        @param win_size: the winning line size of the game, or None if unknown
+        """
+        self.board_size = board_size
+        self.player_symbol = player_symbol
+        self.win_size = win_size
+        if board_size not in self.layouts:
+            self.layouts[board_size] = (
+                tuple(3 ** (board_size * board_size - 1 - x)
+                      for x in range(board_size * board_size)),
+                tuple((row, col) for row in range(board_size) for col in range(board_size)))
+        self.__seat_weights, self.__all_free_seats = self.layouts[board_size]
+        self.reset()
+
+
+    def __get_seat(self, player_id):
+        """
+        Get the seat of a player
+
+        @param player_id: the symbol used by the player
+        @return: either 0 (the first player) or 1
+        """
+        return 0 if player_id == self.player_symbol[0] else 1
+
+
+    def __getitem__(self, row):
+        line = self.__rows[row]
+        if line is None:
+            line = self.__rows[row] = tuple(self.__cells[row])
+        return line
+
+
+    def __iter__(self):
+        for row in range(self.board_size):
+            yield self[row]
+
+
+    def __len__(self):
+        return self.board_size
+
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self))
+
+
+    def get_free_seat(self, position):
+        """
+        Get a free seat by its position in the free seats, which are kept in no particular
+        order, e.g. for picking a random free seat without building the free seats tuple
+
+        @param position: the position of the seat [0, get_num_of_free_seats())
+        @return: a tuple with the x and y values of the seat
+        """
+        return self.__all_free_seats[self.__free_indexes[position]]
+
+
+    def get_free_seats(self):
+        """
+        Get the available (free) seats
+
+        @return: a tuple with the free seats in row major order.
+                 Each seat is a tuple with the x and y values.
+        """
+        free_seats = self.__free_seats
+        if free_seats is None:
+            free_seats = self.__free_seats = tuple(map(self.__all_free_seats.__getitem__,
+                                                       sorted(self.__free_indexes)))
+        return free_seats
+
+
+    def get_last_move(self):
+        """
+        Get the last move of the game
+
+        @return: a tuple with the x and y values of the seat, or None before the first move
+        """
+        return self.__moves[-1] if self.__moves else None
+
+
+    def get_moves(self):
+        """
+        Get the moves of the game
+
+        @return: a tuple with the x and y values of the seat of every move, in order
+        """
+        return tuple(self.__moves)
+
+
+    def get_num_of_moves(self):
+        """
+        Get the number of moves of the game
+
+        @return: the number of moves
+        """
+        return len(self.__moves)
+
+
+    def get_num_of_free_seats(self):
+        """
+        Get the number of free seats
+
+        @return: the number of free seats
+        """
+        return len(self.__free_indexes)
+
+
+    def get_position_key(self, player_id):
+        """
+        Get the position key of the game from the point of view of a player
+
+        @param player_id: the symbol used by the player
+        @return: the base-3 integer key
+        """
+        return self.__keys[self.__get_seat(player_id)]
+
+
+    def get_seat_masks(self, player_id):
+        """
+        Get the bitmasks of the seats of the players from the point of view of a player
+
+        @param player_id: the symbol used by the player
+        @return: a tuple with the bitmask of the player and the bitmask of the opponent
+        """
+        seat = self.__get_seat(player_id)
+        return self.__seat_masks[seat], self.__seat_masks[1 - seat]
+
+
+    def is_seat_free(self, row, col):
+        """
+        Check if a seat is free
+
+        @param row: Number of row
+        @param col: Number of col
+        @return: boolean value
+        """
+        return not (self.__seat_masks[0] | self.__seat_masks[1]) \
+            >> (row * self.board_size + col) & 1
+
+
+    def reset(self):
+        """
+        Reset the game state to the empty board (called by the game engine only)
+        """
+        board_size = self.board_size
+        self.__cells = [[None] * board_size for _ in range(board_size)]
+        self.__rows = [(None,) * board_size] * board_size
+        self.__free_seats = self.__all_free_seats
+        # the indexes of the free seats, and the position of every seat in the list (or -1)
+        self.__free_indexes = list(range(board_size * board_size))
+        self.__free_positions = list(range(board_size * board_size))
+        self.__moves = []
+        self.__seat_masks = [0, 0]
+        self.__keys = [0, 0]
+
+
+    def set_seat(self, which_player, row, col):
+        """
+        Occupy a free seat on behalf of a player (called by the game engine only)
+
+        @param which_player: Either the first (0) or the second (1) player
+        @param row: Number of row
+        @param col: Number of col
+        """
+        self.__cells[row][col] = self.player_symbol[which_player]
+        self.__rows[row] = None
+        seat_index = row * self.board_size + col
+        # swap-remove the seat from the free seats
+        free_indexes = self.__free_indexes
+        free_positions = self.__free_positions
+        position = free_positions[seat_index]
+        last_index = free_indexes.pop()
+        if last_index != seat_index:
+            free_indexes[position] = last_index
+            free_positions[last_index] = position
+        free_positions[seat_index] = -1
+        self.__free_seats = None
+        self.__moves.append((row, col))
+        self.__seat_masks[which_player] |= 1 << seat_index
+        weight = self.__seat_weights[seat_index]
+        keys = self.__keys
+        keys[which_player] += self.COM_PLAYER_ID * weight
+        keys[1 - which_player] += self.OPPONENT_PLAYER_ID * weight
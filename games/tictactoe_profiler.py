@@ -0,0 +1,108 @@
+"""
+The profiler of the Tic-Tac-Toe game engine, which times the phases of the games
+"""
+from __future__ import print_function
+
+import timeit
+
+
+class TicTacToeProfiler(object):
+    """
+    The profiler of the Tic-Tac-Toe game engine.
+
+    The game engine reports the duration of every phase of a game (the move of
+    a player, the validation of the move, the winning line check and the end of
+    game updates of a player), and the profiler aggregates them per phase and
+    player into histograms with power of 2 buckets (in microseconds), so the
+    memory and the cost of a measurement stay constant however long the run is.
+    """
+
+    PHASE_MOVE = 'get_next_move'
+    PHASE_VALIDATION = 'validation'
+    PHASE_WIN_CHECK = 'win_check'
+    PHASE_END_OF_GAME = 'end_of_game'
+
+    ENGINE_LABEL = 'engine'
+
+
+    def __init__(self, timer=timeit.default_timer):
+        """
+        Constructor
+
+        @param timer: the function that returns the current time in seconds
+        """
+        self.timer = timer
+        self.histograms = {}
+        self.counters = {}
+
+
+    def __get_percentile(self, histogram, count, percentile):
+        """
+        Estimate a percentile of the durations of a histogram
+
+        @param histogram: the list with the counts of every bucket
+        @param count: the total count of the histogram
+        @param percentile: the percentile [0, 100]
+        @return: the upper bound in microseconds of the bucket of the percentile
+        """
+        rank = percentile / 100. * count
+        cumulative_count = 0
+        for bucket, bucket_count in enumerate(histogram):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return 2 ** bucket
+        return 2 ** (len(histogram) - 1)
+
+
+    def add(self, phase, label, duration):
+        """
+        Add the duration of a phase
+
+        @param phase: the phase of the game, e.g. PHASE_MOVE
+        @param label: the label of the player (or ENGINE_LABEL)
+        @param duration: the duration in seconds
+        """
+        key = (phase, label)
+        stats = self.histograms.get(key)
+        if stats is None:
+            stats = self.histograms[key] = [0, 0.0, []]
+        stats[0] += 1
+        stats[1] += duration
+        bucket = int(duration * 1e6).bit_length()
+        histogram = stats[2]
+        if bucket >= len(histogram):
+            histogram.extend([0] * (bucket + 1 - len(histogram)))
+        histogram[bucket] += 1
+
+
+    def increment(self, counter, label):
+        """
+        Increment a counter
+
+        @param counter: the name of the counter, e.g. 'invalid_moves'
+        @param label: the label of the player (or ENGINE_LABEL)
+        """
+        key = (counter, label)
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+
+    def get_report(self):
+        """
+        Get the breakdown of the time per phase and player
+
+        @return: a string with a table of the phases and the counters
+        """
+        total_time = sum(x[1] for x in self.histograms.values()) or 1.
+        lines = ["{:<14} {:<30} {:>9} {:>10} {:>6} {:>9} {:>9} {:>9}"
+                 .format('phase', 'player', 'count', 'total(s)', 'share', 'mean(us)',
+                         'p50(us)', 'p99(us)')]
+        for (phase, label), (count, phase_time, histogram) in \
+                sorted(self.histograms.items(), key=lambda x: -x[1][1]):
+            lines.append("{:<14} {:<30} {:>9} {:>10.3f} {:>6.1%} {:>9.1f} {:>9} {:>9}"
+                         .format(phase, label, count, phase_time, phase_time / total_time,
+                                 phase_time / count * 1e6,
+                                 '<{}'.format(self.__get_percentile(histogram, count, 50)),
+                                 '<{}'.format(self.__get_percentile(histogram, count, 99))))
+        for (counter, label), count in sorted(self.counters.items()):
+            lines.append("{:<14} {:<30} {:>9}".format(counter, label, count))
+        return '\n'.join(lines)
@@ -0,0 +1,275 @@
+"""
+The recorder of the Tic-Tac-Toe games, which streams the played games to an
+append-only binary log, and the reader of the log
+"""
+from __future__ import print_function
+
+import json
+import mmap
+import os
+import struct
+
+
+class TicTacToeRecorder(object):
+    """
+    The recorder of the Tic-Tac-Toe games.
+
+    Every game is appended to the log as a fixed-size record: the label IDs of
+    the two players, the result (the winning seat, or -1 for a draw), the
+    number of moves and the seats of the moves (row * board_size + col, padded
+    with 0xff), so the N-th game of the log is at offset N * record_size. The
+    index is a small JSON file next to the log (PATH.index) with the board size,
+    the record size and the labels of the players.
+
+    The records are packed into a buffer and written once the buffer is full,
+    so recording a game costs a struct.pack and no system calls. The buffer is
+    written by flush and close (or at the end of a 'with' block).
+    """
+
+    VERSION = 1
+
+    HEADER_FORMAT = '<BBbB'
+
+    NO_SEAT = 0xff
+
+    RESULT_DRAW = -1
+
+
+    def __init__(self, path, board_size=3, buffer_size=1 << 16):
+        """
+        Constructor
+
+        @param path: the path of the log, which is appended if it exists
+                     (after dropping a partial record at its end, if any)
+        @param board_size: the number of rows and columns of the board
+        @param buffer_size: the number of bytes buffered before writing to the log
+        """
+        if board_size * board_size >= self.NO_SEAT:
+            raise ValueError("The board is too large for recording: {}".format(board_size))
+        self.path = path
+        self.index_path = self.get_index_path(path)
+        self.board_size = board_size
+        self.buffer_size = buffer_size
+        self.record_struct = struct.Struct('{}{}s'.format(self.HEADER_FORMAT,
+                                                          board_size * board_size))
+        self.record_size = self.record_struct.size
+        # struct pads the moves with zeros, which is the seat (0, 0), so they are padded first
+        self.no_seats = bytes(bytearray([self.NO_SEAT] * (board_size * board_size)))
+        self.labels = []
+        self.label_ids = {}
+        self.is_index_changed = True
+        self.buffer = bytearray()
+        self.num_of_records = 0
+        self.__load_index()
+        self.log_file = open(path, 'ab')
+        self.num_of_records = self.log_file.tell() // self.record_size
+        # a partial record left by a crash would shift all the records appended after it
+        self.log_file.truncate(self.num_of_records * self.record_size)
+
+
+    def __get_label_id(self, label):
+        """
+        Get the ID of the label of a player, adding the label to the index if it is new
+
+        @param label: the label of the player, e.g. the name of its class
+        @return: the ID of the label
+        """
+        label_id = self.label_ids.get(label)
+        if label_id is None:
+            if len(self.labels) >= self.NO_SEAT:
+                raise ValueError("Too many player labels in {}".format(self.path))
+            label_id = self.label_ids[label] = len(self.labels)
+            self.labels.append(label)
+            self.is_index_changed = True
+        return label_id
+
+
+    def __load_index(self):
+        """
+        Load the index of an existing log, checking that the log has the same format
+        """
+        if not os.path.exists(self.index_path):
+            if os.path.exists(self.path) and os.path.getsize(self.path):
+                raise ValueError("The index of {} is missing".format(self.path))
+            return
+        index = read_index(self.index_path)
+        if index['board_size'] != self.board_size or index['record_size'] != self.record_size:
+            raise ValueError("{} records games of board size {}, not {}".format(
+                self.path, index['board_size'], self.board_size))
+        self.labels = list(index['labels'])
+        self.label_ids = {label: label_id for label_id, label in enumerate(self.labels)}
+        self.is_index_changed = False
+
+
+    def __write_index(self):
+        """
+        Write the index, replacing the previous one at once
+        """
+        index = {'version': self.VERSION, 'board_size': self.board_size,
+                 'record_size': self.record_size, 'labels': self.labels}
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_path, self.index_path)
+        self.is_index_changed = False
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def __len__(self):
+        return self.num_of_records
+
+
+    def close(self):
+        """
+        Write the buffered records and close the log
+        """
+        if self.log_file is None:
+            return
+        self.flush()
+        self.log_file.close()
+        self.log_file = None
+
+
+    def flush(self):
+        """
+        Write the buffered records to the log
+        """
+        # the index goes first, so that every written record refers to known labels
+        if self.is_index_changed:
+            self.__write_index()
+        if self.buffer:
+            self.log_file.write(self.buffer)
+            self.log_file.flush()
+            del self.buffer[:]
+
+
+    @staticmethod
+    def get_index_path(path):
+        """
+        Get the path of the index of a log
+
+        @param path: the path of the log
+        @return: the path of the index
+        """
+        return path + '.index'
+
+
+    def record(self, labels, moves, result):
+        """
+        Record a game
+
+        @param labels: a tuple with the labels of the two players, in seat order
+        @param moves: a list with the seats of the moves (row * board_size + col), in order
+        @param result: the winning seat (0 or 1), or None for a draw
+        """
+        self.buffer += self.record_struct.pack(
+            self.__get_label_id(labels[0]), self.__get_label_id(labels[1]),
+            self.RESULT_DRAW if result is None else result, len(moves),
+            bytes(bytearray(moves)) + self.no_seats)
+        self.num_of_records += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+
+class TicTacToeRecordReader(object):
+    """
+    The reader of the logs of TicTacToeRecorder.
+
+    The log is memory mapped, so iterating over it reads the pages of the
+    records on demand and the memory stays constant however large the log is.
+    Every game is a tuple with the labels of the two players (in seat order),
+    the result (the winning seat, or None for a draw) and a list with the
+    (row, col) seats of the moves.
+    """
+
+
+    def __init__(self, path):
+        """
+        Constructor
+
+        @param path: the path of the log
+        """
+        self.path = path
+        index = read_index(TicTacToeRecorder.get_index_path(path))
+        self.board_size = index['board_size']
+        self.record_size = index['record_size']
+        self.labels = index['labels']
+        self.record_struct = struct.Struct('{}{}s'.format(TicTacToeRecorder.HEADER_FORMAT,
+                                                          self.board_size * self.board_size))
+        if self.record_struct.size != self.record_size:
+            raise ValueError("Unknown record format in {}".format(path))
+        self.seats = [divmod(x, self.board_size) for x in range(self.board_size ** 2)]
+
+
+    def __get_label(self, label_id):
+        """
+        Get the label of a player
+
+        @param label_id: the ID of the label
+        @return: the label, or the ID as a string if the index does not know it
+        """
+        if label_id < len(self.labels):
+            return self.labels[label_id]
+        return str(label_id)
+
+
+    def __iter__(self):
+        return self.read()
+
+
+    def __len__(self):
+        return os.path.getsize(self.path) // self.record_size
+
+
+    def read(self, start=0, stop=None):
+        """
+        Iterate over the recorded games
+
+        @param start: the number of the first game
+        @param stop: the number of the game after the last one, or None for the end of the log
+        @return: a generator of (labels, result, moves) tuples
+        """
+        num_of_records = len(self)
+        stop = num_of_records if stop is None else min(stop, num_of_records)
+        if start >= stop:
+            return
+        seats = self.seats
+        labels = {}
+        with open(self.path, 'rb') as log_file:
+            log_map = mmap.mmap(log_file.fileno(), stop * self.record_size,
+                                access=mmap.ACCESS_READ)
+            try:
+                unpack_from = self.record_struct.unpack_from
+                for offset in range(start * self.record_size, stop * self.record_size,
+                                    self.record_size):
+                    p1_id, p2_id, result, num_of_moves, moves = unpack_from(log_map, offset)
+                    pair = labels.get((p1_id, p2_id))
+                    if pair is None:
+                        pair = labels[(p1_id, p2_id)] = (self.__get_label(p1_id),
+                                                         self.__get_label(p2_id))
+                    yield (pair,
+                           None if result == TicTacToeRecorder.RESULT_DRAW else result,
+                           [seats[x] for x in bytearray(moves[:num_of_moves])])
+            finally:
+                log_map.close()
+
+
+def read_index(index_path):
+    """
+    Read the index of a log
+
+    @param index_path: the path of the index
+    @return: a dictionary with the board size, the record size and the labels of the players
+    """
+    with open(index_path) as index_file:
+        index = json.load(index_file)
+    if index.get('version') != TicTacToeRecorder.VERSION:
+        raise ValueError("Unknown version of {}: {}".format(index_path, index.get('version')))
+    return index
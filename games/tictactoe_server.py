@@ -0,0 +1,396 @@
+"""
+The asyncio game server of Tic-Tac-Toe, which hosts many concurrent games
+of remote players against a shared (trained) player
+"""
+from __future__ import print_function
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import re
+
+from games.tictactoe_bitboard import TicTacToeBitboard
+from games.tictactoe_game_state import TicTacToeGameState
+
+
+class TicTacToeServerGame(object):
+    """
+    A game of a remote player against an instance of the hosted player.
+    The game keeps the board, so the state of the game is off the hosted player.
+    """
+
+    RESULT_NONE = 'none'
+    RESULT_WIN = 'win'
+    RESULT_LOSS = 'loss'
+    RESULT_DRAW = 'draw'
+
+    MAX_INVALID_MOVES = 100
+    # ASCII digits only, as str.isdigit also accepts other digits, e.g. superscripts
+    NUMBER_PATTERN = re.compile(r'[0-9]+')
+
+
+    def __init__(self, player, client_seat, board_size, win_size, player_symbol):
+        """
+        Constructor
+
+        @param player: the instance of the player of the game, e.g. spawned by the hosted one
+        @param client_seat: the seat of the remote player, either 0 (plays first) or 1
+        @param board_size: the number of rows and columns of the board
+        @param win_size: the winning line size
+        @param player_symbol: a list with the players' symbol
+        """
+        self.player = player
+        self.client_seat = client_seat
+        self.board_size = board_size
+        self.player_symbol = player_symbol
+        self.board = TicTacToeGameState(board_size, player_symbol, win_size)
+        self.bitboard = TicTacToeBitboard(board_size, win_size)
+        self.moves = []
+        self.result = self.RESULT_NONE
+        self.winning_seat = None
+        self.player.set_player_id(player_symbol[1 - client_seat])
+
+
+    def __end_of_game(self, winning_seat):
+        """
+        End of game
+
+        @param winning_seat: the winning seat (0 or 1), or None for a draw
+        """
+        self.winning_seat = winning_seat
+        if winning_seat is None:
+            self.result = self.RESULT_DRAW
+            self.player.end_of_game(None)
+        else:
+            self.result = self.RESULT_WIN if winning_seat == self.client_seat else self.RESULT_LOSS
+            self.player.end_of_game(self.player_symbol[winning_seat])
+
+
+    def __set_seat(self, seat, row, col):
+        """
+        Occupy a seat on behalf of a player and check for the end of the game
+
+        @param seat: the seat of the player, either 0 or 1
+        @param row: Number of row
+        @param col: Number of col
+        """
+        self.board.set_seat(seat, row, col)
+        self.moves.append(row * self.board_size + col)
+        if self.bitboard.set_seat(seat, row, col):
+            self.__end_of_game(seat)
+        elif len(self.moves) == self.board_size * self.board_size:
+            self.__end_of_game(None)
+
+
+    def get_board(self):
+        """
+        Get the board as a string, one character per seat (row by row), '-' for free seats
+
+        @return: the string
+        """
+        return ''.join(x or '-' for line in self.board for x in line)
+
+
+    def is_client_turn(self):
+        """
+        Check if the remote player moves next
+
+        @return: boolean value
+        """
+        return self.result == self.RESULT_NONE and len(self.moves) % 2 == self.client_seat
+
+
+    def is_valid_move(self, row, col):
+        """
+        Check if a move is valid
+
+        @param row: Number of row
+        @param col: Number of col
+        @return: boolean value
+        """
+        return 0 <= row < self.board_size and 0 <= col < self.board_size \
+            and not self.bitboard.is_seat_occupied(row, col)
+
+
+    def parse_move(self, row, col):
+        """
+        Parse a move, e.g. of the remote player
+
+        @param row: Number of row, as a string or an integer
+        @param col: Number of col, as a string or an integer
+        @return: a tuple with the x and y values of the move, or None if the move is invalid
+        """
+        row, col = str(row), str(col)
+        if self.NUMBER_PATTERN.fullmatch(row) is None or self.NUMBER_PATTERN.fullmatch(col) is None:
+            return None
+        row, col = int(row), int(col)
+        if not self.is_valid_move(row, col):
+            return None
+        return row, col
+
+
+    def play_client_move(self, row, col):
+        """
+        Play a (valid) move of the remote player
+
+        @param row: Number of row
+        @param col: Number of col
+        """
+        self.__set_seat(self.client_seat, row, col)
+
+
+    def play_player_move(self):
+        """
+        Play the move of the player of the game
+
+        @return: a tuple with the x and y values of the move
+        """
+        for _ in range(self.MAX_INVALID_MOVES):
+            move = self.parse_move(*self.player.get_next_move(self.board))
+            if move is not None:
+                break
+        else:
+            raise ValueError("The player made {} invalid moves".format(self.MAX_INVALID_MOVES))
+        row, col = move
+        self.__set_seat(1 - self.client_seat, row, col)
+        return row, col
+
+
+class TicTacToeServer(object):
+    """
+    The asyncio game server of Tic-Tac-Toe.
+
+    Every connection plays one game at a time against an instance of the hosted
+    player, given by its spawn method (a player of one game, which plays through
+    the hosted player and keeps the state of the game in its own context), or else
+    by a deep copy. The moves of the games (and the updates of a learning player at
+    the end of the games) are played in a worker thread, one at a time, so a slow
+    player never blocks the event loop, which keeps serving the other connections,
+    and the hosted player is never used by two threads at once. A frozen hosted player
+    (which never writes to its Q-Values) may be shared by forked processes serving
+    the same listening socket (see start).
+
+    The protocol is line based (one command or reply per line):
+        server: HELLO <board_size> <win_size>
+        client: NEW [1|2]            starts a game, where the client plays first (1, default)
+                                     or second (2)
+        server: GAME <game_id> <symbol>
+                MOVE <row> <col>     if the server plays first
+                TURN
+        client: MOVE <row> <col>
+        server: MOVE <row> <col>     unless the move of the client ended the game
+                TURN                 or END <win|loss|draw> when the game is over
+        client: BOARD
+        server: BOARD <seats>        one character per seat, row by row, '-' for free seats
+        client: QUIT
+        server: BYE
+    Invalid commands and moves get an ERROR <reason> reply. The connections over
+    max_connections get a BUSY reply, the connections idle for more than
+    idle_timeout seconds get a TIMEOUT reply, and the connections of clients that
+    do not read their replies for write_timeout seconds are closed.
+    """
+
+    MAX_LINE_SIZE = 1024
+
+
+    def __init__(self, player, board_size=3, win_size=3, player_symbol=('X', 'O'),
+                 max_connections=10000, idle_timeout=60.0, write_timeout=10.0, recorder=None):
+        """
+        Constructor
+
+        @param player: the instance of the hosted player
+        @param board_size: the number of rows and columns of the board
+        @param win_size: the winning line size
+        @param player_symbol: a list with the players' symbol
+        @param max_connections: the maximum number of concurrent connections
+        @param idle_timeout: the seconds a connection may wait before its next command
+        @param write_timeout: the seconds a reply may wait for the client to read it
+        @param recorder: an instance of TicTacToeRecorder for recording the finished games,
+                         or None for no recording at all
+        """
+        self.player = player
+        self.board_size = board_size
+        self.win_size = win_size
+        self.player_symbol = player_symbol
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.write_timeout = write_timeout
+        self.recorder = recorder
+        self.player_label = type(player).__name__
+        self.num_of_connections = 0
+        self.num_of_games = 0
+        self.results = {TicTacToeServerGame.RESULT_WIN: 0, TicTacToeServerGame.RESULT_LOSS: 0,
+                        TicTacToeServerGame.RESULT_DRAW: 0}
+        # the thread is started by the first move, so a server may be created before forking
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+
+    async def __end_of_game(self, game, send):
+        """
+        Report the result of a finished game
+
+        @param game: the finished game
+        @param send: the coroutine function that sends a reply
+        """
+        self.results[game.result] += 1
+        if self.recorder is not None:
+            labels = ['remote', self.player_label]
+            if game.client_seat:
+                labels.reverse()
+            self.recorder.record(labels, game.moves, game.winning_seat)
+        await send('END {}'.format(game.result))
+
+
+    async def __handle_command(self, line, game, send):
+        """
+        Handle a command of a connection
+
+        @param line: the line of the command
+        @param game: the current game of the connection, or None
+        @param send: the coroutine function that sends a reply
+        @return: the current game of the connection, or False for closing the connection
+        """
+        args = line.split()
+        command = args[0].upper() if args else ''
+        if command == 'NEW':
+            client_seat = 0
+            if len(args) > 1:
+                if args[1] not in ('1', '2'):
+                    await send('ERROR invalid seat')
+                    return game
+                client_seat = int(args[1]) - 1
+            game = self.__new_game(client_seat)
+            await send('GAME {} {}'.format(self.num_of_games, self.player_symbol[client_seat]))
+            if game.is_client_turn():
+                await send('TURN')
+            else:
+                await self.__play_player_move(game, send)
+        elif command == 'MOVE':
+            if game is None or not game.is_client_turn():
+                await send('ERROR no game in progress')
+                return game
+            move = game.parse_move(args[1], args[2]) if len(args) == 3 else None
+            if move is None:
+                await send('ERROR invalid move')
+                return game
+            await asyncio.get_running_loop().run_in_executor(self.executor,
+                                                             game.play_client_move, *move)
+            if game.result == game.RESULT_NONE:
+                await self.__play_player_move(game, send)
+            else:
+                await self.__end_of_game(game, send)
+        elif command == 'BOARD':
+            if game is None:
+                await send('ERROR no game in progress')
+            else:
+                await send('BOARD {}'.format(game.get_board()))
+        elif command == 'QUIT':
+            await send('BYE')
+            return False
+        else:
+            await send('ERROR unknown command')
+        return game
+
+
+    def __new_game(self, client_seat):
+        """
+        Start a new game against an instance of the hosted player
+
+        @param client_seat: the seat of the remote player, either 0 (plays first) or 1
+        @return: the instance of TicTacToeServerGame
+        """
+        if hasattr(self.player, 'spawn'):
+            player = self.player.spawn()
+        else:
+            player = copy.deepcopy(self.player)
+        self.num_of_games += 1
+        return TicTacToeServerGame(player, client_seat, self.board_size, self.win_size,
+                                   self.player_symbol)
+
+
+    async def __play_player_move(self, game, send):
+        """
+        Play and send the move of the hosted player, followed by the turn of the client
+        or the result of the game
+
+        @param game: the game
+        @param send: the coroutine function that sends a reply
+        """
+        row, col = await asyncio.get_running_loop().run_in_executor(self.executor,
+                                                                    game.play_player_move)
+        await send('MOVE {} {}'.format(row, col))
+        if game.result != game.RESULT_NONE:
+            await self.__end_of_game(game, send)
+        else:
+            await send('TURN')
+
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve a connection until the client quits, times out or disconnects
+
+        @param reader: the asyncio.StreamReader of the connection
+        @param writer: the asyncio.StreamWriter of the connection
+        """
+        async def send(line):
+            writer.write((line + '\n').encode('ascii'))
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+
+        self.num_of_connections += 1
+        try:
+            if self.num_of_connections > self.max_connections:
+                await send('BUSY')
+                return
+            await send('HELLO {} {}'.format(self.board_size, self.win_size))
+            game = None
+            while game is not False:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    await send('TIMEOUT')
+                    break
+                if not line:
+                    break
+                game = await self.__handle_command(line.decode('ascii', 'replace'), game, send)
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            # a client that does not read its replies, a dropped connection or an overlong line
+            pass
+        finally:
+            self.num_of_connections -= 1
+            writer.close()
+
+
+    def serve_forever(self, host='127.0.0.1', port=8765, sock=None):
+        """
+        Serve connections until interrupted
+
+        @param host: the address of the server
+        @param port: the port of the server
+        @param sock: a listening socket to serve instead of the address, or None
+        """
+        async def serve():
+            server = await self.start(host, port, sock)
+            async with server:
+                await server.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        finally:
+            self.executor.shutdown()
+
+
+    async def start(self, host='127.0.0.1', port=8765, sock=None):
+        """
+        Start listening for connections
+
+        @param host: the address of the server
+        @param port: the port of the server
+        @param sock: a listening socket to serve instead of the address, or None,
+                     e.g. a socket created before forking the worker processes
+        @return: the asyncio server
+        """
+        if sock is not None:
+            host = port = None
+        return await asyncio.start_server(self.handle_connection, host, port, sock=sock,
+                                          limit=self.MAX_LINE_SIZE,
+                                          backlog=min(self.max_connections, 4096))
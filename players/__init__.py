@@ -1,13 +1,98 @@
 """
 All Player Types for TicTacToe
+
+The players are kept in a registry that maps their names to 'module:Class'
+strings, and the module of a player is imported on first use only, so e.g.
+TensorFlow is imported only when the TensorFlow player is actually played.
+External players (plugins) add themselves to the registry with register_player.
 """
+import importlib
+
+player_classes = {
+    'TicTacToeComputerFrozen': 'players.tictactoe_computer_frozen:TicTacToeComputerFrozen',
+    'TicTacToeComputerMCTS': 'players.tictactoe_computer_mcts:TicTacToeComputerMCTS',
+    'TicTacToeComputerMinimax': 'players.tictactoe_computer_minimax:TicTacToeComputerMinimax',
+    'TicTacToeComputerNaive': 'players.tictactoe_computer_naive:TicTacToeComputerNaive',
+    'TicTacToeComputerNumpy': 'players.tictactoe_computer_numpy:TicTacToeComputerNumpy',
+    'TicTacToeComputerQLearning':
+        'players.tictactoe_computer_qlearning:TicTacToeComputerQLearning',
+    'TicTacToeComputerRandom': 'players.tictactoe_computer_random:TicTacToeComputerRandom',
+    'TicTacToeComputerTensorflow':
+        'players.tictactoe_computer_tensorflow:TicTacToeComputerTensorflow',
+    'TicTacToeHuman': 'players.tictactoe_human:TicTacToeHuman',
+    'TicTacToeInferenceClient': 'players.tictactoe_inference_server:TicTacToeInferenceClient',
+    'TicTacToeInferenceServer': 'players.tictactoe_inference_server:TicTacToeInferenceServer',
+}
+
+player_registry = {}
+
+
+def __getattr__(name):
+    """
+    Import a player class on first access (e.g. from players import TicTacToeHuman)
+
+    @param name: the name of the class
+    @return: the class
+    """
+    if name not in player_classes:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    player_class = load_class(player_classes[name])
+    globals()[name] = player_class
+    return player_class
+
+
+def get_player_class(name):
+    """
+    Get the class of a registered player, importing its module if needed
+
+    @param name: the registered name of the player
+    @return: the class
+    """
+    player_class = player_registry[name]
+    if not isinstance(player_class, type):
+        player_class = load_class(player_class)
+        player_registry[name] = player_class
+    return player_class
+
+
+def get_player_names():
+    """
+    Get the names of the registered players
+
+    @return: a list with the names, in registration order
+    """
+    return list(player_registry)
+
+
+def load_class(class_path):
+    """
+    Import a class given as a 'module:Class' string
+
+    @param class_path: the string with the module path and the class name
+    @return: the class
+    """
+    module_name, class_name = class_path.split(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def register_player(name, player_class):
+    """
+    Register a player, e.g. from the module of a plugin
+
+    @param name: the name of the player, e.g. as given in the command line
+    @param player_class: either the class of the player, or a 'module:Class' string
+                         for importing it on first use
+    """
+    player_registry[name] = player_class
+
 
-from .tictactoe_computer_naive import TicTacToeComputerNaive
-from .tictactoe_computer_qlearning import TicTacToeComputerQLearning
-from .tictactoe_computer_random import TicTacToeComputerRandom
-from .tictactoe_computer_tensorflow import TicTacToeComputerTensorflow
-from .tictactoe_human import TicTacToeHuman
+register_player('Naive', player_classes['TicTacToeComputerNaive'])
+register_player('Random', player_classes['TicTacToeComputerRandom'])
+register_player('Q-Learning', player_classes['TicTacToeComputerQLearning'])
+register_player('Tensorflow', player_classes['TicTacToeComputerTensorflow'])
+register_player('Minimax', player_classes['TicTacToeComputerMinimax'])
+register_player('MCTS', player_classes['TicTacToeComputerMCTS'])
+register_player('Numpy', player_classes['TicTacToeComputerNumpy'])
+register_player('Frozen', player_classes['TicTacToeComputerFrozen'])
 
-__all__ = ['TicTacToeComputerNaive', 'TicTacToeComputerQLearning',
-           'TicTacToeComputerRandom', 'TicTacToeComputerTensorflow',
-           'TicTacToeHuman']
+__all__ = sorted(player_classes) + ['get_player_class', 'get_player_names', 'register_player']
@@ -0,0 +1,264 @@
+"""
+The implementation of the Tic-Tac-Toe player component
+that plays a greedy policy compiled from a trained player
+"""
+from __future__ import print_function
+
+import copy
+import os
+import struct
+
+from games.tictactoe_bitboard import TicTacToeBitboard
+from games.tictactoe_game_state import TicTacToeGameState
+
+from .abstract_tictactoe_player import AbstractTicTacToePlayer
+
+
+class TicTacToeComputerFrozen(AbstractTicTacToePlayer):
+    """
+    The implementation of the Tic-Tac-Toe player component
+    that plays a greedy policy compiled from a trained player.
+
+    The policy is a byte array indexed by the base-3 key of the game state
+    (from the point of view of the player, with one digit per seat and the
+    first seat as the most significant digit), which holds the seat index
+    (row * board_size + col) of the best move, so a move is one lookup and
+    the player never learns or changes. The array has 3 ** (board_size ** 2)
+    entries, so the policies are meant for small boards (up to MAX_BOARD_SIZE).
+    """
+
+    EMPTY_SEAT = 0
+    COM_PLAYER_ID = 1
+    OPPONENT_PLAYER_ID = 2
+
+    NO_MOVE = 0xff
+    # a 4x4 policy takes 43 MB, and a 5x5 one would take 847 GB
+    MAX_BOARD_SIZE = 4
+
+    # the player plays a loaded (or compiled) policy only
+    MODEL_ONLY = True
+
+    FILE_MAGIC = b'TTTPOLI1'
+    FILE_HEADER = struct.Struct('<8s48sII')
+
+
+    def __init__(self, policy=None, board_size=3, tag=''):
+        """
+        Constructor
+
+        @param policy: the byte array with the best move of every game state,
+                       as given by compile_policy, or None for loading it with load_model
+        @param board_size: the number of rows and columns of the board
+        @param tag: a short string that identifies the compiled player
+        """
+        self.epsilon = 0.0
+        self.board_size = board_size
+        self.policy = policy
+        self.tag = tag
+        self.seat_weights = tuple(3 ** (board_size * board_size - 1 - x)
+                                  for x in range(board_size * board_size))
+        self.player_id = None
+
+
+    def __get_move(self, key, seats):
+        """
+        Get the move of a game state
+
+        @param key: the key of the game state
+        @param seats: a flatten list with the seats, where the free seats are falsy
+        @return: a tuple with the x and y values of the selected seat
+        """
+        if self.policy is None:
+            raise ValueError("No policy is loaded")
+        seat_index = self.policy[key]
+        if seat_index == self.NO_MOVE:
+            # a game state that the compiled player never reaches, e.g. after a win
+            seat_index = next(x for x, seat in enumerate(seats) if not seat)
+        return divmod(seat_index, self.board_size)
+
+
+    @staticmethod
+    def compile_policy(player, board_size=None, win_size=None):
+        """
+        Compile the greedy policy of a trained player, by enumerating every game state
+        that is reachable from the empty board (for either seat of the player) and
+        asking the player for its best move once per game state
+
+        @param player: the instance of the trained player, which implements
+                       get_best_move(seats, board_size) without changing itself
+        @param board_size: the number of rows and columns of the board, or None for
+                           the board size of the player (3 if it has played no game)
+        @param win_size: the winning line size, or None for the winning line size
+                         of the player, if it has one, else 3
+        @return: a bytearray with the seat index of the best move per game state key
+        """
+        if board_size is None:
+            board_size = getattr(player, 'board_size', None) or 3
+        if win_size is None:
+            win_size = getattr(player, 'win_size', None) or 3
+        if board_size > TicTacToeComputerFrozen.MAX_BOARD_SIZE:
+            raise ValueError("The policy of a {0}x{0} board would have 3 ** {1} entries, "
+                             "so the board size must be at most {2}".format(
+                                 board_size, board_size * board_size,
+                                 TicTacToeComputerFrozen.MAX_BOARD_SIZE))
+        num_of_seats = board_size * board_size
+        seat_weights = [3 ** (num_of_seats - 1 - x) for x in range(num_of_seats)]
+        seat_win_masks = TicTacToeBitboard.get_seat_win_masks(board_size, win_size)
+        full_mask = (1 << num_of_seats) - 1
+        policy = bytearray([TicTacToeComputerFrozen.NO_MOVE]) * 3 ** num_of_seats
+        # the seat masks and the keys (without the digit) of the player to move and its opponent
+        stack = [(0, 0, 0, 0)]
+        is_visited = bytearray(len(policy))
+        is_visited[0] = 1
+        while stack:
+            own_mask, opponent_mask, own_key, opponent_key = stack.pop()
+            occupied_mask = own_mask | opponent_mask
+            seats = [TicTacToeComputerFrozen.COM_PLAYER_ID if own_mask >> x & 1 else
+                     TicTacToeComputerFrozen.OPPONENT_PLAYER_ID if opponent_mask >> x & 1 else
+                     TicTacToeComputerFrozen.EMPTY_SEAT for x in range(num_of_seats)]
+            row, col = player.get_best_move(seats, board_size)
+            policy[own_key * TicTacToeComputerFrozen.COM_PLAYER_ID
+                   + opponent_key * TicTacToeComputerFrozen.OPPONENT_PLAYER_ID] = \
+                row * board_size + col
+            for seat_index in range(num_of_seats):
+                seat_bit = 1 << seat_index
+                if occupied_mask & seat_bit:
+                    continue
+                next_own_mask = own_mask | seat_bit
+                if occupied_mask | seat_bit == full_mask or \
+                        any(next_own_mask & x == x for x in seat_win_masks[seat_index]):
+                    continue
+                # the opponent moves next, so the seats swap their points of view
+                next_own_key = own_key + seat_weights[seat_index]
+                next_key = opponent_key * TicTacToeComputerFrozen.COM_PLAYER_ID \
+                           + next_own_key * TicTacToeComputerFrozen.OPPONENT_PLAYER_ID
+                if not is_visited[next_key]:
+                    is_visited[next_key] = 1
+                    stack.append((opponent_mask, next_own_mask, opponent_key, next_own_key))
+        return policy
+
+
+    @staticmethod
+    def compile_player(player, board_size=None, win_size=None):
+        """
+        Compile the greedy policy of a trained player into a new frozen player
+
+        @param player: the instance of the trained player (see compile_policy)
+        @param board_size: the number of rows and columns of the board, or None for
+                           the board size of the player (3 if it has played no game)
+        @param win_size: the winning line size, or None for the winning line size
+                         of the player, if it has one, else 3
+        @return: the instance of TicTacToeComputerFrozen
+        """
+        if board_size is None:
+            board_size = getattr(player, 'board_size', None) or 3
+        return TicTacToeComputerFrozen(
+            TicTacToeComputerFrozen.compile_policy(player, board_size, win_size),
+            board_size, type(player).__name__)
+
+
+    def end_of_game(self, winning_player_id):
+        """
+        End of game.
+        """
+        pass
+
+
+    def end_of_games(self, game_ids, winners):
+        """
+        End of batched games.
+        """
+        pass
+
+
+    def get_next_move(self, game_state):
+        """
+        Get the next move
+
+        @param game_state: the current game state given by the game engine
+        @return: a tuple with the x and y values of the selected seat
+        """
+        seats = [seat for sublist in game_state for seat in sublist]
+        if isinstance(game_state, TicTacToeGameState):
+            # the engine keeps the key of the game state in the notation of the policy
+            return self.__get_move(game_state.get_position_key(self.player_id), seats)
+        key = 0
+        for seat, weight in zip(seats, self.seat_weights):
+            if seat:
+                key += weight * (self.COM_PLAYER_ID if seat == self.player_id
+                                 else self.OPPONENT_PLAYER_ID)
+        return self.__get_move(key, seats)
+
+
+    def get_next_moves(self, game_states, game_ids):
+        """
+        Get the next move of a batch of games
+
+        @param game_states: an (M, board_size, board_size) int8 array with the game states
+                            given by the batch game engine
+        @param game_ids: the indexes of the games in the batch
+        @return: a list with the x and y values of the selected seats
+        """
+        # the batch game engine gives the game states in the notation of the policy
+        flat_game_states = game_states.reshape(len(game_states), -1).tolist()
+        return [self.__get_move(sum(seat * weight for seat, weight
+                                    in zip(seats, self.seat_weights) if seat), seats)
+                for seats in flat_game_states]
+
+
+    def load_model(self, path):
+        """
+        Load a policy from a file written by save_model
+
+        @param path: the path of the file
+        """
+        with open(path, 'rb') as model_file:
+            magic, tag, board_size, size = self.FILE_HEADER.unpack(
+                model_file.read(self.FILE_HEADER.size))
+            if magic != self.FILE_MAGIC:
+                raise ValueError("{} is not a policy file".format(path))
+            policy = bytearray(model_file.read(size))
+        if len(policy) != 3 ** (board_size * board_size):
+            raise ValueError("{} is truncated".format(path))
+        self.policy = policy
+        self.board_size = board_size
+        self.tag = tag.rstrip(b'\0').decode('ascii')
+        self.seat_weights = tuple(3 ** (board_size * board_size - 1 - x)
+                                  for x in range(board_size * board_size))
+
+
+    def save_model(self, path):
+        """
+        Save the policy into a binary file
+
+        @param path: the path of the file
+        """
+        if self.policy is None:
+            raise ValueError("No policy is loaded")
+        tmp_path = '{}.tmp'.format(path)
+        with open(tmp_path, 'wb') as model_file:
+            model_file.write(self.FILE_HEADER.pack(self.FILE_MAGIC, self.tag.encode('ascii'),
+                                                   self.board_size, len(self.policy)))
+            model_file.write(self.policy)
+        os.replace(tmp_path, path)
+
+
+    def set_player_id(self, player_id):
+        """
+        Set the player's symbol in game
+
+        @param player_id: the symbol used by the player
+        """
+        self.player_id = player_id
+
+
+    def spawn(self):
+        """
+        Create an instance of the player for one more concurrent game,
+        which shares the policy of this one
+
+        @return: the new instance of the player
+        """
+        player = copy.copy(self)
+        player.player_id = None
+        return player
@@ -0,0 +1,376 @@
+"""
+The implementation of the Tic-Tac-Toe player component
+using Monte Carlo Tree Search
+"""
+from __future__ import print_function
+
+import math
+import multiprocessing
+import random
+import time
+
+from games.tictactoe_bitboard import TicTacToeBitboard
+from games.tictactoe_game_state import TicTacToeGameState
+
+from .abstract_tictactoe_player import AbstractTicTacToePlayer
+
+
+class TicTacToeMCTSNode(object):
+    """
+    A node of the search tree, which is a position of the board
+    from the point of view of the player to move
+    """
+
+    __slots__ = ('own_mask', 'opponent_mask', 'seat', 'parent', 'children', 'untried_seats',
+                 'visits', 'value', 'terminal_value')
+
+
+    def __init__(self, own_mask, opponent_mask, seat=None, parent=None, terminal_value=None):
+        """
+        Constructor
+
+        @param own_mask: the bitmask of the seats of the player to move
+        @param opponent_mask: the bitmask of the seats of the opponent
+        @param seat: the index of the seat of the move that led to the node
+        @param parent: the parent node, or None for the root
+        @param terminal_value: the value of a finished game for the player
+                               that led to the node, or None if the game goes on
+        """
+        self.own_mask = own_mask
+        self.opponent_mask = opponent_mask
+        self.seat = seat
+        self.parent = parent
+        self.children = {}
+        self.untried_seats = None
+        self.visits = 0
+        self.value = 0.0
+        self.terminal_value = terminal_value
+
+
+class TicTacToeComputerMCTS(AbstractTicTacToePlayer):
+    """
+    The implementation of the Tic-Tac-Toe player component
+    using Monte Carlo Tree Search (UCT).
+
+    The search tree is kept across the moves of a game: the root moves to the
+    selected child after each move and to the child of the actual move of the
+    opponent, found by comparing the boards, on the next one.
+
+    The rollouts can be played by a pool of worker processes. In that case,
+    a batch of leaves is selected at once, and every node on the path to
+    a selected leaf gets a virtual loss, so the next selections of the batch
+    spread over the tree instead of following the same path. The pool is
+    created on the first search and stopped by close. A player in a daemonic
+    process (e.g. a worker of another pool), which cannot have child processes,
+    plays the rollouts of the batches in its own process.
+    """
+
+    WIN_VALUE = 1.0
+    LOSS_VALUE = 0.0
+    DRAW_VALUE = 0.5
+
+
+    def __init__(self, win_size=3, num_of_simulations=1000, time_budget=None, num_of_workers=0,
+                 leaves_per_worker=8, exploration=math.sqrt(2)):
+        """
+        Constructor
+
+        @param win_size: the winning line size of the game, if the game state given by
+                         the engine does not have one (e.g. a board of plain lists)
+        @param num_of_simulations: the number of simulations (rollouts) per move
+        @param time_budget: the maximum search time per move in seconds.
+                            If given, it is used instead of the number of simulations.
+        @param num_of_workers: the number of worker processes playing the rollouts,
+                               0 for playing them in the current process
+        @param leaves_per_worker: the number of leaves selected for every worker
+                                  per batch of rollouts
+        @param exploration: the exploration constant of the UCT formula
+        """
+        self.win_size = win_size
+        self.num_of_simulations = num_of_simulations
+        self.time_budget = time_budget
+        self.num_of_workers = num_of_workers
+        self.leaves_per_worker = leaves_per_worker
+        self.exploration = exploration
+
+        self.pool = None
+        self.root = None
+        self.board_size = None
+        self.board_win_size = None
+        self.player_id = None
+
+
+    def __backpropagate(self, node, value):
+        """
+        Add the value of a simulation to the nodes of its path.
+        The visits have already been counted during the selection.
+
+        @param node: the leaf node of the simulation
+        @param value: the value of the simulation for the player that led to the leaf
+        """
+        while node is not None:
+            node.value += value
+            value = self.WIN_VALUE - value
+            node = node.parent
+
+
+    def __expand(self, node):
+        """
+        Add a child node for a random untried move
+
+        @param node: the node to expand
+        @return: the child node
+        """
+        untried_seats = node.untried_seats
+        seat = untried_seats.pop(random.randrange(len(untried_seats)))
+        next_own_mask = node.own_mask | 1 << seat
+        terminal_value = None
+        if self.__is_winning_move(next_own_mask, seat):
+            terminal_value = self.WIN_VALUE
+        elif next_own_mask | node.opponent_mask == self.full_mask:
+            terminal_value = self.DRAW_VALUE
+        child = TicTacToeMCTSNode(node.opponent_mask, next_own_mask, seat, node, terminal_value)
+        node.children[seat] = child
+        return child
+
+
+    def __get_free_seats(self, node):
+        """
+        Get the available (free) seats of a node
+
+        @param node: the node
+        @return: a list with the indexes of the free seats
+        """
+        occupied_mask = node.own_mask | node.opponent_mask
+        return [x for x in range(self.board_size * self.board_size) if not occupied_mask >> x & 1]
+
+
+    def __get_root(self, own_mask, opponent_mask):
+        """
+        Get the root of the search tree for the current game state. The subtree of
+        the previous search under the actual move of the opponent is reused.
+
+        @param own_mask: the bitmask of the seats of the player
+        @param opponent_mask: the bitmask of the seats of the opponent
+        @return: the root node
+        """
+        root = self.root
+        if root is not None and root.opponent_mask == own_mask \
+                and root.own_mask & ~opponent_mask == 0:
+            opponent_move = opponent_mask ^ root.own_mask
+            if opponent_move and opponent_move & (opponent_move - 1) == 0:
+                child = root.children.get(opponent_move.bit_length() - 1)
+                if child is not None:
+                    child.parent = None
+                    return child
+        return TicTacToeMCTSNode(own_mask, opponent_mask)
+
+
+    def __init_board(self, board_size, win_size):
+        """
+        Precompute the winning lines of a board
+
+        @param board_size: the number of rows and columns of the board
+        @param win_size: the winning line size
+        """
+        self.board_size = board_size
+        self.board_win_size = win_size
+        self.full_mask = (1 << board_size * board_size) - 1
+        self.seat_win_masks = TicTacToeBitboard.get_seat_win_masks(board_size, win_size)
+
+
+    def __is_winning_move(self, own_mask, seat):
+        """
+        Check if the player completed a winning line with the move
+
+        @param own_mask: the bitmask of the seats of the player, including the move
+        @param seat: the index of the seat of the move
+        @return: boolean value
+        """
+        for line_mask in self.seat_win_masks[seat]:
+            if own_mask & line_mask == line_mask:
+                return True
+        return False
+
+
+    def __play_rollouts(self, leaves):
+        """
+        Play a random game from every leaf, in the pool of workers if any
+
+        @param leaves: a list with the leaf nodes
+        @return: a list with the value of each game for the player to move at the leaf
+        """
+        positions = [(x.own_mask, x.opponent_mask) for x in leaves]
+        if self.num_of_workers <= 1 or multiprocessing.current_process().daemon:
+            return self.play_rollouts((self.board_size, self.board_win_size,
+                                       random.getrandbits(64), positions))
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.num_of_workers)
+        tasks = [(self.board_size, self.board_win_size, random.getrandbits(64),
+                  positions[x::self.num_of_workers]) for x in range(self.num_of_workers)]
+        values = [None] * len(positions)
+        for x, task_values in enumerate(self.pool.map(self.play_rollouts, tasks)):
+            values[x::self.num_of_workers] = task_values
+        return values
+
+
+    def __search(self, root):
+        """
+        Run the simulations of a move, until the number of simulations
+        or the time budget is exhausted
+
+        @param root: the root node
+        @return: the index of the most visited seat
+        """
+        batch_size = max(self.num_of_workers, 1) * self.leaves_per_worker
+        if self.num_of_workers <= 1:
+            batch_size = 1
+        deadline = None
+        if self.time_budget is not None:
+            deadline = time.time() + self.time_budget
+        num_of_simulations = 0
+        while True:
+            leaves = []
+            for _ in range(batch_size):
+                leaf = self.__select(root)
+                if leaf.terminal_value is not None:
+                    self.__backpropagate(leaf, leaf.terminal_value)
+                else:
+                    leaves.append(leaf)
+            if leaves:
+                for leaf, value in zip(leaves, self.__play_rollouts(leaves)):
+                    self.__backpropagate(leaf, self.WIN_VALUE - value)
+            num_of_simulations += batch_size
+            if deadline is not None:
+                if time.time() >= deadline:
+                    break
+            elif num_of_simulations >= self.num_of_simulations:
+                break
+        return max(root.children.values(), key=lambda x: x.visits).seat
+
+
+    def __select(self, root):
+        """
+        Select a leaf with the UCT formula and expand it. Every node on the path
+        is visited (virtual loss) until the value of the simulation is added.
+
+        @param root: the root node
+        @return: the leaf node
+        """
+        node = root
+        node.visits += 1
+        while node.terminal_value is None:
+            if node.untried_seats is None:
+                node.untried_seats = self.__get_free_seats(node)
+            if node.untried_seats:
+                node = self.__expand(node)
+                node.visits += 1
+                break
+            log_visits = math.log(node.visits)
+            node = max(node.children.values(),
+                       key=lambda x: x.value / x.visits +
+                       self.exploration * math.sqrt(log_visits / x.visits))
+            node.visits += 1
+        return node
+
+
+    def __getstate__(self):
+        """
+        Get the state of the player for pickling, without the pool of workers
+
+        @return: a dictionary with the attributes of the player
+        """
+        state = self.__dict__.copy()
+        state['pool'] = None
+        return state
+
+
+    def close(self):
+        """
+        Stop the pool of workers, if any. A later search starts a new one.
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+    def end_of_game(self, winning_player_id):
+        """
+        End of game. Drop the search tree
+
+        @param winning_player_id: the winning player ID (symbol), given by the game engine
+        """
+        self.root = None
+
+
+    def get_next_move(self, game_state):
+        """
+        Get the next move
+
+        @param game_state: the current game state given by the game engine
+        @return: a list with the x and y values of the selected seat
+        """
+        board_size = len(game_state)
+        win_size = getattr(game_state, 'win_size', None) or self.win_size
+        if board_size != self.board_size or win_size != self.board_win_size:
+            self.__init_board(board_size, win_size)
+            self.root = None
+        if isinstance(game_state, TicTacToeGameState):
+            own_mask, opponent_mask = game_state.get_seat_masks(self.player_id)
+        else:
+            own_mask = 0
+            opponent_mask = 0
+            for row, sublist in enumerate(game_state):
+                for col, seat in enumerate(sublist):
+                    if seat:
+                        if seat == self.player_id:
+                            own_mask |= 1 << row * board_size + col
+                        else:
+                            opponent_mask |= 1 << row * board_size + col
+        root = self.__get_root(own_mask, opponent_mask)
+        seat = self.__search(root)
+        self.root = root.children[seat]
+        self.root.parent = None
+        return divmod(seat, board_size)
+
+
+    @staticmethod
+    def play_rollouts(task):
+        """
+        Play a random game from every position of a task.
+        It runs in the worker processes, so it is kept free of any player state.
+
+        @param task: a tuple with the board size, the win size, the random seed
+                     and a list with the bitmasks (player to move, opponent) of every position
+        @return: a list with the value of each game for the player to move
+        """
+        board_size, win_size, seed, positions = task
+        seat_win_masks = TicTacToeBitboard.get_seat_win_masks(board_size, win_size)
+        rng = random.Random(seed)
+        values = []
+        for own_mask, opponent_mask in positions:
+            occupied_mask = own_mask | opponent_mask
+            free_seats = [x for x in range(board_size * board_size) if not occupied_mask >> x & 1]
+            rng.shuffle(free_seats)
+            masks = [own_mask, opponent_mask]
+            value = TicTacToeComputerMCTS.DRAW_VALUE
+            turn = 0
+            for seat in free_seats:
+                masks[turn] |= 1 << seat
+                if any(masks[turn] & x == x for x in seat_win_masks[seat]):
+                    value = TicTacToeComputerMCTS.WIN_VALUE if turn == 0 \
+                            else TicTacToeComputerMCTS.LOSS_VALUE
+                    break
+                turn ^= 1
+            values.append(value)
+        return values
+
+
+    def set_player_id(self, player_id):
+        """
+        Set the player's symbol in game
+
+        @param player_id: the symbol used by the player
+        """
+        self.player_id = player_id
@@ -0,0 +1,345 @@
+"""
+The implementation of the Tic-Tac-Toe player component
+using a negamax search with alpha-beta pruning
+"""
+from __future__ import print_function
+
+import time
+
+from games.tictactoe_bitboard import TicTacToeBitboard
+from games.tictactoe_game_state import TicTacToeGameState
+
+from .abstract_tictactoe_player import AbstractTicTacToePlayer
+
+
+class SearchTimeout(Exception):
+    """
+    Raised when the time budget of the search for the next move is exhausted
+    """
+    pass
+
+
+class TicTacToeComputerMinimax(AbstractTicTacToePlayer):
+    """
+    The implementation of the Tic-Tac-Toe player component
+    using a negamax search with alpha-beta pruning.
+
+    The board is kept as a bitmask per player and the search deepens
+    iteratively until the board is solved or the time budget of the move
+    is exhausted. The searched positions are kept in a fixed-size
+    transposition table, with a depth-preferred replacement policy.
+    The winning line size is taken from the game state given by the engine.
+    """
+
+    WIN_SCORE = 1000000
+    DRAW_SCORE = 0
+    # the heuristic scores stay below the scores of the won and lost positions
+    MAX_HEURISTIC_SCORE = WIN_SCORE // 2 - 1
+
+    EXACT = 0
+    LOWER_BOUND = 1
+    UPPER_BOUND = 2
+
+    TIME_CHECK_INTERVAL = 1024
+
+
+    def __init__(self, win_size=3, time_budget=1.0, max_depth=None,
+                 transposition_table_size=2 ** 20):
+        """
+        Constructor
+
+        @param win_size: the winning line size of the game, if the game state given by
+                         the engine does not have one (e.g. a board of plain lists)
+        @param time_budget: the maximum search time per move in seconds
+        @param max_depth: the maximum search depth in moves, None for no limit
+        @param transposition_table_size: the number of entries of the transposition table,
+                                         rounded up to a power of 2
+        """
+        self.win_size = win_size
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+
+        self.transposition_table_size = 1 << max(transposition_table_size - 1, 1).bit_length()
+        self.transposition_table = [None] * self.transposition_table_size
+        self.generation = 0
+
+        self.board_size = None
+        self.board_win_size = None
+        self.player_id = None
+
+
+    def __evaluate(self, own_mask, opponent_mask):
+        """
+        Evaluate a non-terminal position from the point of view of the player to move.
+        Every winning line that is still open for only one player counts in favor
+        of that player, exponentially to the number of seats already occupied.
+        The score is clamped to MAX_HEURISTIC_SCORE, so that the many lines of
+        a large board never score a position as won or lost.
+
+        @param own_mask: the bitmask of the seats of the player to move
+        @param opponent_mask: the bitmask of the seats of the opponent
+        @return: the score of the position
+        """
+        score = 0
+        for line_mask in self.win_line_masks:
+            own_seats = own_mask & line_mask
+            opponent_seats = opponent_mask & line_mask
+            if own_seats and not opponent_seats:
+                score += 4 ** bin(own_seats).count('1')
+            elif opponent_seats and not own_seats:
+                score -= 4 ** bin(opponent_seats).count('1')
+        return max(-self.MAX_HEURISTIC_SCORE, min(score, self.MAX_HEURISTIC_SCORE))
+
+
+    def __init_board(self, board_size, win_size):
+        """
+        Precompute the winning lines and the move ordering of a board
+
+        @param board_size: the number of rows and columns of the board
+        @param win_size: the winning line size
+        """
+        self.board_size = board_size
+        self.board_win_size = win_size
+        self.full_mask = (1 << board_size * board_size) - 1
+        self.seat_win_masks = TicTacToeBitboard.get_seat_win_masks(board_size, win_size)
+        self.win_line_masks = tuple(sum(1 << seat for seat in line) for line in
+                                    TicTacToeBitboard.get_win_lines(board_size, win_size))
+        # seats that take part in more winning lines are searched first
+        self.ordered_seats = tuple(sorted(range(board_size * board_size),
+                                          key=lambda x: -len(self.seat_win_masks[x])))
+        # the positions searched with other winning lines are not valid any more
+        self.transposition_table = [None] * self.transposition_table_size
+
+
+    def __is_winning_move(self, own_mask, seat):
+        """
+        Check if the player completed a winning line with the move
+
+        @param own_mask: the bitmask of the seats of the player, including the move
+        @param seat: the index of the seat of the move
+        @return: boolean value
+        """
+        for line_mask in self.seat_win_masks[seat]:
+            if own_mask & line_mask == line_mask:
+                return True
+        return False
+
+
+    def __negamax(self, own_mask, opponent_mask, depth, alpha, beta, ply):
+        """
+        Search a position with the negamax algorithm and alpha-beta pruning
+
+        @param own_mask: the bitmask of the seats of the player to move
+        @param opponent_mask: the bitmask of the seats of the opponent
+        @param depth: the remaining search depth
+        @param alpha: the lower bound of the search window
+        @param beta: the upper bound of the search window
+        @param ply: the distance from the root of the search
+        @return: a tuple with the score of the position and the best seat
+        """
+        self.nodes += 1
+        if self.nodes % self.TIME_CHECK_INTERVAL == 0 and time.time() > self.deadline:
+            raise SearchTimeout()
+
+        tt_move = None
+        tt_entry = self.__probe(own_mask, opponent_mask)
+        if tt_entry is not None:
+            tt_depth, tt_flag, tt_score, tt_move = tt_entry
+            if tt_depth >= depth:
+                tt_score = self.__score_from_table(tt_score, ply)
+                if tt_flag == self.EXACT:
+                    return tt_score, tt_move
+                if tt_flag == self.LOWER_BOUND:
+                    alpha = max(alpha, tt_score)
+                elif tt_flag == self.UPPER_BOUND:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    return tt_score, tt_move
+
+        if depth == 0:
+            return self.__evaluate(own_mask, opponent_mask), None
+
+        original_alpha = alpha
+        occupied_mask = own_mask | opponent_mask
+        best_score = None
+        best_move = None
+        for seat in self.__order_moves(occupied_mask, tt_move):
+            next_own_mask = own_mask | 1 << seat
+            if self.__is_winning_move(next_own_mask, seat):
+                score = self.WIN_SCORE - ply
+            elif next_own_mask | opponent_mask == self.full_mask:
+                score = self.DRAW_SCORE
+            else:
+                score = -self.__negamax(opponent_mask, next_own_mask, depth - 1,
+                                        -beta, -alpha, ply + 1)[0]
+            if best_score is None or score > best_score:
+                best_score = score
+                best_move = seat
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        flag = self.EXACT
+        if best_score <= original_alpha:
+            flag = self.UPPER_BOUND
+        elif best_score >= beta:
+            flag = self.LOWER_BOUND
+        self.__store(own_mask, opponent_mask, depth, flag,
+                     self.__score_to_table(best_score, ply), best_move)
+        return best_score, best_move
+
+
+    def __order_moves(self, occupied_mask, tt_move):
+        """
+        Get the free seats in search order
+
+        @param occupied_mask: the bitmask of the occupied seats
+        @param tt_move: the best seat found by a previous search, or None
+        @return: a list with the indexes of the free seats
+        """
+        moves = [x for x in self.ordered_seats if not occupied_mask >> x & 1 and x != tt_move]
+        if tt_move is not None:
+            moves.insert(0, tt_move)
+        return moves
+
+
+    def __probe(self, own_mask, opponent_mask):
+        """
+        Look up a position in the transposition table
+
+        @param own_mask: the bitmask of the seats of the player to move
+        @param opponent_mask: the bitmask of the seats of the opponent
+        @return: a tuple with the depth, the flag, the score and the best seat
+                 of the stored search, or None if the position is missing
+        """
+        entry = self.transposition_table[hash((own_mask, opponent_mask))
+                                         & (self.transposition_table_size - 1)]
+        if entry is None or entry[0] != own_mask or entry[1] != opponent_mask:
+            return None
+        return entry[2:6]
+
+
+    def __score_from_table(self, score, ply):
+        """
+        Convert a stored win/loss score, relative to the stored position,
+        into a score relative to the root of the search
+
+        @param score: the stored score
+        @param ply: the distance of the position from the root of the search
+        @return: the score
+        """
+        if score > self.WIN_SCORE // 2:
+            return score - ply
+        if score < -self.WIN_SCORE // 2:
+            return score + ply
+        return score
+
+
+    def __score_to_table(self, score, ply):
+        """
+        Convert a win/loss score, relative to the root of the search,
+        into a score relative to the position, for storing it
+
+        @param score: the score
+        @param ply: the distance of the position from the root of the search
+        @return: the score to store
+        """
+        if score > self.WIN_SCORE // 2:
+            return score + ply
+        if score < -self.WIN_SCORE // 2:
+            return score - ply
+        return score
+
+
+    def __search(self, own_mask, opponent_mask):
+        """
+        Search the best move with iterative deepening, until the board is solved,
+        the maximum depth is reached or the time budget is exhausted
+
+        @param own_mask: the bitmask of the seats of the player
+        @param opponent_mask: the bitmask of the seats of the opponent
+        @return: the index of the best seat
+        """
+        self.generation += 1
+        self.nodes = 0
+        self.deadline = time.time() + self.time_budget
+        num_of_free_seats = bin(self.full_mask & ~(own_mask | opponent_mask)).count('1')
+        max_depth = num_of_free_seats
+        if self.max_depth is not None:
+            max_depth = min(max_depth, self.max_depth)
+
+        best_move = self.__order_moves(own_mask | opponent_mask, None)[0]
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self.__negamax(own_mask, opponent_mask, depth,
+                                             -self.WIN_SCORE - 1, self.WIN_SCORE + 1, 0)
+            except SearchTimeout:
+                break
+            best_move = move
+            if abs(score) > self.WIN_SCORE // 2:
+                break
+        return best_move
+
+
+    def __store(self, own_mask, opponent_mask, depth, flag, score, best_move):
+        """
+        Store a searched position in the transposition table. An entry is replaced
+        only by a search of the same or greater depth, unless it was stored during
+        the search of an earlier move.
+
+        @param own_mask: the bitmask of the seats of the player to move
+        @param opponent_mask: the bitmask of the seats of the opponent
+        @param depth: the search depth
+        @param flag: whether the score is EXACT, a LOWER_BOUND or an UPPER_BOUND
+        @param score: the score of the position
+        @param best_move: the best seat
+        """
+        index = hash((own_mask, opponent_mask)) & (self.transposition_table_size - 1)
+        entry = self.transposition_table[index]
+        if entry is None or entry[6] != self.generation or entry[2] <= depth:
+            self.transposition_table[index] = (own_mask, opponent_mask, depth, flag, score,
+                                               best_move, self.generation)
+
+
+    def end_of_game(self, winning_player_id):
+        """
+        End of game.
+
+        @param winning_player_id: the winning player ID (symbol), given by the game engine
+        """
+        pass
+
+
+    def get_next_move(self, game_state):
+        """
+        Get the next move
+
+        @param game_state: the current game state given by the game engine
+        @return: a list with the x and y values of the selected seat
+        """
+        board_size = len(game_state)
+        win_size = getattr(game_state, 'win_size', None) or self.win_size
+        if board_size != self.board_size or win_size != self.board_win_size:
+            self.__init_board(board_size, win_size)
+        if isinstance(game_state, TicTacToeGameState):
+            own_mask, opponent_mask = game_state.get_seat_masks(self.player_id)
+        else:
+            own_mask = 0
+            opponent_mask = 0
+            for row, sublist in enumerate(game_state):
+                for col, seat in enumerate(sublist):
+                    if seat:
+                        if seat == self.player_id:
+                            own_mask |= 1 << row * board_size + col
+                        else:
+                            opponent_mask |= 1 << row * board_size + col
+        return divmod(self.__search(own_mask, opponent_mask), board_size)
+
+
+    def set_player_id(self, player_id):
+        """
+        Set the player's symbol in game
+
+        @param player_id: the symbol used by the player
+        """
+        self.player_id = player_id
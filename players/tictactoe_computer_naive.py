@@ -6,7 +6,12 @@ from __future__ import print_function
 
 import random
 
+from games.tictactoe_game_state import TicTacToeGameState
+
 from .abstract_tictactoe_player import AbstractTicTacToePlayer
+from .tictactoe_game_context import TicTacToeContextPlayer, TicTacToeGameContext
+from .tictactoe_q_table import TicTacToeDictQTable, TicTacToeMappedQTable, TicTacToeQTable
+from .tictactoe_symmetry import TicTacToeSymmetry
 
 
 class TicTacToeComputerNaive(AbstractTicTacToePlayer):
@@ -20,36 +25,105 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
     COM_LOSS_PENALTY = 0.0
     DRAW_REWARD = 0.5
 
+    EMPTY_SEAT = 0
     COM_PLAYER_ID = 1
     OPPONENT_PLAYER_ID = 2
 
 
-    def __init__(self, epsilon=1.0, epsilon_decay_step=10e-5):
+    def __init__(self, epsilon=1.0, epsilon_decay_step=10e-5, use_symmetries=False,
+                 frozen=False, max_q_values=None, eviction=TicTacToeQTable.EVICTION_LRU):
         """
         Constructor
 
         @param epsilon: the epsilon parameter (randomness of the next move)
                         of Q-Learning algorithm [0, 1]
         @param epsilon_decay_step: the decay factor for updating the epsilon parameter [0, 1]
+        @param use_symmetries: boolean value, True for mapping the game states to a canonical
+                               orientation (rotation/reflection) of the board
+        @param frozen: boolean value, True for playing greedy moves only and never
+                       changing the Q-Values (e.g. for sharing them between threads)
+        @param max_q_values: the maximum number of Q-Values kept in memory, or None for
+                             no limit. The evicted Q-Values start over from the initial value.
+        @param eviction: the eviction policy of the Q-Values, either 'lru' (least recently
+                         used) or 'lfu' (least frequently used)
         """
         self.epsilon = epsilon
         self.epsilon_decay_step = epsilon_decay_step
+        self.use_symmetries = use_symmetries
+        self.frozen = frozen
+
+        self.q_values = TicTacToeQTable(with_visits=True, max_size=max_q_values,
+                                        eviction=eviction)
+        self.board_size = None
+        self.context = TicTacToeGameContext()
+        self.batch_moves_history = {}
+
+
+    def __check_board_size(self, board_size):
+        """
+        Check that a board has the size of the boards of the Q-Values, which is the size
+        of the loaded model or of the first game of the player, since the keys of the
+        game states of different board sizes collide. The Q-Values of boards whose keys
+        do not fit in the 64-bit keys of TicTacToeQTable are switched to a dict-backed table.
+
+        @param board_size: the number of rows and columns of the board
+        """
+        if board_size == self.board_size:
+            return
+        if self.board_size is not None:
+            raise ValueError("The Q-Values are for a {0}x{0} board, not a {1}x{1} one"
+                             .format(self.board_size, board_size))
+        if 3 ** (board_size * board_size) * board_size * board_size - 1 > TicTacToeQTable.MAX_KEY \
+                and not isinstance(self.q_values, TicTacToeDictQTable):
+            if not isinstance(self.q_values, (TicTacToeQTable, TicTacToeMappedQTable)):
+                raise ValueError("The Q-Values of a {0}x{0} board do not fit in a {1}"
+                                 .format(board_size, type(self.q_values).__name__))
+            self.q_values = TicTacToeDictQTable.from_table(self.q_values)
+        self.board_size = board_size
+
+
+    def __encode_batch_state(self, game_state):
+        """
+        Transforms a game state given by the batch game engine into an internal representation.
+        The batch game engine gives the game state from the point of view of the player,
+        using the same notation with the internal one.
+
+        @param game_state: a 2D list with the game state given by the batch game engine
+        @return: the internal representation of the game state
+        """
+        return self.__encode_seats([seat for sublist in game_state for seat in sublist],
+                                   len(game_state))
 
-        self.q_values = {}
-        self.game_moves_history = []
-        self.player_id = None
+
+    def __encode_seats(self, seats, board_size):
+        """
+        Transforms the flatten seats of the board into an internal representation.
+        The game state is encoded as a base-3 integer, with one digit per seat
+        (the first seat is the most significant digit). When symmetries are used,
+        the board is encoded in its canonical orientation.
+
+        @param seats: a flatten list with the internal notation of every seat
+        @param board_size: the number of rows and columns of the board
+        @return: a tuple with the integer key of the game state and the seat
+                 permutation that maps the seats of the board to the encoded orientation
+        """
+        symmetry = TicTacToeSymmetry.get_symmetry(board_size, self.use_symmetries)
+        return symmetry.get_canonical_key(symmetry.get_keys(seats))
 
 
-    def __encode_state(self, game_state):
+    def __encode_state(self, game_state, player_id):
         """
         Transforms the 2D list game state into an internal representation
 
         @param game_state: a 2D list with the game state given by the game engine
-        @return: a (flatten) list with the internal representation of the game engine
+        @param player_id: the symbol used by the player
+        @return: the internal representation of the game state
         """
-        flatten_list = list(item for sublist in game_state for item in sublist)
-        encoded_state = tuple(map(self.__map_player_id, flatten_list))
-        return encoded_state
+        if not self.use_symmetries and isinstance(game_state, TicTacToeGameState):
+            # the engine keeps the key of the game state in the same notation
+            symmetry = TicTacToeSymmetry.get_symmetry(len(game_state), False)
+            return symmetry.get_canonical_key((game_state.get_position_key(player_id),))
+        return self.__encode_seats(self.__map_seats(game_state, player_id), len(game_state))
 
 
     def __get_free_seats(self, game_state):
@@ -60,6 +134,8 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
         @return: a list with the set of the available seats.
                  Each seat is a tuple with the x and y values.
         """
+        if isinstance(game_state, TicTacToeGameState):
+            return game_state.get_free_seats()
         free_seats = []
         for i in range(len(game_state)):
             for j in range(len(game_state[i])):
@@ -68,17 +144,31 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
         return tuple(free_seats)
 
 
-    def __get_next_greedy_move(self, game_state):
+    def __get_model_tag(self, board_size):
+        """
+        Get the tag that identifies the Q-Values of the player in a model file
+
+        @param board_size: the number of rows and columns of the board,
+                           or None if the player has not played any game
+        @return: a short string
+        """
+        return '{}{}{}'.format(type(self).__name__, '/symmetric' if self.use_symmetries else '',
+                               '' if board_size is None else '/{0}x{0}'.format(board_size))
+
+
+    def __get_next_greedy_move(self, encoded_game_state, free_seats, board_size):
         """
         Get the next move based on a greedy algorithm and the Q-Values
 
-        @param game_state: a 2D list with the game state
+        @param encoded_game_state: the internal representation of the game state
+        @param free_seats: a list with the available seats
+        @param board_size: the number of rows and columns of the board
         @return: a list with the x and y values of the selected seat
         """ 
         best_move = None
         best_score = None
-        for free_seat in self.__get_free_seats(game_state):
-            next_game_state_score = self.__get_score(game_state, free_seat)
+        for free_seat in free_seats:
+            next_game_state_score = self.__get_score(encoded_game_state, free_seat, board_size)
             if best_score is None:
                 best_score = next_game_state_score
                 best_move = free_seat
@@ -89,64 +179,112 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
         return best_move
 
 
-    def __get_next_random_move(self, game_state):
+    def __get_reward(self, is_win, is_loss):
         """
-        Get the next move based on a random selection
+        Get the reward of a finished game
 
-        @param game_state: a 2D list with the game state
-        @return: a list with the x and y values of the selected seat
+        @param is_win: boolean value, True if the player won the game
+        @param is_loss: boolean value, True if the player lost the game
+        @return: the reward for all moves taken during the game
         """
-        return random.choice(self.__get_free_seats(game_state))
+        reward = self.DRAW_REWARD
+        if is_win:
+            reward = self.COM_WIN_REWARD
+        elif is_loss:
+            reward = self.COM_LOSS_PENALTY
+        return reward
 
 
-    def __get_score(self, game_state, move):
+    def __get_score(self, encoded_game_state, move, board_size):
         """
         Get the Q-Value of the move
 
-        @param game_state: a 2D list with the game state
+        @param encoded_game_state: the internal representation of the game state
         @move: a list with the x and y values of the selected move
+        @param board_size: the number of rows and columns of the board
         @return: the Q-Value
         """
-        return self.q_values[self.__encode_state(game_state)][move][0]
+        return self.q_values.get(self.__get_state_move_key(encoded_game_state, move, board_size),
+                                 self.INITIAL_STATE_VALUE)
 
 
-    def __init_q_values(self, game_state):
+    def __get_state_move_key(self, encoded_game_state, move, board_size):
+        """
+        Get the key of a game state and move pair in the Q-Values table
+
+        @param encoded_game_state: the internal representation of the game state
+        @move: a list with the x and y values of the move
+        @param board_size: the number of rows and columns of the board
+        @return: an integer with the key
+        """
+        encoded_state, seat_permutation = encoded_game_state
+        return encoded_state * board_size * board_size \
+               + seat_permutation[move[0] * board_size + move[1]]
+
+
+    def __init_q_values(self, encoded_game_state, free_seats, board_size):
         """
         Initialize the Q-Values for the current game state and 
         the next possible game states, based on the available seats
         
-        @param game_state: a 2D list with the game state
+        @param encoded_game_state: the internal representation of the game state
+        @param free_seats: a list with the available seats
+        @param board_size: the number of rows and columns of the board
         """
-        encoded_game_state = self.__encode_state(game_state)
-        if encoded_game_state in self.q_values:
-            return
-        self.q_values[encoded_game_state] = {}
-        for free_seat in self.__get_free_seats(game_state):
-            self.q_values[encoded_game_state][free_seat] = (self.INITIAL_STATE_VALUE, 0)
+        for free_seat in free_seats:
+            self.q_values.setdefault(self.__get_state_move_key(encoded_game_state, free_seat,
+                                                               board_size),
+                                     self.INITIAL_STATE_VALUE, 0)
 
 
-    def __map_player_id(self, seat):
+    def __map_player_id(self, seat, player_id):
         """
         Maps the symbol given by the game engine to an internal notation
 
         @param value: the value of the seat (symbol)
+        @param player_id: the symbol used by the player
         @return: the mapped value
         """ 
-        internal_player_id = None
+        internal_player_id = self.EMPTY_SEAT
         if seat:
-            if seat == self.player_id:
+            if seat == player_id:
                 internal_player_id = self.COM_PLAYER_ID
             else:
                 internal_player_id = self.OPPONENT_PLAYER_ID
         return internal_player_id
 
 
-    def __reset(self):
+    def __map_seats(self, game_state, player_id):
         """
-        Reset state of the object
+        Maps the seats of the 2D list game state to the internal notation
+
+        @param game_state: a 2D list with the game state given by the game engine
+        @param player_id: the symbol used by the player
+        @return: a flatten list with the internal notation of every seat
         """
-        self.game_moves_history = []
-        self.player_id = None
+        return [self.__map_player_id(seat, player_id)
+                for sublist in game_state for seat in sublist]
+
+
+    def __select_move(self, encoded_game_state, free_seats, board_size):
+        """
+        Select the next move, either a random or a greedy one
+
+        @param encoded_game_state: the internal representation of the game state
+        @param free_seats: a list with the available seats
+        @param board_size: the number of rows and columns of the board
+        @return: the key of the game state and move pair and
+                 a list with the x and y values of the selected seat
+        """
+        self.__check_board_size(board_size)
+        self.__init_q_values(encoded_game_state, free_seats, board_size)
+
+        if random.random() < self.epsilon:
+            next_move = random.choice(free_seats)
+            self.__update_epsilon()
+        else:
+            next_move = self.__get_next_greedy_move(encoded_game_state, free_seats, board_size)
+        return self.__get_state_move_key(encoded_game_state, next_move, board_size), next_move
 
 
     def __update_epsilon(self):
@@ -156,16 +294,33 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
         self.epsilon *= (1 - self.epsilon_decay_step)
 
 
-    def __update_q_values(self, reward):
+    def __update_q_values(self, game_moves_history, reward):
         """
         Update Q-Values
 
+        @param game_moves_history: a list with the keys of the game state and move pairs
+                                   taken during the game
         @param reward: the reward for all moves taken during the game
         """
-        for encoded_game_state, move in self.game_moves_history:
-            value, times_passed = self.q_values[encoded_game_state][move]
+        for state_move_key in game_moves_history:
+            value, times_passed = self.q_values.get_entry(state_move_key,
+                                                          (self.INITIAL_STATE_VALUE, 0))
             new_value = (value * times_passed + float(reward)) / (times_passed + 1)
-            self.q_values[encoded_game_state][move] = (new_value, times_passed + 1)
+            self.q_values.set_entry(state_move_key, new_value, times_passed + 1)
+
+
+    def end_of_context_game(self, context, winning_player_id):
+        """
+        End of the game of a context. Update Q-Values, unless the player is frozen
+
+        @param context: the instance of TicTacToeGameContext of the game
+        @param winning_player_id: the winning player ID (symbol), given by the game engine
+        """
+        if self.frozen:
+            return
+        reward = self.__get_reward(winning_player_id == context.player_id,
+                                   bool(winning_player_id))
+        self.__update_q_values(context.history, reward)
 
 
     def end_of_game(self, winning_player_id):
@@ -174,13 +329,72 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
 
         @param winning_player_id: the winning player ID (symbol), given by the game engine
         """
-        reward = self.DRAW_REWARD
-        if winning_player_id == self.player_id:
-            reward = self.COM_WIN_REWARD
-        elif winning_player_id:
-            reward = self.COM_LOSS_PENALTY
-        self.__update_q_values(reward)
-        self.__reset()
+        self.end_of_context_game(self.context, winning_player_id)
+        self.context = TicTacToeGameContext(self.context.player_id)
+
+
+    def end_of_games(self, game_ids, winners):
+        """
+        End of batched games. Update Q-Values of every finished game
+
+        @param game_ids: the indexes of the finished games in the batch
+        @param winners: the winner of each game, given by the batch game engine
+        """
+        if self.frozen:
+            return
+        for game_id, winner in zip(game_ids, winners):
+            reward = self.__get_reward(winner == self.COM_PLAYER_ID,
+                                       winner == self.OPPONENT_PLAYER_ID)
+            self.__update_q_values(self.batch_moves_history.pop(game_id, []), reward)
+
+
+    def get_best_move(self, seats, board_size):
+        """
+        Get the greedy move of a game state without changing the player
+        (the Q-Values of unseen game state and move pairs are the initial ones)
+
+        @param seats: a flatten list with the internal notation of every seat,
+                      from the point of view of the player
+        @param board_size: the number of rows and columns of the board
+        @return: a tuple with the x and y values of the selected seat
+        """
+        # a read-only check, since the lookups of a frozen player never change it
+        if self.board_size is not None and board_size != self.board_size:
+            raise ValueError("The Q-Values are for a {0}x{0} board, not a {1}x{1} one"
+                             .format(self.board_size, board_size))
+        encoded_game_state = self.__encode_seats(seats, board_size)
+        best_move = None
+        best_score = None
+        for seat_index, seat in enumerate(seats):
+            if seat != self.EMPTY_SEAT:
+                continue
+            move = divmod(seat_index, board_size)
+            score = self.q_values.peek(self.__get_state_move_key(encoded_game_state, move,
+                                                                 board_size),
+                                       self.INITIAL_STATE_VALUE)
+            if best_score is None or score > best_score:
+                best_score = score
+                best_move = move
+        return best_move
+
+
+    def get_context_move(self, context, game_state):
+        """
+        Get the next move of the game of a context. A frozen player
+        selects the greedy move and changes neither itself nor the context.
+
+        @param context: the instance of TicTacToeGameContext of the game
+        @param game_state: the current game state given by the game engine
+        @return: a list with the x and y values of the selected seat
+        """
+        if self.frozen:
+            return self.get_best_move(self.__map_seats(game_state, context.player_id),
+                                      len(game_state))
+        state_move_key, next_move = self.__select_move(
+            self.__encode_state(game_state, context.player_id),
+            self.__get_free_seats(game_state), len(game_state))
+        context.history.append(state_move_key)
+        return next_move
 
 
     def get_next_move(self, game_state):
@@ -190,20 +404,30 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
         @param game_state: the current game state given by the game engine
         @return: a list with the x and y values of the selected seat
         """
-        next_move = None
-        encoded_game_state = self.__encode_state(game_state)
-
-        self.__init_q_values(game_state)
+        return self.get_context_move(self.context, game_state)
 
-        if random.random() < self.epsilon:
-            next_move = self.__get_next_random_move(game_state)
-            self.__update_epsilon()
-        else:
-            next_move = self.__get_next_greedy_move(game_state)
 
-        self.game_moves_history.append((encoded_game_state, next_move))
+    def get_next_moves(self, game_states, game_ids):
+        """
+        Get the next move of a batch of games
 
-        return next_move
+        @param game_states: an (M, board_size, board_size) int8 array with the game states
+                            given by the batch game engine
+        @param game_ids: the indexes of the games in the batch
+        @return: a list with the x and y values of the selected seats
+        """
+        board_size = game_states.shape[1]
+        if self.frozen:
+            return [self.get_best_move(seats, board_size)
+                    for seats in game_states.reshape(len(game_states), -1).tolist()]
+        next_moves = []
+        for game_state, game_id in zip(game_states.tolist(), game_ids):
+            state_move_key, next_move = self.__select_move(self.__encode_batch_state(game_state),
+                                                           self.__get_free_seats(game_state),
+                                                           board_size)
+            self.batch_moves_history.setdefault(game_id, []).append(state_move_key)
+            next_moves.append(next_move)
+        return next_moves
 
 
     def get_q_values_from_other_com(self, other_player):
@@ -212,9 +436,67 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
 
         @param com_player: instance of the other player
         """
-        for game_state in other_player.q_values:
-            if game_state not in self.q_values:
-                self.q_values[game_state] = other_player.q_values[game_state]
+        if other_player.board_size is not None:
+            self.__check_board_size(other_player.board_size)
+        for state_move_key, value, times_passed in other_player.q_values.entries():
+            if state_move_key not in self.q_values:
+                self.q_values.set_entry(state_move_key, value, times_passed)
+
+
+    def load_model(self, path):
+        """
+        Load the learned Q-Values from a file written by save_model.
+        The file is memory-mapped and its pages are read on demand, and max_q_values
+        bounds the updates kept in memory on top of it (the dict-backed Q-Values
+        of boards of 7x7 or more are read in memory, up to max_q_values of them).
+        The player then plays on boards of the size of the model only.
+
+        @param path: the path of the file
+        """
+        size = TicTacToeQTable.read_tag(path).rpartition('/')[2].partition('x')[0]
+        board_size = int(size) if size.isdigit() else None
+        self.q_values = TicTacToeQTable.open_file(path, self.__get_model_tag(board_size),
+                                                  self.q_values.max_size,
+                                                  self.q_values.eviction)
+        self.board_size = board_size
+
+
+    def merge_q_values(self, com_players):
+        """
+        Merges the Q-Values learned in parallel by other instances of the player,
+        which started from the Q-Values of this instance. The visits of each move
+        are summed and the values are averaged weighted by the number of visits.
+
+        @param com_players: a list with the instances of the other players
+        """
+        merged_q_values = {}
+        for com_player in com_players:
+            if com_player.board_size is not None:
+                self.__check_board_size(com_player.board_size)
+            for state_move_key, value, times_passed in com_player.q_values.entries():
+                base_value, base_times_passed = self.q_values.get_entry(
+                    state_move_key, (self.INITIAL_STATE_VALUE, 0))
+                value_sum, times_passed_sum = merged_q_values.get(state_move_key, (0.0, 0))
+                merged_q_values[state_move_key] = (value_sum + value * times_passed \
+                                                     - base_value * base_times_passed,
+                                                   times_passed_sum + times_passed \
+                                                     - base_times_passed)
+        for state_move_key, (value_sum, times_passed_sum) in merged_q_values.items():
+            value, times_passed = self.q_values.get_entry(state_move_key,
+                                                          (self.INITIAL_STATE_VALUE, 0))
+            if times_passed_sum:
+                value = (value * times_passed + value_sum) / (times_passed + times_passed_sum)
+                times_passed += times_passed_sum
+            self.q_values.set_entry(state_move_key, value, times_passed)
+
+
+    def save_model(self, path):
+        """
+        Save the learned Q-Values into a binary file
+
+        @param path: the path of the file
+        """
+        self.q_values.save(path, self.__get_model_tag(self.board_size))
 
 
     def set_player_id(self, player_id):
@@ -223,4 +505,71 @@ class TicTacToeComputerNaive(AbstractTicTacToePlayer):
 
         @param player_id: the symbol used by the player
         """
-        self.player_id = player_id
+        self.context.player_id = player_id
+
+
+    def spawn(self):
+        """
+        Create a player for one more concurrent game, which plays through this
+        player and keeps the state of its game in its own context, so many games
+        can be played at once by one learned player (and one copy of its Q-Values)
+
+        @return: the instance of TicTacToeContextPlayer
+        """
+        return TicTacToeContextPlayer(self)
+
+
+    def train_from_games(self, recorded_games, board_size):
+        """
+        Update the Q-Values from recorded games in bulk, without playing them.
+        The moves of every game are replayed from the seat of the player and the
+        rewards of the visited game state and move pairs are summed over the batch,
+        so the running average of every pair is updated (and every game state is
+        initialized) once per batch. The Q-Values
+        are the same with the ones learned by playing the games (up to rounding).
+        As no game state is initialized (or touched) again within a batch, the Q-Values
+        would not be evicted like the ones learned by playing the games, so the
+        Q-Table must be unbounded.
+
+        @param recorded_games: a list with the recorded games, each a tuple with the seat
+                               of the player (0 for the first player), the result (the
+                               winning seat, or None for a draw) and a list with the x
+                               and y values of the moves
+        @param board_size: the number of rows and columns of the board
+        """
+        self.__check_board_size(board_size)
+        if getattr(self.q_values, 'max_size', None) is not None:
+            raise ValueError("The offline training requires unbounded Q-Values")
+        symmetry = TicTacToeSymmetry.get_symmetry(board_size, self.use_symmetries)
+        seat_weights = symmetry.seat_weights
+        all_seats = [(row, col) for row in range(board_size) for col in range(board_size)]
+        encoded_game_states = {}
+        rewards = {}
+        for seat, result, moves in recorded_games:
+            reward = self.__get_reward(result == seat, result is not None and result != seat)
+            keys = [0] * len(seat_weights)
+            free_seats = list(all_seats)
+            for turn, move in enumerate(moves):
+                if turn % 2 == seat:
+                    # the Q-Values of a game state are initialized once per batch
+                    encoded_game_state = encoded_game_states.get(tuple(keys))
+                    if encoded_game_state is None:
+                        encoded_game_state = symmetry.get_canonical_key(tuple(keys))
+                        encoded_game_states[tuple(keys)] = encoded_game_state
+                        self.__init_q_values(encoded_game_state, free_seats, board_size)
+                    state_move_key = self.__get_state_move_key(encoded_game_state, move,
+                                                               board_size)
+                    reward_sum, times_passed = rewards.get(state_move_key, (0.0, 0))
+                    rewards[state_move_key] = (reward_sum + reward, times_passed + 1)
+                    player_id = self.COM_PLAYER_ID
+                else:
+                    player_id = self.OPPONENT_PLAYER_ID
+                seat_index = move[0] * board_size + move[1]
+                keys = [key + player_id * weights[seat_index]
+                        for key, weights in zip(keys, seat_weights)]
+                free_seats.remove(move)
+        for state_move_key, (reward_sum, num_of_rewards) in rewards.items():
+            value, times_passed = self.q_values.get_entry(state_move_key,
+                                                          (self.INITIAL_STATE_VALUE, 0))
+            new_value = (value * times_passed + reward_sum) / (times_passed + num_of_rewards)
+            self.q_values.set_entry(state_move_key, new_value, times_passed + num_of_rewards)
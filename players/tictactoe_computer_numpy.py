@@ -0,0 +1,164 @@
+"""
+The inference-only implementation of the neural network Tic-Tac-Toe player component,
+which plays the network trained by the TensorFlow player using NumPy only
+"""
+from __future__ import print_function
+
+import numpy as np
+
+from .abstract_tictactoe_player import AbstractTicTacToePlayer
+
+
+class TicTacToeComputerNumpy(AbstractTicTacToePlayer):
+    """
+    The inference-only implementation of the neural network Tic-Tac-Toe player component.
+
+    It loads the weights exported by TicTacToeComputerTensorflow.save_model and
+    runs the same forward pass (a hidden ReLU layer and a linear output layer)
+    with NumPy, so it plays the same greedy moves without importing TensorFlow.
+    """
+
+    MODEL_WEIGHTS = ('hidden_weights', 'hidden_biases', 'output_weights', 'output_biases')
+
+    # the player plays a loaded model only
+    MODEL_ONLY = True
+
+
+    def __init__(self, path=None):
+        """
+        Constructor
+
+        @param path: the path of a model file written by the TensorFlow player, or None
+                     for loading it later with load_model
+        """
+        self.epsilon = 0.0
+        self.board_size = None
+        self.weights = None
+        self.player_id = None
+        if path is not None:
+            self.load_model(path)
+
+
+    def __get_q_values(self, splitted_states):
+        """
+        Get the Q values of a batch of splitted game states
+
+        @param splitted_states: an (M, 2, board_size, board_size) array with the
+                                seats of the player and the seats of the opponent
+        @return: an (M, board_size * board_size) array with the Q values
+        """
+        if self.weights is None:
+            raise ValueError("No model is loaded")
+        hidden_weights, hidden_biases, output_weights, output_biases = self.weights
+        net = splitted_states.transpose(0, 2, 3, 1).reshape(len(splitted_states), -1)
+        net = np.maximum(np.dot(net, hidden_weights) + hidden_biases, 0.)
+        return np.dot(net, output_weights) + output_biases
+
+
+    def end_of_game(self, winning_player_id):
+        """
+        End of game.
+
+        @param winning_player_id: the winning player ID (symbol), given by the game engine
+        """
+        pass
+
+
+    def get_greedy_moves(self, game_states, player_ids):
+        """
+        Get the greedy (best) next move of a batch of games
+
+        @param game_states: a list with the game states given by the game engine
+        @param player_ids: a list with the symbol of the player to move in each game
+        @return: a list with the x and y values of the selected seats
+        """
+        splitted_states, occupied_seats = self.split_states(game_states, player_ids)
+        q_values = self.__get_q_values(splitted_states)
+        q_values[occupied_seats.reshape(len(occupied_seats), -1)] = -np.inf
+        return [divmod(int(x), self.board_size) for x in np.argmax(q_values, axis=1)]
+
+
+    def get_next_move(self, game_state):
+        """
+        Get the next move
+
+        @param game_state: the current game state given by the game engine
+        @return: a list with the x and y values of the selected seat
+        """
+        return self.get_greedy_moves([game_state], [self.player_id])[0]
+
+
+    def load_model(self, path):
+        """
+        Load the weights of the network from a file written by
+        TicTacToeComputerTensorflow.save_model
+
+        @param path: the path of the file
+        """
+        self.board_size, self.weights = self.read_model(path)
+
+
+    @staticmethod
+    def read_model(path):
+        """
+        Read a model file
+
+        @param path: the path of the file
+        @return: a tuple with the board size and a tuple with the weights of the network
+        """
+        with np.load(path) as model:
+            weights = tuple(model[x].astype(np.float32)
+                            for x in TicTacToeComputerNumpy.MODEL_WEIGHTS)
+            return int(model['board_size']), weights
+
+
+    def save_model(self, path):
+        """
+        Save the weights of the network into a file
+
+        @param path: the path of the file
+        """
+        self.write_model(path, self.board_size, self.weights)
+
+
+    def set_player_id(self, player_id):
+        """
+        Set the player's symbol in game
+
+        @param player_id: the symbol used by the player
+        """
+        self.player_id = player_id
+
+
+    @staticmethod
+    def split_states(game_states, player_ids):
+        """
+        Split a batch of game states into two states per game, one for each player.
+        The first state refers to seats occupied by the player itself,
+        while the second represents the opponent's state.
+
+        @param game_states: a list with the game states given by the game engine
+        @param player_ids: a list with the symbol of the player to move in each game
+        @return: a tuple with an (M, 2, board_size, board_size) float32 array with the
+                 splitted game states and an (M, board_size, board_size) boolean array
+                 with the occupied seats
+        """
+        boards = np.array(game_states, dtype=object)
+        occupied_seats = boards.astype(bool)
+        com_seats = boards == np.array(player_ids, dtype=object).reshape(-1, 1, 1)
+        splitted_states = np.stack([com_seats, occupied_seats & ~com_seats], axis=1)
+        return splitted_states.astype(np.float32), occupied_seats
+
+
+    @staticmethod
+    def write_model(path, board_size, weights):
+        """
+        Write a model file
+
+        @param path: the path of the file
+        @param board_size: the number of rows and columns of the board
+        @param weights: a tuple with the weights of the network, in the order of MODEL_WEIGHTS
+        """
+        with open(path, 'wb') as model_file:
+            np.savez(model_file, board_size=board_size,
+                     **dict(zip(TicTacToeComputerNumpy.MODEL_WEIGHTS, weights)))
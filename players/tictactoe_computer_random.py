@@ -8,6 +8,8 @@ from __future__ import print_function
 
 import random
 
+from games.tictactoe_game_state import TicTacToeGameState
+
 from .abstract_tictactoe_player import AbstractTicTacToePlayer
 
 
@@ -18,6 +20,9 @@ class TicTacToeComputerRandom(AbstractTicTacToePlayer):
     is used only for training and/or evaluation of other components.
     """
 
+    EMPTY_SEAT = 0
+
+
     def __init__(self):
         """
         Constructor
@@ -48,6 +53,9 @@ class TicTacToeComputerRandom(AbstractTicTacToePlayer):
         @param game_state: a 2D list with the game state
         @return: a list with the x and y values of the selected seat
         """
+        if isinstance(game_state, TicTacToeGameState):
+            # a random position in the free seats, without building the tuple of the free seats
+            return game_state.get_free_seat(random.randrange(game_state.get_num_of_free_seats()))
         return random.choice(self.__get_free_seats(game_state))
 
 
@@ -58,6 +66,13 @@ class TicTacToeComputerRandom(AbstractTicTacToePlayer):
         pass
 
 
+    def end_of_games(self, game_ids, winners):
+        """
+        End of batched games.
+        """
+        pass
+
+
     def get_next_move(self, game_state):
         """
         Get the next move
@@ -68,6 +83,26 @@ class TicTacToeComputerRandom(AbstractTicTacToePlayer):
         return self.__get_next_random_move(game_state)
 
 
+    def get_next_moves(self, game_states, game_ids):
+        """
+        Get the next move of a batch of games
+
+        @param game_states: an (M, board_size, board_size) int8 array with the game states
+                            given by the batch game engine
+        @param game_ids: the indexes of the games in the batch
+        @return: an (M, 2) array with the x and y values of the selected seats
+        """
+        # NumPy is needed by the batch game engine only, so it is not imported on module load
+        import numpy as np
+
+        board_size = game_states.shape[1]
+        flatten_states = game_states.reshape(len(game_states), -1)
+        random_keys = np.random.random(flatten_states.shape)
+        random_keys[flatten_states != self.EMPTY_SEAT] = -1.
+        seats = random_keys.argmax(axis=1)
+        return np.stack((seats // board_size, seats % board_size), axis=1)
+
+
     def set_player_id(self, player_id):
         """
         Set the player's symbol in game
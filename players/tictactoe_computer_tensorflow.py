@@ -10,6 +10,8 @@ from tensorflow.contrib import layers
 from tensorflow.python.ops import nn
 
 from .abstract_tictactoe_player import AbstractTicTacToePlayer
+from .tictactoe_computer_numpy import TicTacToeComputerNumpy
+from .tictactoe_replay_memory import TicTacToeReplayMemory
 
 
 class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
@@ -28,9 +30,12 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
     COM_PLAYER_ID = 1
     OPPONENT_PLAYER_ID = 2
 
+    OCCUPIED_SEAT_PENALTY = 1e9
+
 
     def __init__(self, epsilon=1.0, epsilon_decay_step=10e-5, board_size=3, hidden_layer_size=20,
-                 learning_rate=0.001, gamma=0.999):
+                 learning_rate=0.001, gamma=0.999, replay_memory_size=0, minibatch_size=32,
+                 update_frequency=4, target_update_frequency=0):
         """
         Constructor
 
@@ -41,6 +46,17 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
         @param hidden_layer_size: the number of nodes in the hidden layer
         @param learning_rate:
         @param gamma: the gamma parameter (discount factor) of Q-Learning algorithm [0, 1] 
+        @param replay_memory_size: the number of the last transitions kept for experience replay.
+                                   If 0, the network is trained once per move with the last
+                                   transition only.
+        @param minibatch_size: the number of transitions sampled per training step
+                               of experience replay
+        @param update_frequency: the number of stored transitions between
+                                 two training steps of experience replay
+        @param target_update_frequency: the number of training steps between two copies
+                                        of the network into the target network, which
+                                        computes the learned values of experience replay.
+                                        If 0, no target network is used.
         """
         self.epsilon = epsilon
         self.epsilon_decay_step = epsilon_decay_step
@@ -50,6 +66,15 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
         self.learning_rate = learning_rate
         self.gamma = gamma
 
+        self.replay_memory = None
+        if replay_memory_size:
+            self.replay_memory = TicTacToeReplayMemory(replay_memory_size, board_size)
+        self.minibatch_size = minibatch_size
+        self.update_frequency = update_frequency
+        self.target_update_frequency = target_update_frequency
+        self.num_of_transitions = 0
+        self.num_of_training_steps = 0
+
         self.player_id = None
         self.prev_game_state = None
 
@@ -57,20 +82,33 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
         self.__init_graph()
 
 
+    def __build_network(self, splitted_states):
+        """
+        Build the layers of the network
+
+        @param splitted_states: the tensor with the splitted game states
+        @return: the tensor with the Q values of every seat
+        """
+        net = tf.transpose(splitted_states, [0, 2, 3, 1])
+        net = tf.reshape(net, [-1, int(np.prod(net.get_shape().as_list()[1:]))])
+        net = layers.fully_connected(net, self.hidden_layer_size, activation_fn=nn.relu)
+        net = layers.fully_connected(net, self.board_size*self.board_size, activation_fn=None)
+        return tf.reshape(net, [-1, self.board_size, self.board_size])
+
+
     def __init_graph(self):
         """
         Initialize graph
         """
+        network = tf.make_template('q_network', self.__build_network)
+
         self.splitted_states = tf.placeholder(tf.float32, 
                                               [None, 2, self.board_size, self.board_size], 
                                               name="splitted_states")
 
-        net = tf.transpose(self.splitted_states, [0, 2, 3, 1])
-        net = tf.reshape(net, [-1, int(np.prod(net.get_shape().as_list()[1:]))])
-        net = layers.fully_connected(net, self.hidden_layer_size, activation_fn=nn.relu)
-        net = layers.fully_connected(net, self.board_size*self.board_size, activation_fn=None)
-
-        self.q_values_nn = tf.reshape(net, [-1, self.board_size, self.board_size])
+        self.q_values_nn = network(self.splitted_states)
+        self.network_variables = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES,
+                                                   scope=network.variable_scope.name + '/')
 
         self.move = tf.placeholder(tf.float32, [None, self.board_size, self.board_size], name="move")
 
@@ -81,9 +119,52 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
         loss = tf.reduce_mean(tf.square(self.learned_value - action_q_values))
         optimizer = tf.train.AdamOptimizer(self.learning_rate)
         #optimizer = tf.train.GradientDescentOptimizer(self.learning_rate)
-        self.q_updater = optimizer.minimize(loss, var_list=tf.trainable_variables())
+        self.q_updater = optimizer.minimize(loss, var_list=self.network_variables)
+
+        if self.replay_memory is not None:
+            self.__init_replay_graph(network, optimizer, action_q_values)
 
         self.session.run(tf.global_variables_initializer())
+        if self.replay_memory is not None and self.target_update_frequency:
+            self.session.run(self.target_updater)
+
+
+    def __init_replay_graph(self, network, optimizer, action_q_values):
+        """
+        Initialize the part of the graph that trains the network on a minibatch
+        of transitions. The learned values are computed in the graph, so a training
+        step is a single session run.
+
+        @param network: the template of the network
+        @param optimizer: the optimizer of the network
+        @param action_q_values: the tensor with the Q values of the moves
+        """
+        self.next_splitted_states = tf.placeholder(tf.float32,
+                                                   [None, 2, self.board_size, self.board_size],
+                                                   name="next_splitted_states")
+        self.next_free_seats = tf.placeholder(tf.float32,
+                                              [None, self.board_size, self.board_size],
+                                              name="next_free_seats")
+        self.reward = tf.placeholder(tf.float32, [None], name="reward")
+        self.done = tf.placeholder(tf.float32, [None], name="done")
+
+        if self.target_update_frequency:
+            target_network = tf.make_template('target_q_network', self.__build_network)
+            next_q_values = target_network(self.next_splitted_states)
+            target_variables = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES,
+                                                 scope=target_network.variable_scope.name + '/')
+            self.target_updater = tf.group(*[target.assign(source) for source, target
+                                             in zip(self.network_variables, target_variables)])
+        else:
+            next_q_values = network(self.next_splitted_states)
+
+        next_q_values = next_q_values - (1. - self.next_free_seats) * self.OCCUPIED_SEAT_PENALTY
+        best_next_q_values = tf.reduce_max(next_q_values, reduction_indices=[1, 2])
+        replay_learned_value = self.reward + (1. - self.done) * self.gamma * best_next_q_values
+
+        replay_loss = tf.reduce_mean(tf.square(tf.stop_gradient(replay_learned_value)
+                                               - action_q_values))
+        self.replay_q_updater = optimizer.minimize(replay_loss, var_list=self.network_variables)
 
 
     def __encode_state(self, game_state):
@@ -109,6 +190,18 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
                                      feed_dict={self.splitted_states: [splitted_states]})[0]
 
 
+    def __load_weights(self, weights):
+        """
+        Load the weights of the network (and copy them into the target network, if any)
+
+        @param weights: a list with the values of the trainable variables of the network
+        """
+        for variable, value in zip(self.network_variables, weights):
+            variable.load(value, self.session)
+        if self.replay_memory is not None and self.target_update_frequency:
+            self.session.run(self.target_updater)
+
+
     def __map_player_id(self, value):
         """
         Maps the symbol given by the game engine to an internal notation
@@ -154,6 +247,46 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
         return [com_state, opponent_state]
 
 
+    def __store_transition(self, state, move, reward, next_state=None, next_free_seats=None):
+        """
+        Store a transition into the replay memory and train the network
+        on a minibatch every update_frequency transitions
+
+        @param state: the splitted game state before the move
+        @param move: a 2D array with 1 at the seat of the move
+        @param reward: the reward of the move
+        @param next_state: the splitted game state at the next move of the player,
+                           or None if the game ended
+        @param next_free_seats: a 2D array with 1 at the free seats of the next game state,
+                                or None if the game ended
+        """
+        self.replay_memory.add(state, move, reward, next_state, next_free_seats)
+        self.num_of_transitions += 1
+        if len(self.replay_memory) >= self.minibatch_size \
+                and self.num_of_transitions % self.update_frequency == 0:
+            self.__train_minibatch()
+
+
+    def __train_minibatch(self):
+        """
+        Train the network on a minibatch sampled from the replay memory,
+        and copy it into the target network every target_update_frequency steps
+        """
+        states, moves, rewards, next_states, next_free_seats, dones = \
+            self.replay_memory.sample(self.minibatch_size)
+        self.session.run(self.replay_q_updater,
+                         feed_dict={self.splitted_states: states,
+                                    self.move: moves,
+                                    self.reward: rewards,
+                                    self.next_splitted_states: next_states,
+                                    self.next_free_seats: next_free_seats,
+                                    self.done: dones})
+        self.num_of_training_steps += 1
+        if self.target_update_frequency \
+                and self.num_of_training_steps % self.target_update_frequency == 0:
+            self.session.run(self.target_updater)
+
+
     def __update_epsilon(self):
         """
         Update epsilon parameter
@@ -175,6 +308,42 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
                                     self.learned_value: learned_value_t})
 
 
+    def __getstate__(self):
+        """
+        Get the state of the player for pickling, e.g. for playing in another process.
+        The TensorFlow session cannot be pickled, so the state keeps the parameters
+        and the weights of the network, and the graph is rebuilt when unpickled.
+        The replay memory is not kept.
+
+        @return: a dictionary with the state
+        """
+        parameters = {'epsilon': self.epsilon,
+                      'epsilon_decay_step': self.epsilon_decay_step,
+                      'board_size': self.board_size,
+                      'hidden_layer_size': self.hidden_layer_size,
+                      'learning_rate': self.learning_rate,
+                      'gamma': self.gamma,
+                      'replay_memory_size': self.replay_memory.capacity
+                                            if self.replay_memory is not None else 0,
+                      'minibatch_size': self.minibatch_size,
+                      'update_frequency': self.update_frequency,
+                      'target_update_frequency': self.target_update_frequency}
+        return {'parameters': parameters,
+                'weights': self.session.run(self.network_variables),
+                'player_id': self.player_id}
+
+
+    def __setstate__(self, state):
+        """
+        Rebuild the player from the state given by __getstate__
+
+        @param state: a dictionary with the state
+        """
+        self.__init__(**state['parameters'])
+        self.__load_weights(state['weights'])
+        self.player_id = state['player_id']
+
+
     def end_of_game(self, winning_player_id):
         """
         End of game. Update Q-Values and reset the game state
@@ -188,14 +357,36 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
             reward = self.COM_LOSS_PENALTY
 
         prev_splitted_states, prev_move_t = self.prev_game_state
-        prev_splitted_states = [prev_splitted_states]
-        prev_move_t = [prev_move_t]
-        reward_t = [reward] * len(prev_splitted_states)
-        self.__update_q_values(prev_splitted_states, prev_move_t, reward_t)
+        if self.replay_memory is not None:
+            self.__store_transition(prev_splitted_states, prev_move_t, reward)
+        else:
+            prev_splitted_states = [prev_splitted_states]
+            prev_move_t = [prev_move_t]
+            reward_t = [reward] * len(prev_splitted_states)
+            self.__update_q_values(prev_splitted_states, prev_move_t, reward_t)
         
         self.__reset()
 
 
+    def get_greedy_moves(self, game_states, player_ids):
+        """
+        Get the greedy (best) next move of a batch of games with a single evaluation
+        of the network. It neither explores nor learns, so it can serve many games
+        at once, e.g. through an inference server.
+
+        @param game_states: a list with the game states given by the game engine
+        @param player_ids: a list with the symbol of the player to move in each game
+        @return: a list with the x and y values of the selected seats
+        """
+        splitted_states, occupied_seats = TicTacToeComputerNumpy.split_states(game_states,
+                                                                              player_ids)
+        q_values = self.session.run(self.q_values_nn,
+                                    feed_dict={self.splitted_states: splitted_states})
+        q_values[occupied_seats] = -np.inf
+        best_seats = np.argmax(q_values.reshape(len(occupied_seats), -1), axis=1)
+        return [divmod(int(x), self.board_size) for x in best_seats]
+
+
     def get_next_move(self, game_state):
         """
         Get the next move
@@ -221,11 +412,15 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
 
         if self.prev_game_state:
             prev_splitted_states, prev_move_t = self.prev_game_state
-            learned_value = self.gamma * q_values[best_next_move]
-            prev_splitted_states = [prev_splitted_states]
-            prev_move_t = [prev_move_t]
-            learned_value_t = [learned_value] * len(prev_splitted_states)
-            self.__update_q_values(prev_splitted_states, prev_move_t, learned_value_t)
+            if self.replay_memory is not None:
+                self.__store_transition(prev_splitted_states, prev_move_t, 0., splitted_states,
+                                        encoded_state == self.EMPTY_SEAT)
+            else:
+                learned_value = self.gamma * q_values[best_next_move]
+                prev_splitted_states = [prev_splitted_states]
+                prev_move_t = [prev_move_t]
+                learned_value_t = [learned_value] * len(prev_splitted_states)
+                self.__update_q_values(prev_splitted_states, prev_move_t, learned_value_t)
 
         next_move_t = np.zeros_like(encoded_state, dtype=np.float32)
         next_move_t[next_move] = 1.
@@ -234,6 +429,30 @@ class TicTacToeComputerTensorflow(AbstractTicTacToePlayer):
         return next_move
 
 
+    def load_model(self, path):
+        """
+        Load the weights of the network from a file written by save_model
+
+        @param path: the path of the file
+        """
+        board_size, weights = TicTacToeComputerNumpy.read_model(path)
+        if board_size != self.board_size:
+            raise ValueError("The model of {} is for a {}x{} board"
+                             .format(path, board_size, board_size))
+        self.__load_weights(weights)
+
+
+    def save_model(self, path):
+        """
+        Save the weights of the network into a NumPy .npz file,
+        which can also be played by TicTacToeComputerNumpy
+
+        @param path: the path of the file
+        """
+        TicTacToeComputerNumpy.write_model(path, self.board_size,
+                                           self.session.run(self.network_variables))
+
+
     def set_player_id(self, player_id):
         """
         Set the player's symbol in game
@@ -0,0 +1,72 @@
+"""
+The per-game state of the tabular Tic-Tac-Toe player components, which lets
+one player (and one copy of its Q-Values) play many games at once
+"""
+from __future__ import print_function
+
+from .abstract_tictactoe_player import AbstractTicTacToePlayer
+
+
+class TicTacToeGameContext(object):
+    """
+    The state of a player in one game: the symbol of the player and the
+    history of the game (e.g. the keys of the player's game states and moves)
+    """
+
+
+    def __init__(self, player_id=None):
+        """
+        Constructor
+
+        @param player_id: the symbol used by the player in the game
+        """
+        self.player_id = player_id
+        self.history = []
+
+
+class TicTacToeContextPlayer(AbstractTicTacToePlayer):
+    """
+    A player of one game, which plays through a shared player and keeps the state
+    of the game in its own context. The shared player is never changed by the games
+    when it is frozen, so it may be shared by threads and forked processes.
+    """
+
+
+    def __init__(self, player):
+        """
+        Constructor
+
+        @param player: the instance of the shared player, which implements
+                       get_context_move and end_of_context_game
+        """
+        self.player = player
+        self.context = TicTacToeGameContext()
+
+
+    def end_of_game(self, winning_player_id):
+        """
+        End of game
+
+        @param winning_player_id: the winning player ID (symbol), given by the game engine
+        """
+        self.player.end_of_context_game(self.context, winning_player_id)
+        self.context = TicTacToeGameContext(self.context.player_id)
+
+
+    def get_next_move(self, game_state):
+        """
+        Get the next move
+
+        @param game_state: the current game state given by the game engine
+        @return: a list with the x and y values of the selected seat
+        """
+        return self.player.get_context_move(self.context, game_state)
+
+
+    def set_player_id(self, player_id):
+        """
+        Set the player's symbol in game
+
+        @param player_id: the symbol used by the player
+        """
+        self.context.player_id = player_id
@@ -0,0 +1,219 @@
+"""
+The batched inference server of the neural network Tic-Tac-Toe player components,
+which serves the moves of many concurrent games with a single network
+"""
+import queue
+import threading
+import time
+
+from .abstract_tictactoe_player import AbstractTicTacToePlayer
+
+
+class TicTacToeInferenceRequest(object):
+    """
+    A move request, waiting for its move to be set by the server
+    """
+
+    __slots__ = ('game_state', 'player_id', 'move', 'error', 'done')
+
+
+    def __init__(self, game_state, player_id):
+        """
+        Constructor
+
+        @param game_state: the current game state given by the game engine
+        @param player_id: the symbol of the player to move
+        """
+        self.game_state = game_state
+        self.player_id = player_id
+        self.move = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class TicTacToeInferenceServer(object):
+    """
+    The batched inference server of the neural network Tic-Tac-Toe player components.
+
+    The move requests of the concurrent games are queued and a worker thread
+    runs them through the network in batches. A batch is flushed as soon as
+    it reaches max_batch_size requests, or max_delay seconds after its first
+    request arrived, whichever comes first, so a single request never waits
+    for more than max_delay plus the time of one batch. Once the server is
+    stopping, new requests are rejected, and the pending ones are served
+    before the worker thread stops.
+
+    The player should support get_greedy_moves(game_states, player_ids).
+    """
+
+
+    def __init__(self, player, max_batch_size=64, max_delay=0.005):
+        """
+        Constructor
+
+        @param player: the trained player that evaluates the batches
+        @param max_batch_size: the maximum number of requests per batch
+        @param max_delay: the maximum time in seconds that the first request
+                          of a batch waits for more requests
+        """
+        if not hasattr(player, 'get_greedy_moves'):
+            raise ValueError("Player {} does not support batched inference"
+                             .format(type(player).__name__))
+        self.player = player
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+
+        self.requests = queue.Queue()
+        self.thread = None
+        # serializes the submissions with start and stop, so no request is queued after the sentinel
+        self.lock = threading.Lock()
+        self.num_of_batches = 0
+        self.num_of_requests = 0
+
+
+    def __get_batch(self):
+        """
+        Wait for the requests of the next batch
+
+        @return: a list with the requests, or None if the server is stopped
+        """
+        request = self.requests.get()
+        if request is None:
+            return None
+        batch = [request]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                # serve the pending batch, then stop
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+
+    def __serve(self):
+        """
+        The main loop of the worker thread
+        """
+        while True:
+            batch = self.__get_batch()
+            if batch is None:
+                break
+            try:
+                moves = self.player.get_greedy_moves([x.game_state for x in batch],
+                                                     [x.player_id for x in batch])
+                for request, move in zip(batch, moves):
+                    request.move = move
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            self.num_of_batches += 1
+            self.num_of_requests += len(batch)
+            for request in batch:
+                request.done.set()
+
+
+    def get_next_move(self, game_state, player_id):
+        """
+        Get the next move of a game. It blocks until the batch of the request is served.
+
+        @param game_state: the current game state given by the game engine
+        @param player_id: the symbol of the player to move
+        @return: a tuple with the x and y values of the selected seat
+        """
+        request = TicTacToeInferenceRequest(game_state, player_id)
+        with self.lock:
+            if self.thread is None:
+                raise RuntimeError("The inference server is not running")
+            self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.move
+
+
+    def start(self):
+        """
+        Start the worker thread
+        """
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__serve)
+                self.thread.daemon = True
+                self.thread.start()
+
+
+    def stop(self):
+        """
+        Serve the pending requests and stop the worker thread. The requests
+        submitted from now on are rejected with a RuntimeError.
+        """
+        with self.lock:
+            if self.thread is None:
+                return
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
+            # nothing is queued after the sentinel, which a batch that reads it puts back,
+            # but no request should ever wait for a stopped server
+            error = RuntimeError("The inference server is stopped")
+            while True:
+                try:
+                    request = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not None:
+                    request.error = error
+                    request.done.set()
+
+
+class TicTacToeInferenceClient(AbstractTicTacToePlayer):
+    """
+    The Tic-Tac-Toe player component that gets its moves from an inference server,
+    so many games can be played concurrently against the same trained network
+    """
+
+
+    def __init__(self, server):
+        """
+        Constructor
+
+        @param server: the instance of TicTacToeInferenceServer
+        """
+        self.server = server
+        self.player_id = None
+
+
+    def end_of_game(self, winning_player_id):
+        """
+        End of game.
+
+        @param winning_player_id: the winning player ID (symbol), given by the game engine
+        """
+        pass
+
+
+    def get_next_move(self, game_state):
+        """
+        Get the next move
+
+        @param game_state: the current game state given by the game engine
+        @return: a list with the x and y values of the selected seat
+        """
+        return self.server.get_next_move(game_state, self.player_id)
+
+
+    def set_player_id(self, player_id):
+        """
+        Set the player's symbol in game
+
+        @param player_id: the symbol used by the player
+        """
+        self.player_id = player_id
@@ -0,0 +1,1013 @@
+"""
+The array-backed Q-Tables used by the tabular Tic-Tac-Toe player components
+"""
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+import mmap
+import os
+import struct
+import sys
+
+
+class TicTacToeQTable(object):
+    """
+    An open-addressing (linear probing) hash table, which maps non-negative
+    integer keys to float values and optionally to a visit counter.
+    The keys, the values and the visit counters are kept in flat arrays
+    instead of Python objects, so every entry costs a few bytes.
+    The keys must fit in a signed 64-bit integer (see MAX_KEY), e.g. the keys of
+    the game states of boards up to 6x6; TicTacToeDictQTable keeps larger keys.
+
+    The table may be bounded to a maximum number of entries. A bounded table keeps
+    a stamp per entry, which is updated whenever the entry is read or written: the
+    time of the last use for the least recently used (LRU) eviction policy, or the
+    number of uses for the least frequently used (LFU) one. When a new key does not
+    fit, the entry with the lowest stamp among a few sampled entries is evicted,
+    so an eviction takes constant time and the table keeps the hot entries.
+    """
+
+    EMPTY_KEY = -1
+    MAX_KEY = (1 << 63) - 1
+    HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+    MAX_LOAD_FACTOR = 0.7
+
+    EVICTION_LRU = 'lru'
+    EVICTION_LFU = 'lfu'
+    EVICTION_SAMPLES = 8
+
+    FILE_MAGIC = b'TTTQTAB1'
+    FILE_HEADER = struct.Struct('<8s48sIIQ')
+    FLAG_WITH_VISITS = 1
+    DICT_FILE_MAGIC = b'TTTQDIC1'
+
+
+    def __init__(self, capacity=1024, with_visits=False, max_size=None, eviction=EVICTION_LRU):
+        """
+        Constructor
+
+        @param capacity: the initial number of slots, rounded up to a power of 2
+        @param with_visits: boolean value, True for keeping a visit counter per entry
+        @param max_size: the maximum number of entries, or None for an unbounded table
+        @param eviction: the eviction policy of a bounded table, either 'lru' or 'lfu'
+        """
+        if max_size is not None and max_size < 1:
+            raise ValueError("The maximum size must be positive, not {}".format(max_size))
+        if eviction not in (self.EVICTION_LRU, self.EVICTION_LFU):
+            raise ValueError("Unknown eviction policy: {}".format(eviction))
+        self.with_visits = with_visits
+        self.max_size = max_size
+        self.eviction = eviction
+        self.__clock = 0
+        self.__hand = 0
+        self.__num_of_evictions = 0
+        self.__evicted_stamp_sum = 0
+        self.__init_arrays(capacity)
+
+
+    def __delete_slot(self, slot):
+        """
+        Delete the entry of a slot, moving back the following entries of its
+        probe sequence (backward shift deletion), so no lookup misses them
+
+        @param slot: the index of the slot
+        """
+        keys = self.__keys
+        mask = self.__mask
+        hole = slot
+        slot = (slot + 1) & mask
+        key = keys[slot]
+        while key != self.EMPTY_KEY:
+            home = ((key * self.HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.__shift
+            if (slot - home) & mask >= (slot - hole) & mask:
+                keys[hole] = key
+                self.__values[hole] = self.__values[slot]
+                if self.__visits is not None:
+                    self.__visits[hole] = self.__visits[slot]
+                self.__stamps[hole] = self.__stamps[slot]
+                hole = slot
+            slot = (slot + 1) & mask
+            key = keys[slot]
+        keys[hole] = self.EMPTY_KEY
+        self.__size -= 1
+
+
+    def __evict(self):
+        """
+        Evict the entry with the lowest stamp among the next sampled entries
+        """
+        keys = self.__keys
+        stamps = self.__stamps
+        slot = self.__hand
+        victim = None
+        num_of_samples = 0
+        while num_of_samples < self.EVICTION_SAMPLES:
+            if keys[slot] != self.EMPTY_KEY:
+                if victim is None or stamps[slot] < stamps[victim]:
+                    victim = slot
+                num_of_samples += 1
+            slot = (slot + 1) & self.__mask
+        self.__hand = slot
+        self.__num_of_evictions += 1
+        if self.eviction == self.EVICTION_LRU:
+            self.__evicted_stamp_sum += self.__clock - stamps[victim]
+        else:
+            self.__evicted_stamp_sum += stamps[victim]
+        self.__delete_slot(victim)
+
+
+    def __find_slot(self, key):
+        """
+        Find the slot of a key
+
+        @param key: the key
+        @return: the index of the slot that holds the key,
+                 or the index of the empty slot where the key should be inserted
+        """
+        keys = self.__keys
+        slot = ((key * self.HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.__shift
+        slot_key = keys[slot]
+        while slot_key != key and slot_key != self.EMPTY_KEY:
+            slot = (slot + 1) & self.__mask
+            slot_key = keys[slot]
+        return slot
+
+
+    def __init_arrays(self, capacity):
+        """
+        Initialize the arrays of the table with empty slots
+
+        @param capacity: the number of slots, rounded up to a power of 2
+        """
+        bits = max(capacity - 1, 1).bit_length()
+        self.__capacity = 1 << bits
+        self.__shift = 64 - bits
+        self.__mask = self.__capacity - 1
+        self.__size = 0
+        self.__keys = array('q', [self.EMPTY_KEY]) * self.__capacity
+        self.__values = array('d', [0.0]) * self.__capacity
+        self.__visits = None
+        if self.with_visits:
+            self.__visits = array('i', [0]) * self.__capacity
+        self.__stamps = None
+        if self.max_size is not None:
+            self.__stamps = array('q', [0]) * self.__capacity
+
+
+    def __insert_slot(self, key):
+        """
+        Get the slot of a key, inserting the key if it is missing
+
+        @param key: the key
+        @return: a tuple with the index of the slot and a boolean value,
+                 True if the key was inserted
+        """
+        slot = self.__find_slot(key)
+        if self.__keys[slot] == key:
+            if self.__stamps is not None:
+                self.__touch(slot)
+            return slot, False
+        if self.max_size is not None and self.__size >= self.max_size:
+            self.__evict()
+            slot = self.__find_slot(key)
+        if self.__size + 1 > self.__capacity * self.MAX_LOAD_FACTOR:
+            self.__resize(self.__capacity * 2)
+            slot = self.__find_slot(key)
+        self.__keys[slot] = key
+        self.__size += 1
+        if self.__stamps is not None:
+            self.__stamps[slot] = 0
+            self.__touch(slot)
+        return slot, True
+
+
+    def __resize(self, capacity):
+        """
+        Move all entries into a table with a new capacity
+
+        @param capacity: the new number of slots
+        """
+        values = self.__values
+        visits = self.__visits
+        stamps = self.__stamps
+        entries = [(key, values[slot], visits[slot] if visits is not None else 0,
+                    stamps[slot] if stamps is not None else 0)
+                   for slot, key in enumerate(self.__keys) if key != self.EMPTY_KEY]
+        self.__init_arrays(capacity)
+        for key, value, visits, stamp in entries:
+            slot = self.__find_slot(key)
+            self.__keys[slot] = key
+            self.__values[slot] = value
+            if self.__visits is not None:
+                self.__visits[slot] = visits
+            if self.__stamps is not None:
+                self.__stamps[slot] = stamp
+        self.__size = len(entries)
+        self.__hand = 0
+
+
+    def __touch(self, slot):
+        """
+        Update the stamp of the entry of a slot of a bounded table on a use of the entry
+
+        @param slot: the index of the slot
+        """
+        self.__clock += 1
+        if self.eviction == self.EVICTION_LRU:
+            self.__stamps[slot] = self.__clock
+        else:
+            self.__stamps[slot] += 1
+
+
+    def __contains__(self, key):
+        return self.__keys[self.__find_slot(key)] == key
+
+
+    def __getitem__(self, key):
+        slot = self.__find_slot(key)
+        if self.__keys[slot] != key:
+            raise KeyError(key)
+        if self.__stamps is not None:
+            self.__touch(slot)
+        return self.__values[slot]
+
+
+    def __iter__(self):
+        for key in self.__keys:
+            if key != self.EMPTY_KEY:
+                yield key
+
+
+    def __len__(self):
+        return self.__size
+
+
+    def __setitem__(self, key, value):
+        slot = self.__insert_slot(key)[0]
+        self.__values[slot] = value
+
+
+    def entries(self):
+        """
+        Iterate over the entries of the table
+
+        @return: a generator of tuples with the key, the value and the visits of each entry
+        """
+        visits = self.__visits
+        for slot, key in enumerate(self.__keys):
+            if key != self.EMPTY_KEY:
+                yield key, self.__values[slot], visits[slot] if visits is not None else 0
+
+
+    def get(self, key, default=None):
+        """
+        Get the value of a key
+
+        @param key: the key
+        @param default: the value returned if the key is missing
+        @return: the value
+        """
+        slot = self.__find_slot(key)
+        if self.__keys[slot] != key:
+            return default
+        if self.__stamps is not None:
+            self.__touch(slot)
+        return self.__values[slot]
+
+
+    def get_entry(self, key, default=None):
+        """
+        Get the value and the visits of a key
+
+        @param key: the key
+        @param default: the tuple returned if the key is missing
+        @return: a tuple with the value and the visits
+        """
+        slot = self.__find_slot(key)
+        if self.__keys[slot] != key:
+            return default
+        if self.__stamps is not None:
+            self.__touch(slot)
+        return self.__values[slot], self.__visits[slot] if self.__visits is not None else 0
+
+
+    def get_eviction_stats(self):
+        """
+        Get the statistics of the evictions of the table
+
+        @return: a dictionary with the eviction policy, the number of entries, the maximum
+                 number of entries (None for an unbounded table), the number of evictions
+                 and the mean stamp of the evicted entries: the number of uses of the
+                 table since their last use (LRU) or the number of their uses (LFU)
+        """
+        num_of_evictions = self.__num_of_evictions
+        return {'eviction': self.eviction, 'size': self.__size, 'max_size': self.max_size,
+                'evictions': num_of_evictions,
+                'mean_evicted_stamp': self.__evicted_stamp_sum / float(num_of_evictions)
+                                      if num_of_evictions else 0.0}
+
+
+    def get_memory_size(self):
+        """
+        Get the memory allocated by the arrays of the table
+
+        @return: the size in bytes
+        """
+        arrays = [self.__keys, self.__values]
+        if self.__visits is not None:
+            arrays.append(self.__visits)
+        if self.__stamps is not None:
+            arrays.append(self.__stamps)
+        return sum(x.itemsize * len(x) for x in arrays)
+
+
+    def items(self):
+        """
+        Iterate over the keys and values of the table
+
+        @return: a generator of tuples with the key and the value of each entry
+        """
+        for key, value, _ in self.entries():
+            yield key, value
+
+
+    @staticmethod
+    def open_file(path, tag=None, max_size=None, eviction=EVICTION_LRU):
+        """
+        Open a file written by the save method of a table: a file of an array-backed
+        table is memory-mapped (see TicTacToeMappedQTable) and a file of a dict-backed
+        one is loaded (see TicTacToeDictQTable)
+
+        @param path: the path of the file
+        @param tag: the expected tag of the file, None for accepting any tag
+        @param max_size: the maximum number of entries kept in memory, or None for no limit
+        @param eviction: the eviction policy of the entries kept in memory
+        @return: the instance of the table
+        """
+        with open(path, 'rb') as model_file:
+            magic = model_file.read(len(TicTacToeQTable.DICT_FILE_MAGIC))
+        if magic == TicTacToeQTable.DICT_FILE_MAGIC:
+            return TicTacToeDictQTable.load(path, tag, max_size, eviction)
+        return TicTacToeMappedQTable(path, tag, max_size, eviction)
+
+
+    def peek(self, key, default=None):
+        """
+        Get the value of a key without changing the table, unlike get, which updates
+        the stamps of a bounded table. The readers that only peek (e.g. frozen players)
+        never write to the table, so they may share it between threads or forked processes.
+
+        @param key: the key
+        @param default: the value returned if the key is missing
+        @return: the value
+        """
+        slot = self.__find_slot(key)
+        if self.__keys[slot] != key:
+            return default
+        return self.__values[slot]
+
+
+    @staticmethod
+    def read_tag(path):
+        """
+        Read the tag of a file written by the save method of a table
+
+        @param path: the path of the file
+        @return: the tag
+        """
+        with open(path, 'rb') as model_file:
+            header = model_file.read(TicTacToeQTable.FILE_HEADER.size)
+        if len(header) != TicTacToeQTable.FILE_HEADER.size:
+            raise ValueError("{} is not a Q-Table file".format(path))
+        magic, tag = TicTacToeQTable.FILE_HEADER.unpack(header)[:2]
+        if magic not in (TicTacToeQTable.FILE_MAGIC, TicTacToeQTable.DICT_FILE_MAGIC):
+            raise ValueError("{} is not a Q-Table file".format(path))
+        return tag.rstrip(b'\0').decode('ascii')
+
+
+    def save(self, path, tag=''):
+        """
+        Save the table into a binary file
+
+        @param path: the path of the file
+        @param tag: a short string that identifies the content of the table
+        """
+        self.write_file(path, tag, self.entries(), self.with_visits)
+
+
+    @staticmethod
+    def write_file(path, tag, entries, with_visits):
+        """
+        Write the entries of a table into a binary file. The file has a fixed-size
+        header, followed by the sorted keys, the values and, optionally, the visits
+        of the entries as flat arrays in native byte order. The file is written
+        in a temporary file first, so a mapped table of the same path remains valid.
+
+        @param path: the path of the file
+        @param tag: a short string that identifies the content of the table
+        @param entries: an iterable of tuples with the key, the value and the visits
+        @param with_visits: boolean value, True for writing the visits
+        """
+        entries = sorted(entries)
+        flags = TicTacToeQTable.FLAG_WITH_VISITS if with_visits else 0
+        tmp_path = '{}.tmp'.format(path)
+        with open(tmp_path, 'wb') as model_file:
+            model_file.write(TicTacToeQTable.FILE_HEADER.pack(TicTacToeQTable.FILE_MAGIC,
+                                                              tag.encode('ascii'),
+                                                              flags, 0, len(entries)))
+            array('q', (x[0] for x in entries)).tofile(model_file)
+            array('d', (x[1] for x in entries)).tofile(model_file)
+            if with_visits:
+                array('i', (x[2] for x in entries)).tofile(model_file)
+        os.replace(tmp_path, path)
+
+
+    def set_entry(self, key, value, visits=0):
+        """
+        Set the value and the visits of a key
+
+        @param key: the key
+        @param value: the value
+        @param visits: the number of visits
+        """
+        slot = self.__insert_slot(key)[0]
+        self.__values[slot] = value
+        if self.__visits is not None:
+            self.__visits[slot] = visits
+
+
+    def setdefault(self, key, value, visits=0):
+        """
+        Insert a key with a default value and visits if the key is missing
+
+        @param key: the key
+        @param value: the default value
+        @param visits: the default number of visits
+        @return: the value of the key
+        """
+        slot, is_inserted = self.__insert_slot(key)
+        if is_inserted:
+            self.__values[slot] = value
+            if self.__visits is not None:
+                self.__visits[slot] = visits
+        return self.__values[slot]
+
+
+class TicTacToeDictQTable(object):
+    """
+    A dict-backed table with the interface of TicTacToeQTable, for the keys that do not
+    fit in its 64-bit arrays (e.g. the keys of the game states of boards of 7x7 or more).
+    Every entry is a Python list with the value, the visits and the stamp of the entry.
+
+    A bounded table keeps its entries in the order of their last use, so the least
+    recently used entry is the first one: the LRU policy evicts it and the LFU policy
+    evicts the entry with the fewest uses among the EVICTION_SAMPLES first ones.
+    """
+
+
+    def __init__(self, with_visits=False, max_size=None, eviction=TicTacToeQTable.EVICTION_LRU):
+        """
+        Constructor
+
+        @param with_visits: boolean value, True for keeping a visit counter per entry
+        @param max_size: the maximum number of entries, or None for an unbounded table
+        @param eviction: the eviction policy of a bounded table, either 'lru' or 'lfu'
+        """
+        if max_size is not None and max_size < 1:
+            raise ValueError("The maximum size must be positive, not {}".format(max_size))
+        if eviction not in (TicTacToeQTable.EVICTION_LRU, TicTacToeQTable.EVICTION_LFU):
+            raise ValueError("Unknown eviction policy: {}".format(eviction))
+        self.with_visits = with_visits
+        self.max_size = max_size
+        self.eviction = eviction
+        self.__entries = OrderedDict() if max_size is not None else {}
+        self.__clock = 0
+        self.__num_of_evictions = 0
+        self.__evicted_stamp_sum = 0
+
+
+    def __evict(self):
+        """
+        Evict the least recently (LRU) or the least frequently (LFU) used entry
+        """
+        entries = self.__entries
+        if self.eviction == TicTacToeQTable.EVICTION_LRU:
+            key = next(iter(entries))
+            self.__evicted_stamp_sum += self.__clock - entries[key][2]
+        else:
+            key = None
+            for num_of_samples, sample_key in enumerate(entries):
+                if num_of_samples == TicTacToeQTable.EVICTION_SAMPLES:
+                    break
+                if key is None or entries[sample_key][2] < entries[key][2]:
+                    key = sample_key
+            self.__evicted_stamp_sum += entries[key][2]
+        del entries[key]
+        self.__num_of_evictions += 1
+
+
+    def __get(self, key):
+        """
+        Get the entry of a key, updating its stamp if the table is bounded
+
+        @param key: the key
+        @return: the list with the value, the visits and the stamp, or None
+        """
+        entry = self.__entries.get(key)
+        if entry is not None and self.max_size is not None:
+            self.__touch(key, entry)
+        return entry
+
+
+    def __insert(self, key, value, visits):
+        """
+        Get the entry of a key, inserting the key if it is missing
+
+        @param key: the key
+        @param value: the value of an inserted key
+        @param visits: the visits of an inserted key
+        @return: a tuple with the list with the value, the visits and the stamp,
+                 and a boolean value, True if the key was inserted
+        """
+        entry = self.__get(key)
+        if entry is not None:
+            return entry, False
+        if self.max_size is not None and len(self.__entries) >= self.max_size:
+            self.__evict()
+        entry = [value, visits if self.with_visits else 0, 0]
+        self.__entries[key] = entry
+        if self.max_size is not None:
+            self.__touch(key, entry)
+        return entry, True
+
+
+    def __touch(self, key, entry):
+        """
+        Update the stamp and the order of an entry of a bounded table on a use of the entry
+
+        @param key: the key
+        @param entry: the list with the value, the visits and the stamp of the key
+        """
+        self.__clock += 1
+        if self.eviction == TicTacToeQTable.EVICTION_LRU:
+            entry[2] = self.__clock
+        else:
+            entry[2] += 1
+        self.__entries.move_to_end(key)
+
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+
+    def __getitem__(self, key):
+        entry = self.__get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry[0]
+
+
+    def __iter__(self):
+        return iter(self.__entries)
+
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+    def __setitem__(self, key, value):
+        self.__insert(key, value, 0)[0][0] = value
+
+
+    def entries(self):
+        """
+        Iterate over the entries of the table
+
+        @return: a generator of tuples with the key, the value and the visits of each entry
+        """
+        for key, entry in self.__entries.items():
+            yield key, entry[0], entry[1]
+
+
+    @staticmethod
+    def from_table(table):
+        """
+        Copy the entries of a table into a new dict-backed table with the same settings
+
+        @param table: the instance of TicTacToeQTable, TicTacToeMappedQTable or
+                      TicTacToeDictQTable
+        @return: the instance of TicTacToeDictQTable
+        """
+        dict_table = TicTacToeDictQTable(table.with_visits, getattr(table, 'max_size', None),
+                                         getattr(table, 'eviction',
+                                                 TicTacToeQTable.EVICTION_LRU))
+        for key, value, visits in table.entries():
+            dict_table.set_entry(key, value, visits)
+        return dict_table
+
+
+    def get(self, key, default=None):
+        """
+        Get the value of a key
+
+        @param key: the key
+        @param default: the value returned if the key is missing
+        @return: the value
+        """
+        entry = self.__get(key)
+        if entry is None:
+            return default
+        return entry[0]
+
+
+    def get_entry(self, key, default=None):
+        """
+        Get the value and the visits of a key
+
+        @param key: the key
+        @param default: the tuple returned if the key is missing
+        @return: a tuple with the value and the visits
+        """
+        entry = self.__get(key)
+        if entry is None:
+            return default
+        return entry[0], entry[1]
+
+
+    def get_eviction_stats(self):
+        """
+        Get the statistics of the evictions of the table (see TicTacToeQTable)
+
+        @return: a dictionary with the statistics
+        """
+        num_of_evictions = self.__num_of_evictions
+        return {'eviction': self.eviction, 'size': len(self.__entries),
+                'max_size': self.max_size, 'evictions': num_of_evictions,
+                'mean_evicted_stamp': self.__evicted_stamp_sum / float(num_of_evictions)
+                                      if num_of_evictions else 0.0}
+
+
+    def get_memory_size(self):
+        """
+        Get the memory allocated by the dict and the entries of the table (without the keys)
+
+        @return: the size in bytes
+        """
+        return sys.getsizeof(self.__entries) + sum(sys.getsizeof(x) + sys.getsizeof(x[0])
+                                                   for x in self.__entries.values())
+
+
+    def items(self):
+        """
+        Iterate over the keys and values of the table
+
+        @return: a generator of tuples with the key and the value of each entry
+        """
+        for key, value, _ in self.entries():
+            yield key, value
+
+
+    @staticmethod
+    def load(path, tag=None, max_size=None, eviction=TicTacToeQTable.EVICTION_LRU):
+        """
+        Load a table from a file written by save
+
+        @param path: the path of the file
+        @param tag: the expected tag of the file, None for accepting any tag
+        @param max_size: the maximum number of entries, or None for an unbounded table
+        @param eviction: the eviction policy of a bounded table, either 'lru' or 'lfu'
+        @return: the instance of TicTacToeDictQTable
+        """
+        with open(path, 'rb') as model_file:
+            magic, file_tag, flags, key_size, size = TicTacToeQTable.FILE_HEADER.unpack(
+                model_file.read(TicTacToeQTable.FILE_HEADER.size))
+            if magic != TicTacToeQTable.DICT_FILE_MAGIC:
+                raise ValueError("{} is not a dict Q-Table file".format(path))
+            file_tag = file_tag.rstrip(b'\0').decode('ascii')
+            if tag is not None and file_tag != tag:
+                raise ValueError("{} holds a '{}' Q-Table, not a '{}' one"
+                                 .format(path, file_tag, tag))
+            with_visits = bool(flags & TicTacToeQTable.FLAG_WITH_VISITS)
+            key_bytes = model_file.read(key_size * size)
+            value_bytes = model_file.read(8 * size)
+            visit_bytes = model_file.read(4 * size) if with_visits else b''
+        if len(key_bytes) != key_size * size or len(value_bytes) != 8 * size \
+                or len(visit_bytes) != (4 * size if with_visits else 0):
+            raise ValueError("{} is truncated".format(path))
+        values = array('d', value_bytes)
+        visits = array('i', visit_bytes)
+        table = TicTacToeDictQTable(with_visits, max_size, eviction)
+        for index in range(size):
+            key = int.from_bytes(key_bytes[index * key_size:(index + 1) * key_size], 'little')
+            table.set_entry(key, values[index], visits[index] if with_visits else 0)
+        return table
+
+
+    def peek(self, key, default=None):
+        """
+        Get the value of a key without changing the table (see TicTacToeQTable.peek)
+
+        @param key: the key
+        @param default: the value returned if the key is missing
+        @return: the value
+        """
+        entry = self.__entries.get(key)
+        if entry is None:
+            return default
+        return entry[0]
+
+
+    def save(self, path, tag=''):
+        """
+        Save the table into a binary file, laid out as the files of TicTacToeQTable
+        (see TicTacToeQTable.write_file) except for the keys: every key is written
+        as an unsigned little-endian integer of a fixed number of bytes, which is
+        the size of the largest key and is kept in the header
+
+        @param path: the path of the file
+        @param tag: a short string that identifies the content of the table
+        """
+        entries = sorted(self.entries())
+        key_size = max([(x[0].bit_length() + 7) // 8 for x in entries] or [1])
+        flags = TicTacToeQTable.FLAG_WITH_VISITS if self.with_visits else 0
+        tmp_path = '{}.tmp'.format(path)
+        with open(tmp_path, 'wb') as model_file:
+            model_file.write(TicTacToeQTable.FILE_HEADER.pack(TicTacToeQTable.DICT_FILE_MAGIC,
+                                                              tag.encode('ascii'),
+                                                              flags, key_size, len(entries)))
+            model_file.write(b''.join(x[0].to_bytes(key_size, 'little') for x in entries))
+            array('d', (x[1] for x in entries)).tofile(model_file)
+            if self.with_visits:
+                array('i', (x[2] for x in entries)).tofile(model_file)
+        os.replace(tmp_path, path)
+
+
+    def set_entry(self, key, value, visits=0):
+        """
+        Set the value and the visits of a key
+
+        @param key: the key
+        @param value: the value
+        @param visits: the number of visits
+        """
+        entry = self.__insert(key, value, visits)[0]
+        entry[0] = value
+        if self.with_visits:
+            entry[1] = visits
+
+
+    def setdefault(self, key, value, visits=0):
+        """
+        Insert a key with a default value and visits if the key is missing
+
+        @param key: the key
+        @param value: the default value
+        @param visits: the default number of visits
+        @return: the value of the key
+        """
+        return self.__insert(key, value, visits)[0][0]
+
+
+class TicTacToeMappedQTable(object):
+    """
+    A Q-Table loaded lazily from a binary file written by TicTacToeQTable.
+    The file is memory-mapped, so loading takes constant time and the pages
+    are read on demand (and shared between processes through the page cache).
+    The keys of the file are looked up with a binary search. Updates never
+    touch the file; they are kept in an in-memory TicTacToeQTable on top of it,
+    which max_size bounds (an evicted update falls back to the value of the file).
+    """
+
+
+    def __init__(self, path, tag=None, max_size=None, eviction=TicTacToeQTable.EVICTION_LRU):
+        """
+        Constructor
+
+        @param path: the path of the file
+        @param tag: the expected tag of the file, None for accepting any tag
+        @param max_size: the maximum number of in-memory updates, or None for no limit
+        @param eviction: the eviction policy of the in-memory updates, either 'lru' or 'lfu'
+        """
+        self.path = path
+        self.tag = tag
+        self.max_size = max_size
+        self.eviction = eviction
+        self.__map_file()
+        self.__overlay = TicTacToeQTable(with_visits=self.with_visits, max_size=max_size,
+                                         eviction=eviction)
+        self.__num_of_new_keys = 0
+
+
+    def __find_index(self, key):
+        """
+        Find the index of a key in the mapped file
+
+        @param key: the key
+        @return: the index of the key or -1 if the key is missing
+        """
+        index = bisect_left(self.__keys, key)
+        if index < self.__size and self.__keys[index] == key:
+            return index
+        return -1
+
+
+    def __map_file(self):
+        """
+        Memory-map the file and create the views of its arrays
+        """
+        header_size = TicTacToeQTable.FILE_HEADER.size
+        with open(self.path, 'rb') as model_file:
+            self.__mmap = mmap.mmap(model_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, tag, flags, _, size = TicTacToeQTable.FILE_HEADER.unpack_from(self.__mmap)
+        tag = tag.rstrip(b'\0').decode('ascii')
+        if magic != TicTacToeQTable.FILE_MAGIC:
+            raise ValueError("{} is not a Q-Table file".format(self.path))
+        if self.tag is not None and tag != self.tag:
+            raise ValueError("{} holds a '{}' Q-Table, not a '{}' one"
+                             .format(self.path, tag, self.tag))
+        self.with_visits = bool(flags & TicTacToeQTable.FLAG_WITH_VISITS)
+        self.__size = size
+        buffer = memoryview(self.__mmap)
+        keys_end = header_size + 8 * size
+        self.__keys = buffer[header_size:keys_end].cast('q')
+        self.__values = buffer[keys_end:keys_end + 8 * size].cast('d')
+        self.__visits = None
+        if self.with_visits:
+            self.__visits = buffer[keys_end + 8 * size:keys_end + 12 * size].cast('i')
+
+
+    def __contains__(self, key):
+        return key in self.__overlay or self.__find_index(key) >= 0
+
+
+    def __getitem__(self, key):
+        value = self.get(key, None)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+
+    def __getstate__(self):
+        return {'path': self.path, 'tag': self.tag, 'overlay': self.__overlay,
+                'num_of_new_keys': self.__num_of_new_keys}
+
+
+    def __iter__(self):
+        for key, _, _ in self.entries():
+            yield key
+
+
+    def __len__(self):
+        if self.max_size is None:
+            return self.__size + self.__num_of_new_keys
+        # the evicted new keys are gone, so the new keys are counted in the overlay
+        return self.__size + sum(1 for key in self.__overlay if self.__find_index(key) < 0)
+
+
+    def __setitem__(self, key, value):
+        self.set_entry(key, value, self.get_entry(key, (None, 0))[1])
+
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.tag = state['tag']
+        self.__map_file()
+        self.__overlay = state['overlay']
+        self.max_size = self.__overlay.max_size
+        self.eviction = self.__overlay.eviction
+        self.__num_of_new_keys = state['num_of_new_keys']
+
+
+    def entries(self):
+        """
+        Iterate over the entries of the table
+
+        @return: a generator of tuples with the key, the value and the visits of each entry
+        """
+        overlay = self.__overlay
+        visits = self.__visits
+        for index, key in enumerate(self.__keys):
+            if key not in overlay:
+                yield key, self.__values[index], visits[index] if visits is not None else 0
+        for entry in overlay.entries():
+            yield entry
+
+
+    def get(self, key, default=None):
+        """
+        Get the value of a key
+
+        @param key: the key
+        @param default: the value returned if the key is missing
+        @return: the value
+        """
+        value = self.__overlay.get(key)
+        if value is not None:
+            return value
+        index = self.__find_index(key)
+        if index < 0:
+            return default
+        return self.__values[index]
+
+
+    def get_entry(self, key, default=None):
+        """
+        Get the value and the visits of a key
+
+        @param key: the key
+        @param default: the tuple returned if the key is missing
+        @return: a tuple with the value and the visits
+        """
+        entry = self.__overlay.get_entry(key)
+        if entry is not None:
+            return entry
+        index = self.__find_index(key)
+        if index < 0:
+            return default
+        return self.__values[index], self.__visits[index] if self.__visits is not None else 0
+
+
+    def get_eviction_stats(self):
+        """
+        Get the statistics of the evictions of the in-memory updates of the table
+        (see TicTacToeQTable.get_eviction_stats)
+
+        @return: a dictionary with the statistics
+        """
+        return self.__overlay.get_eviction_stats()
+
+
+    def get_memory_size(self):
+        """
+        Get the memory allocated by the in-memory updates of the table.
+        The mapped file is not counted, since it is paged in on demand.
+
+        @return: the size in bytes
+        """
+        return self.__overlay.get_memory_size()
+
+
+    def items(self):
+        """
+        Iterate over the keys and values of the table
+
+        @return: a generator of tuples with the key and the value of each entry
+        """
+        for key, value, _ in self.entries():
+            yield key, value
+
+
+    def peek(self, key, default=None):
+        """
+        Get the value of a key without changing the table (see TicTacToeQTable.peek)
+
+        @param key: the key
+        @param default: the value returned if the key is missing
+        @return: the value
+        """
+        value = self.__overlay.peek(key)
+        if value is not None:
+            return value
+        index = self.__find_index(key)
+        if index < 0:
+            return default
+        return self.__values[index]
+
+
+    def save(self, path, tag=''):
+        """
+        Save the table, including the in-memory updates, into a binary file
+
+        @param path: the path of the file
+        @param tag: a short string that identifies the content of the table
+        """
+        TicTacToeQTable.write_file(path, tag, self.entries(), self.with_visits)
+
+
+    def set_entry(self, key, value, visits=0):
+        """
+        Set the value and the visits of a key
+
+        @param key: the key
+        @param value: the value
+        @param visits: the number of visits
+        """
+        if key not in self.__overlay and self.__find_index(key) < 0:
+            self.__num_of_new_keys += 1
+        self.__overlay.set_entry(key, value, visits)
+
+
+    def setdefault(self, key, value, visits=0):
+        """
+        Insert a key with a default value and visits if the key is missing
+
+        @param key: the key
+        @param value: the default value
+        @param visits: the default number of visits
+        @return: the value of the key
+        """
+        current_value = self.get(key)
+        if current_value is None:
+            self.__num_of_new_keys += 1
+            current_value = self.__overlay.setdefault(key, value, visits)
+        return current_value
@@ -0,0 +1,78 @@
+"""
+The replay memory of the neural network Tic-Tac-Toe player components
+"""
+import numpy as np
+
+
+class TicTacToeReplayMemory(object):
+    """
+    A ring buffer with the last transitions (game state, move, reward, next game state)
+    of a player. The transitions are kept in preallocated NumPy arrays,
+    so a minibatch is sampled with a single fancy-indexing operation per field.
+    """
+
+
+    def __init__(self, capacity, board_size):
+        """
+        Constructor
+
+        @param capacity: the maximum number of transitions; the oldest ones are overwritten
+        @param board_size: the number of rows and columns of the board
+        """
+        self.capacity = capacity
+        self.board_size = board_size
+
+        self.states = np.zeros((capacity, 2, board_size, board_size), dtype=np.float32)
+        self.moves = np.zeros((capacity, board_size, board_size), dtype=np.float32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, 2, board_size, board_size), dtype=np.float32)
+        self.next_free_seats = np.zeros((capacity, board_size, board_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+
+        self.position = 0
+        self.size = 0
+
+
+    def __len__(self):
+        return self.size
+
+
+    def add(self, state, move, reward, next_state=None, next_free_seats=None):
+        """
+        Add a transition, overwriting the oldest one if the memory is full
+
+        @param state: the splitted game state before the move
+        @param move: a 2D array with 1 at the seat of the move
+        @param reward: the reward of the move
+        @param next_state: the splitted game state at the next move of the player,
+                           or None if the game ended
+        @param next_free_seats: a 2D array with 1 at the free seats of the next game state,
+                                or None if the game ended
+        """
+        position = self.position
+        self.states[position] = state
+        self.moves[position] = move
+        self.rewards[position] = reward
+        if next_state is None:
+            self.next_states[position] = 0.
+            self.next_free_seats[position] = 0.
+            self.dones[position] = 1.
+        else:
+            self.next_states[position] = next_state
+            self.next_free_seats[position] = next_free_seats
+            self.dones[position] = 0.
+        self.position = (position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+
+    def sample(self, batch_size):
+        """
+        Sample a minibatch of transitions uniformly, with replacement
+
+        @param batch_size: the number of transitions
+        @return: a tuple with the arrays of the states, moves, rewards, next states,
+                 next free seats and end-of-game flags of the transitions
+        """
+        indexes = np.random.randint(self.size, size=batch_size)
+        return (self.states[indexes], self.moves[indexes], self.rewards[indexes],
+                self.next_states[indexes], self.next_free_seats[indexes], self.dones[indexes])
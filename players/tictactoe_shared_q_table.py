@@ -0,0 +1,356 @@
+"""
+The shared-memory Q-Table used by the Hogwild training of the tabular Tic-Tac-Toe players
+"""
+from array import array
+from multiprocessing import shared_memory
+import struct
+
+from .tictactoe_q_table import TicTacToeQTable
+
+
+class TicTacToeSharedQTable(object):
+    """
+    A fixed-capacity open-addressing (linear probing) hash table in shared memory,
+    which maps non-negative integer keys to float values and is updated by many
+    processes at once without locks (Hogwild): every process attaches to the same
+    block with its own handle (see for_worker), and the reads and writes of the
+    processes may interleave, so an update may be lost or be based on a stale value
+    (see __insert_slot for the values of the keys being inserted).
+
+    Every slot keeps a version, which a write increments, so a handle counts as a
+    conflict every write of a key that another process wrote after the handle read it.
+    Every worker counts its operations in its own row of shared counters, so the
+    counters never conflict. The keys are never deleted and the table never grows,
+    so the capacity should be well above the number of keys. A key is kept within
+    MAX_PROBES slots of its hash slot, so even a nearly full table probes at most
+    MAX_PROBES slots per lookup; the keys that do not fit are dropped (and counted).
+    """
+
+    FILE_MAGIC = b'TTTSHQT1'
+    HEADER = struct.Struct('<8sQQ')
+    MAX_PROBES = 64
+
+    COUNTER_LOOKUPS = 0
+    COUNTER_WRITES = 1
+    COUNTER_INSERTS = 2
+    COUNTER_INSERT_CONFLICTS = 3
+    COUNTER_WRITE_CONFLICTS = 4
+    COUNTER_DROPPED_KEYS = 5
+    NUM_OF_COUNTERS = 6
+
+
+    def __init__(self, capacity=1 << 20, max_workers=64, name=None, worker_id=0):
+        """
+        Constructor
+
+        @param capacity: the number of slots, rounded up to a power of 2
+                         (ignored when attaching to an existing table)
+        @param max_workers: the maximum number of handles with their own counters
+                            (ignored when attaching to an existing table)
+        @param name: the name of the shared memory block of an existing table,
+                     or None for creating a new one
+        @param worker_id: the index of the counters of this handle [0, max_workers)
+        """
+        self.__shared_memory = None
+        if name is None:
+            bits = max(capacity - 1, 1).bit_length()
+            capacity = 1 << bits
+            self.__shared_memory = shared_memory.SharedMemory(
+                create=True, size=self.HEADER.size + 8 * max_workers * self.NUM_OF_COUNTERS
+                + 20 * capacity)
+            self.HEADER.pack_into(self.__shared_memory.buf, 0, self.FILE_MAGIC, capacity,
+                                  max_workers)
+            self.__map_arrays()
+            # the shared memory is zeroed, but 0 is a valid key
+            self.__keys[:] = array('q', [TicTacToeQTable.EMPTY_KEY]) * capacity
+        else:
+            self.__shared_memory = shared_memory.SharedMemory(name=name)
+            self.__map_arrays()
+        self.name = self.__shared_memory.name
+        self.worker_id = worker_id
+        self.__counters = self.__all_counters[worker_id * self.NUM_OF_COUNTERS:
+                                              (worker_id + 1) * self.NUM_OF_COUNTERS]
+        if not 0 <= worker_id < self.max_workers:
+            raise ValueError("The worker ID must be in [0, {}), not {}".format(
+                self.max_workers, worker_id))
+        self.__read_slot = -1
+        self.__read_version = 0
+
+
+    def __find_slot(self, key):
+        """
+        Find the slot of a key
+
+        @param key: the key
+        @return: the index of the slot that holds the key, the index of the empty
+                 slot where the key should be inserted, or -1 if the key is missing
+                 and none of the MAX_PROBES slots of the key is empty
+        """
+        keys = self.__keys
+        slot = ((key * TicTacToeQTable.HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.__shift
+        slot_key = keys[slot]
+        if slot_key == key or slot_key == TicTacToeQTable.EMPTY_KEY:
+            return slot
+        for _ in range(self.__max_probes - 1):
+            slot = (slot + 1) & self.__mask
+            slot_key = keys[slot]
+            if slot_key == key or slot_key == TicTacToeQTable.EMPTY_KEY:
+                return slot
+        return -1
+
+
+    def __insert_slot(self, key, value):
+        """
+        Get the slot of a key, inserting the key with a value if it is missing.
+        The key claims the empty slot first, and the value is written only if
+        the key is still there, so if another process takes the slot first the
+        probing goes on instead of writing over the value of the other key.
+        The key and the value are not written atomically, so a slot may hold
+        a stale value: a process may read a new key before its value is written
+        (and get 0.0), and of two processes claiming the same slot at the same
+        time, the one that lost may still write its value (the initial value
+        of its key) under the key of the other one.
+
+        @param key: the key
+        @param value: the value of an inserted key
+        @return: a tuple with the index of the slot (-1 if the key was dropped)
+                 and a boolean value, True if the key was inserted
+        """
+        keys = self.__keys
+        counters = self.__counters
+        while True:
+            slot = self.__find_slot(key)
+            if slot < 0:
+                counters[self.COUNTER_DROPPED_KEYS] += 1
+                return slot, False
+            if keys[slot] == key:
+                return slot, False
+            keys[slot] = key
+            if keys[slot] == key:
+                self.__values[slot] = value
+                counters[self.COUNTER_INSERTS] += 1
+                return slot, True
+            counters[self.COUNTER_INSERT_CONFLICTS] += 1
+
+
+    def __map_arrays(self):
+        """
+        Create the views of the arrays of the shared memory block
+        """
+        buffer = self.__shared_memory.buf
+        magic, capacity, max_workers = self.HEADER.unpack_from(buffer, 0)
+        if magic != self.FILE_MAGIC:
+            self.__shared_memory.close()
+            raise ValueError("{} is not a shared Q-Table".format(self.__shared_memory.name))
+        self.capacity = capacity
+        self.max_workers = max_workers
+        self.__shift = 64 - (capacity - 1).bit_length()
+        self.__mask = capacity - 1
+        self.__max_probes = min(capacity, self.MAX_PROBES)
+        offset = self.HEADER.size
+        counters_end = offset + 8 * max_workers * self.NUM_OF_COUNTERS
+        self.__all_counters = buffer[offset:counters_end].cast('q')
+        self.__keys = buffer[counters_end:counters_end + 8 * capacity].cast('q')
+        self.__values = buffer[counters_end + 8 * capacity:counters_end + 16 * capacity].cast('d')
+        self.__versions = buffer[counters_end + 16 * capacity:
+                                 counters_end + 20 * capacity].cast('I')
+
+
+    def __read(self, slot):
+        """
+        Read the value of a slot, remembering its version for the conflict check of a write
+
+        @param slot: the index of the slot
+        @return: the value
+        """
+        self.__counters[self.COUNTER_LOOKUPS] += 1
+        self.__read_slot = slot
+        self.__read_version = self.__versions[slot]
+        return self.__values[slot]
+
+
+    def __contains__(self, key):
+        slot = self.__find_slot(key)
+        return slot >= 0 and self.__keys[slot] == key
+
+
+    def __del__(self):
+        self.close()
+
+
+    def __getitem__(self, key):
+        slot = self.__find_slot(key)
+        if slot < 0 or self.__keys[slot] != key:
+            raise KeyError(key)
+        return self.__read(slot)
+
+
+    def __getstate__(self):
+        return {'name': self.name, 'worker_id': self.worker_id}
+
+
+    def __iter__(self):
+        for key, _, _ in self.entries():
+            yield key
+
+
+    def __len__(self):
+        return sum(1 for _ in self.entries())
+
+
+    def __setitem__(self, key, value):
+        slot, is_inserted = self.__insert_slot(key, value)
+        if slot < 0 or is_inserted:
+            return
+        versions = self.__versions
+        version = versions[slot]
+        if slot == self.__read_slot and version != self.__read_version:
+            self.__counters[self.COUNTER_WRITE_CONFLICTS] += 1
+        self.__values[slot] = value
+        versions[slot] = (version + 1) & 0xFFFFFFFF
+        self.__read_slot = -1
+        self.__counters[self.COUNTER_WRITES] += 1
+
+
+    def __setstate__(self, state):
+        self.__init__(name=state['name'], worker_id=state['worker_id'])
+
+
+    def close(self):
+        """
+        Detach the handle from the shared memory block (called again, it does nothing)
+        """
+        if self.__shared_memory is None or self.__shared_memory.buf is None:
+            return
+        self.__all_counters.release()
+        self.__counters.release()
+        self.__keys.release()
+        self.__values.release()
+        self.__versions.release()
+        self.__shared_memory.close()
+
+
+    def entries(self):
+        """
+        Iterate over the entries of the table
+
+        @return: a generator of tuples with the key, the value and the visits
+                 (always 0) of each entry
+        """
+        values = self.__values
+        for slot, key in enumerate(self.__keys):
+            if key != TicTacToeQTable.EMPTY_KEY:
+                yield key, values[slot], 0
+
+
+    def for_worker(self, worker_id):
+        """
+        Create a handle of the table with its own counters, e.g. for a worker process
+
+        @param worker_id: the index of the counters of the handle [0, max_workers)
+        @return: the instance of TicTacToeSharedQTable
+        """
+        return TicTacToeSharedQTable(name=self.name, worker_id=worker_id)
+
+
+    def get(self, key, default=None):
+        """
+        Get the value of a key
+
+        @param key: the key
+        @param default: the value returned if the key is missing
+        @return: the value
+        """
+        slot = self.__find_slot(key)
+        if slot < 0 or self.__keys[slot] != key:
+            return default
+        return self.__read(slot)
+
+
+    def get_memory_size(self):
+        """
+        Get the size of the shared memory block
+
+        @return: the size in bytes
+        """
+        return self.__shared_memory.size
+
+
+    def get_stats(self):
+        """
+        Get the counters of all the handles of the table
+
+        @return: a dictionary with the total lookups, writes, inserts, insert conflicts
+                 (empty slots taken by another process first), write conflicts (writes
+                 of keys written by another process since their lookup), dropped keys
+                 (keys that did not fit) and the rate of the write conflicts per write
+        """
+        totals = [0] * self.NUM_OF_COUNTERS
+        for worker_id in range(self.max_workers):
+            for counter in range(self.NUM_OF_COUNTERS):
+                totals[counter] += self.__all_counters[worker_id * self.NUM_OF_COUNTERS
+                                                       + counter]
+        writes = totals[self.COUNTER_WRITES]
+        return {'lookups': totals[self.COUNTER_LOOKUPS], 'writes': writes,
+                'inserts': totals[self.COUNTER_INSERTS],
+                'insert_conflicts': totals[self.COUNTER_INSERT_CONFLICTS],
+                'write_conflicts': totals[self.COUNTER_WRITE_CONFLICTS],
+                'dropped_keys': totals[self.COUNTER_DROPPED_KEYS],
+                'conflict_rate': totals[self.COUNTER_WRITE_CONFLICTS] / float(writes)
+                                 if writes else 0.0}
+
+
+    def items(self):
+        """
+        Iterate over the keys and values of the table
+
+        @return: a generator of tuples with the key and the value of each entry
+        """
+        for key, value, _ in self.entries():
+            yield key, value
+
+
+    def save(self, path, tag=''):
+        """
+        Save the table into a binary file of TicTacToeQTable
+
+        @param path: the path of the file
+        @param tag: a short string that identifies the content of the table
+        """
+        TicTacToeQTable.write_file(path, tag, self.entries(), False)
+
+
+    def setdefault(self, key, value, visits=0):
+        """
+        Insert a key with a default value if the key is missing
+
+        @param key: the key
+        @param value: the default value
+        @param visits: ignored, as the table keeps no visits
+        @return: the value of the key
+        """
+        slot, is_inserted = self.__insert_slot(key, value)
+        if slot < 0:
+            return value
+        if is_inserted:
+            return self.__values[slot]
+        return self.__read(slot)
+
+
+    def to_table(self):
+        """
+        Copy the entries into a new (private) TicTacToeQTable
+
+        @return: the instance of TicTacToeQTable
+        """
+        table = TicTacToeQTable(int(self.capacity * TicTacToeQTable.MAX_LOAD_FACTOR))
+        for key, value in self.items():
+            table[key] = value
+        return table
+
+
+    def unlink(self):
+        """
+        Destroy the shared memory block, once every process has closed its handle
+        """
+        self.__shared_memory.unlink()
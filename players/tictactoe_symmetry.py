@@ -0,0 +1,81 @@
+"""
+The symmetries (rotations and reflections) of the Tic-Tac-Toe board,
+used by the tabular player components for canonicalizing the game states
+"""
+from operator import mul
+
+
+class TicTacToeSymmetry(object):
+    """
+    The symmetries (rotations and reflections) of the Tic-Tac-Toe board.
+    A game state is encoded as a base-3 integer per orientation of the board,
+    so the 8 orientations of a square board give 8 integer keys and
+    the smallest one is the key of the canonical orientation.
+    """
+
+    __cache = {}
+
+
+    def __init__(self, board_size, use_symmetries=True):
+        """
+        Constructor
+
+        @param board_size: the number of rows and columns of the board
+        @param use_symmetries: boolean value, False for keeping only the identity
+        """
+        self.board_size = board_size
+        last = board_size - 1
+        transforms = [lambda row, col: (row, col)]
+        if use_symmetries:
+            transforms += [lambda row, col: (col, last - row),
+                           lambda row, col: (last - row, last - col),
+                           lambda row, col: (last - col, row),
+                           lambda row, col: (row, last - col),
+                           lambda row, col: (last - row, col),
+                           lambda row, col: (col, row),
+                           lambda row, col: (last - col, last - row)]
+        num_of_seats = board_size * board_size
+        self.seat_permutations = tuple(tuple(x * board_size + y for x, y in
+                                             (transform(row, col) for row in range(board_size)
+                                              for col in range(board_size)))
+                                       for transform in transforms)
+        self.seat_weights = tuple(tuple(3 ** (num_of_seats - 1 - x) for x in permutation)
+                                  for permutation in self.seat_permutations)
+
+
+    @staticmethod
+    def get_symmetry(board_size, use_symmetries):
+        """
+        Get the (cached) symmetries of a board
+
+        @param board_size: the number of rows and columns of the board
+        @param use_symmetries: boolean value, False for keeping only the identity
+        @return: an instance of TicTacToeSymmetry
+        """
+        key = (board_size, bool(use_symmetries))
+        cache = TicTacToeSymmetry.__cache
+        if key not in cache:
+            cache[key] = TicTacToeSymmetry(board_size, use_symmetries)
+        return cache[key]
+
+
+    def get_canonical_key(self, keys):
+        """
+        Get the key of the canonical orientation
+
+        @param keys: a tuple with the keys of the game state, one per orientation
+        @return: a tuple with the canonical key and the seat permutation
+                 that maps a seat to the canonical orientation
+        """
+        canonical_key = min(keys)
+        return canonical_key, self.seat_permutations[keys.index(canonical_key)]
+
+
+    def get_keys(self, seats):
+        """
+        Get the keys of a game state, one per orientation
+
+        @param seats: a flatten list with the internal notation of every seat
+        @return: a tuple with the base-3 integer keys
+        """
+        return tuple(sum(map(mul, seats, weights)) for weights in self.seat_weights)
@@ -2,84 +2,533 @@ from __future__ import print_function
 
 from datetime import datetime
 import argparse
+import copy
+import cProfile
+import importlib
+import inspect
+import multiprocessing
+import random
 import sys
 import time
 
-from games import TicTacToeGame
-from players import *
+import games
+from games import TicTacToeGame, TicTacToeProfiler, TicTacToeRecorder, TicTacToeRecordReader
+from players import get_player_class, get_player_names, TicTacToeComputerFrozen, TicTacToeHuman
 
-all_players = {}
-all_players['Naive'] = {'class': TicTacToeComputerNaive, 'instance': None, 'win': 0 }
-all_players['Random'] = {'class': TicTacToeComputerRandom, 'instance': None, 'win': 0 }
-all_players['Q-Learning'] = {'class': TicTacToeComputerQLearning, 'instance': None, 'win': 0 }
-all_players['Tensorflow'] = {'class': TicTacToeComputerTensorflow, 'instance': None, 'win': 0 }
+all_players = []
 
-   
-def main(p1_class, p2_class, num_of_training_games, num_of_test_games, play_after_train=False):
+
+def create_player(player_class, max_q_values=None, eviction=None):
+    """
+    Create an instance of a player, bounding the Q-Values of the players that support it
+
+    @param player_class: the class of the player
+    @param max_q_values: the maximum number of Q-Values kept in memory, or None for no limit
+    @param eviction: the eviction policy of the Q-Values, either 'lru' or 'lfu'
+    @return: the instance of the player
+    """
+    if max_q_values and 'max_q_values' in inspect.signature(player_class).parameters:
+        return player_class(max_q_values=max_q_values, eviction=eviction)
+    return player_class()
+
+
+def get_model_path(prefix, player_number):
+    """
+    Get the path of the model file of a player
+
+    @param prefix: the prefix of the model files
+    @param player_number: the number of the player (1 or 2)
+    @return: the path of the model file
+    """
+    return '{}-p{}.model'.format(prefix, player_number)
+
+
+def play_training_games(players, num_of_games, engine, batch_size, profiler=None, recorder=None):
+    """
+    Play training games, swapping the seats of the players after every game (or batch of games)
+
+    @param players: a list with the instances of the two players
+    @param num_of_games: the number of training games
+    @param engine: the engine used by the game
+    @param batch_size: the number of games played at once by the batch game engine,
+                       zero for playing one game at a time
+    @param profiler: an instance of TicTacToeProfiler for timing the games, or None
+    @param recorder: an instance of TicTacToeRecorder for recording the games, or None
+    """
+    players = list(players)
+    if batch_size:
+        for i in range(0, num_of_games, batch_size):
+            players.reverse()
+            games.TicTacToeBatchGame(players[0], players[1],
+                                     min(batch_size, num_of_games - i)).play()
+    else:
+        for i in range(num_of_games):
+            players.reverse()
+            TicTacToeGame(players[0], players[1], be_verbose=False, engine=engine,
+                          profiler=profiler, recorder=recorder).play()
+
+
+def train_from_record(players, path, batch_size):
+    """
+    Train the players on the games of a game log, without playing them.
+    Every player learns from the seats of the games that were taken by a player
+    of its own class, in batches of games.
+
+    @param players: a list with the instances of the players
+    @param path: the path of the game log
+    @param batch_size: the number of recorded games per training batch
+    @return: the number of recorded games
+    """
+    reader = TicTacToeRecordReader(path)
+    learners = [(type(x).__name__, x) for x in players if hasattr(x, 'train_from_games')]
+    num_of_games = 0
+    while learners and num_of_games < len(reader):
+        batches = [[] for _ in learners]
+        for labels, result, moves in reader.read(num_of_games, num_of_games + batch_size):
+            for (label, _), batch in zip(learners, batches):
+                for seat in range(len(labels)):
+                    if labels[seat] == label:
+                        batch.append((seat, result, moves))
+        for (_, player), batch in zip(learners, batches):
+            player.train_from_games(batch, reader.board_size)
+        num_of_games = min(num_of_games + batch_size, len(reader))
+    return num_of_games
+
+
+def train_shard(shard):
+    """
+    Play a shard of the training games in a worker process
+
+    @param shard: a tuple with the instances of the players, the number of games,
+                  the random seed, the engine and the batch size
+    @return: a list with the trained instances of the players
+    """
+    import numpy as np
+
+    players, num_of_games, seed, engine, batch_size = shard
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    play_training_games(players, num_of_games, engine, batch_size)
+    return players
+
+
+def play_training_games_in_parallel(players, num_of_games, num_of_workers, sync_interval,
+                                    engine, batch_size):
+    """
+    Play training games in a pool of worker processes. Every worker plays
+    sync_interval games starting from the players' current state, then the
+    Q-Values learned by the workers are merged into the players and the
+    result is broadcast back to the workers on the next round.
+
+    @param players: a list with the instances of the two players
+    @param num_of_games: the number of training games
+    @param num_of_workers: the number of worker processes
+    @param sync_interval: the number of games played by each worker between merges
+    @param engine: the engine used by the game
+    @param batch_size: the number of games played at once by the batch game engine
+    """
+    if sync_interval < 1:
+        raise ValueError("The sync interval must be positive, not {}".format(sync_interval))
+    pool = multiprocessing.Pool(num_of_workers)
+    try:
+        games_left = num_of_games
+        while games_left > 0:
+            games_per_worker = min(sync_interval, -(-games_left // num_of_workers))
+            shards = []
+            for x in range(num_of_workers):
+                shard_games = min(games_per_worker, games_left - x * games_per_worker)
+                if shard_games > 0:
+                    shards.append((players, shard_games, random.getrandbits(64), engine,
+                                   batch_size))
+            trained_players = pool.map(train_shard, shards)
+            for idx, player in enumerate(players):
+                worker_players = [x[idx] for x in trained_players]
+                if hasattr(player, 'merge_q_values'):
+                    player.merge_q_values(worker_players)
+                base_epsilon = getattr(player, 'epsilon', None)
+                if base_epsilon:
+                    # every worker decayed epsilon on its own share of the games
+                    for worker_player in worker_players:
+                        player.epsilon *= worker_player.epsilon / base_epsilon
+            games_left -= sum(x[1] for x in shards)
+        pool.close()
+    finally:
+        # a shard that raised leaves the pool running, so its workers are stopped
+        pool.terminate()
+        pool.join()
+
+
+def train_hogwild_shard(shard):
+    """
+    Play a shard of the training games in a worker process, updating the shared Q-Values
+
+    @param shard: a tuple with the instances of the players, the number of games,
+                  the random seed, the engine and the batch size
+    @return: a list with the trained instances of the players, without their shared Q-Values
+    """
+    from players.tictactoe_shared_q_table import TicTacToeSharedQTable
+
+    players = train_shard(shard)
+    for player in players:
+        if isinstance(getattr(player, 'q_values', None), TicTacToeSharedQTable):
+            player.q_values.close()
+            player.q_values = None
+    return players
+
+
+def play_training_games_hogwild(players, num_of_games, num_of_workers, engine, batch_size,
+                                capacity):
+    """
+    Play training games in a pool of worker processes, which update the Q-Values of the
+    Q-Learning players in shared memory at once and without locks (Hogwild), so there
+    are no merge pauses. The other tabular players learn on their own in every worker
+    and their Q-Values are merged once, after all the games.
+
+    @param players: a list with the instances of the two players
+    @param num_of_games: the number of training games
+    @param num_of_workers: the number of worker processes
+    @param engine: the engine used by the game
+    @param batch_size: the number of games played at once by the batch game engine
+    @param capacity: the number of slots of every shared Q-Table
+    @return: a list with the labels of the Q-Learning players and the counters
+             of their shared Q-Tables (see TicTacToeSharedQTable.get_stats)
+    """
+    from players import TicTacToeComputerQLearning
+    from players.tictactoe_shared_q_table import TicTacToeSharedQTable
+
+    if num_of_workers < 1:
+        raise ValueError("The hogwild training needs at least one worker, not {}".format(
+            num_of_workers))
+    shared_tables = {}
+    worker_tables = []
+    pool = None
+    try:
+        # the handle of this process has the counters 0 and the workers have the next ones
+        for idx, player in enumerate(players):
+            if isinstance(player, TicTacToeComputerQLearning):
+                shared_table = TicTacToeSharedQTable(capacity, num_of_workers + 1)
+                shared_tables[idx] = shared_table
+                for key, value in player.q_values.items():
+                    shared_table[key] = value
+        shards = []
+        for x in range(num_of_workers):
+            shard_players = [copy.copy(player) for player in players]
+            for idx, shared_table in shared_tables.items():
+                shard_players[idx].q_values = shared_table.for_worker(x + 1)
+                worker_tables.append(shard_players[idx].q_values)
+            shard_games = num_of_games // num_of_workers + (x < num_of_games % num_of_workers)
+            shards.append((shard_players, shard_games, random.getrandbits(64), engine,
+                           batch_size))
+        pool = multiprocessing.Pool(num_of_workers)
+        trained_players = pool.map(train_hogwild_shard, shards)
+        pool.close()
+        stats = []
+        for idx, player in enumerate(players):
+            worker_players = [x[idx] for x in trained_players]
+            if idx in shared_tables:
+                shared_table = shared_tables[idx]
+                stats.append((type(player).__name__, shared_table.get_stats()))
+                player.q_values = shared_table.to_table()
+                player.board_size = worker_players[0].board_size
+            elif hasattr(player, 'merge_q_values'):
+                player.merge_q_values(worker_players)
+            base_epsilon = getattr(player, 'epsilon', None)
+            if base_epsilon:
+                # every worker decayed epsilon on its own share of the games
+                for worker_player in worker_players:
+                    player.epsilon *= worker_player.epsilon / base_epsilon
+        return stats
+    finally:
+        # the shared memory blocks outlive the processes, so they are removed on errors too
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        for worker_table in worker_tables:
+            worker_table.close()
+        for shared_table in shared_tables.values():
+            shared_table.close()
+            shared_table.unlink()
+
+
+def main(p1_class, p2_class, num_of_training_games, num_of_test_games, play_after_train=False,
+         engine=TicTacToeGame.ENGINE_LIST, batch_size=0, num_of_workers=0, sync_interval=500,
+         load_model=None, save_model=None, profile=False, record=None, train_from=None,
+         offline_batch_size=10000, freeze=False, max_q_values=None, eviction='lru',
+         hogwild=False, shared_capacity=1 << 20):
     start_time = datetime.now()
-    all_players[p1_class]['instance'] = all_players[p1_class]['class']()
-    all_players[p2_class]['instance'] = all_players[p2_class]['class']()
-    plist = [all_players[p1_class], all_players[p2_class]]
+    profiler = TicTacToeProfiler() if profile else None
+    recorder = TicTacToeRecorder(record) if record else None
+    # one entry per seat, so a player class can play against itself
+    for player_class in (p1_class, p2_class):
+        all_players.append({'class': get_player_class(player_class), 'instance': None, 'win': 0})
+        all_players[-1]['instance'] = create_player(all_players[-1]['class'], max_q_values,
+                                                    eviction)
+    plist = list(all_players)
+
+    players = [x['instance'] for x in plist]
+
+    # LOAD MODELS
+    if load_model:
+        for idx, player in enumerate(players):
+            if hasattr(player, 'load_model'):
+                player.load_model(get_model_path(load_model, idx + 1))
+
+    # OFFLINE TRAINING
+    if train_from:
+        num_of_recorded_games = train_from_record(players, train_from, offline_batch_size)
+        print("Trained on {} recorded games of {}".format(num_of_recorded_games, train_from))
 
     # TRAINING GAMES
-    for i in range(num_of_training_games):
-        plist.reverse()
-        TicTacToeGame(plist[0]['instance'], plist[1]['instance'], be_verbose=False).play()
+    if hogwild:
+        training_start_time = time.time()
+        hogwild_stats = play_training_games_hogwild(players, num_of_training_games,
+                                                    num_of_workers, engine, batch_size,
+                                                    shared_capacity)
+        training_time = time.time() - training_start_time
+        print("Hogwild: {} training games in {:.1f} sec ({:.0f} games/sec) by {} workers".format(
+            num_of_training_games, training_time, num_of_training_games / training_time,
+            num_of_workers))
+        for label, stats in hogwild_stats:
+            print("{}: {} lookups, {} writes ({:.0f} writes/sec), {} inserts, "
+                  "{} insert conflicts, {} write conflicts ({:.4%}), {} dropped keys".format(
+                      label, stats['lookups'], stats['writes'], stats['writes'] / training_time,
+                      stats['inserts'], stats['insert_conflicts'], stats['write_conflicts'],
+                      stats['conflict_rate'], stats['dropped_keys']))
+    elif num_of_workers > 1:
+        play_training_games_in_parallel(players, num_of_training_games, num_of_workers,
+                                        sync_interval, engine, batch_size)
+    else:
+        play_training_games(players, num_of_training_games, engine, batch_size, profiler,
+                            recorder)
+
+    # EVICTION STATISTICS
+    for player in players:
+        q_values = getattr(player, 'q_values', None)
+        if getattr(q_values, 'max_size', None):
+            stats = q_values.get_eviction_stats()
+            print("{}: {} of {} Q-Values kept, {} evicted ({}, mean evicted stamp {:.1f})".format(
+                type(player).__name__, stats['size'], stats['max_size'], stats['evictions'],
+                stats['eviction'], stats['mean_evicted_stamp']))
 
     # DISABLE RANDOM MOVES
     for player in plist:
         player['instance'].epsilon = 0.0
 
+    # FREEZE THE GREEDY POLICIES
+    if freeze:
+        for player in plist:
+            if hasattr(player['instance'], 'get_best_move'):
+                player['instance'] = TicTacToeComputerFrozen.compile_player(player['instance'])
+
+    # SAVE MODELS (the frozen policies, if the players are frozen)
+    if save_model:
+        for idx, player in enumerate(plist):
+            if hasattr(player['instance'], 'save_model'):
+                player['instance'].save_model(get_model_path(save_model, idx + 1))
+
     # TEST GAMES
-    for i in range(num_of_test_games):
-        plist.reverse()
-        res = TicTacToeGame(plist[0]['instance'], plist[1]['instance'], be_verbose=False).play()
-        if res != None:
-            plist[res]['win'] += 1
+    if batch_size:
+        for i in range(0, num_of_test_games, batch_size):
+            plist.reverse()
+            results = games.TicTacToeBatchGame(plist[0]['instance'], plist[1]['instance'],
+                                               min(batch_size, num_of_test_games - i)).play()
+            for res in results[results != games.TicTacToeBatchGame.RESULT_DRAW]:
+                plist[res]['win'] += 1
+    else:
+        for i in range(num_of_test_games):
+            plist.reverse()
+            res = TicTacToeGame(plist[0]['instance'], plist[1]['instance'], be_verbose=False,
+                                engine=engine, profiler=profiler, recorder=recorder).play()
+            if res != None:
+                plist[res]['win'] += 1
 
-    wins = [ x['win'] for x in plist ]
+    wins = [all_players[0]['win'], all_players[1]['win']]
     draws = num_of_test_games - sum(wins)
     print("{}: {} - {}: {} - Draw: {}".format(p1_class, wins[0], p2_class, wins[1], draws))
 
+    if profiler is not None:
+        print(profiler.get_report())
+
+    if recorder is not None:
+        recorder.close()
+        print("{} games are recorded in {}".format(len(recorder), record))
+
     if play_after_train:
         time.sleep(5)
         hlist = [TicTacToeHuman(), plist[0]['instance']]
         while (True):
-            TicTacToeGame(*hlist, be_verbose=True).play()
+            TicTacToeGame(*hlist, be_verbose=True, engine=engine).play()
             time.sleep(5)
             hlist.reverse()
 
-parser = argparse.ArgumentParser(description='Implementation of Tic-Tac-Toe Agents using Reinforcement Learning techniques')
-parser.add_argument('-1', '--p1',
-                      action='store',
-                      dest='p1',
-                      choices=all_players.keys(),
-                      required=True,
-                      help='Type of Player 1',)
-parser.add_argument('-2', '--p2',
-                      action='store',
-                      dest='p2',
-                      choices=all_players.keys(),
-                      required=True,
-                      help='Type of Player 2',)
-parser.add_argument('-n', '--number-of-training-games',
-                      type=int,
-                      action='store',
-                      dest='number_of_training_games',
-                      default=5000,
-                      help='Number of training games',)
-parser.add_argument('-t', '--number-of-test-games',
-                      type=int,
-                      action='store',
-                      dest='number_of_test_games',
-                      default=1000,
-                      help='Number of test games',)
-parser.add_argument('-p', '--play-after-train',
-                      action='store_true',
-                      dest='play_after_train',
-                      help='Play after training with com player 1')
-args = parser.parse_args()
-main(args.p1, args.p2, 
-     args.number_of_training_games,
-     args.number_of_test_games,
-     play_after_train=args.play_after_train)
+
+if __name__ == '__main__':
+    # the plugins are imported first, so the players they register are valid choices
+    plugin_parser = argparse.ArgumentParser(add_help=False)
+    plugin_parser.add_argument('--plugin',
+                          action='append',
+                          dest='plugins',
+                          default=[],
+                          metavar='MODULE',
+                          help='Import a module that registers more players (can be repeated)',)
+    for plugin in plugin_parser.parse_known_args()[0].plugins:
+        importlib.import_module(plugin)
+
+    parser = argparse.ArgumentParser(description='Implementation of Tic-Tac-Toe Agents using Reinforcement Learning techniques',
+                                     parents=[plugin_parser])
+    parser.add_argument('-1', '--p1',
+                          action='store',
+                          dest='p1',
+                          choices=get_player_names(),
+                          required=True,
+                          help='Type of Player 1',)
+    parser.add_argument('-2', '--p2',
+                          action='store',
+                          dest='p2',
+                          choices=get_player_names(),
+                          required=True,
+                          help='Type of Player 2',)
+    parser.add_argument('-n', '--number-of-training-games',
+                          type=int,
+                          action='store',
+                          dest='number_of_training_games',
+                          default=5000,
+                          help='Number of training games',)
+    parser.add_argument('-t', '--number-of-test-games',
+                          type=int,
+                          action='store',
+                          dest='number_of_test_games',
+                          default=1000,
+                          help='Number of test games',)
+    parser.add_argument('-p', '--play-after-train',
+                          action='store_true',
+                          dest='play_after_train',
+                          help='Play after training with com player 1')
+    parser.add_argument('-e', '--engine',
+                          action='store',
+                          dest='engine',
+                          choices=(TicTacToeGame.ENGINE_LIST, TicTacToeGame.ENGINE_BITBOARD),
+                          default=TicTacToeGame.ENGINE_LIST,
+                          help='Game engine used for checking the winning lines',)
+    parser.add_argument('-b', '--batch-size',
+                          type=int,
+                          action='store',
+                          dest='batch_size',
+                          default=0,
+                          help='Number of games played at once by the batch game engine',)
+    parser.add_argument('-w', '--workers',
+                          type=int,
+                          action='store',
+                          dest='workers',
+                          default=0,
+                          help='Number of worker processes playing the training games',)
+    parser.add_argument('--sync-interval',
+                          type=int,
+                          action='store',
+                          dest='sync_interval',
+                          default=500,
+                          help='Number of training games played by each worker between Q-Values merges',)
+    parser.add_argument('--hogwild',
+                          action='store_true',
+                          dest='hogwild',
+                          help='Let the workers update the Q-Values of the Q-Learning players in shared memory without locks, instead of merging them',)
+    parser.add_argument('--shared-capacity',
+                          type=int,
+                          action='store',
+                          dest='shared_capacity',
+                          default=1 << 20,
+                          help='Number of slots of the shared Q-Values of a Q-Learning player in the hogwild mode',)
+    parser.add_argument('--load-model',
+                          action='store',
+                          dest='load_model',
+                          metavar='PREFIX',
+                          help='Load the models of the players from PREFIX-p1.model and PREFIX-p2.model',)
+    parser.add_argument('--save-model',
+                          action='store',
+                          dest='save_model',
+                          metavar='PREFIX',
+                          help='Save the models of the players after training to PREFIX-p1.model and PREFIX-p2.model',)
+    parser.add_argument('--freeze',
+                          action='store_true',
+                          dest='freeze',
+                          help='Compile the greedy policies of the tabular players after training, so the test games cost no learning (--save-model saves the compiled policies)',)
+    parser.add_argument('--profile',
+                          action='store_true',
+                          dest='profile',
+                          help='Print the time spent per phase of the games and player (games played one at a time in this process only)',)
+    parser.add_argument('--record',
+                          action='store',
+                          dest='record',
+                          metavar='PATH',
+                          help='Append the games to the game log at PATH (games played one at a time in this process only)',)
+    parser.add_argument('--train-from',
+                          action='store',
+                          dest='train_from',
+                          metavar='PATH',
+                          help='Train the players on the games of the game log at PATH before the training games',)
+    parser.add_argument('--offline-batch-size',
+                          type=int,
+                          action='store',
+                          dest='offline_batch_size',
+                          default=10000,
+                          help='Number of recorded games per offline training batch',)
+    parser.add_argument('--max-q-values',
+                          type=int,
+                          action='store',
+                          dest='max_q_values',
+                          metavar='N',
+                          help='Keep at most N Q-Values in memory per tabular player, evicting the others (not with --train-from)',)
+    parser.add_argument('--eviction',
+                          action='store',
+                          dest='eviction',
+                          choices=('lru', 'lfu'),
+                          default='lru',
+                          help='Eviction policy of the bounded Q-Values: least recently or least frequently used',)
+    parser.add_argument('--cprofile',
+                          action='store',
+                          dest='cprofile',
+                          metavar='PATH',
+                          help='Run under cProfile and dump the stats to PATH (see the pstats module)',)
+    args = parser.parse_args()
+    if args.sync_interval < 1:
+        parser.error("argument --sync-interval: must be positive")
+    if args.hogwild and args.workers < 1:
+        parser.error("argument --hogwild: requires -w/--workers")
+    if args.train_from and args.max_q_values:
+        # the offline training initializes every game state once per batch, so it never evicts
+        parser.error("argument --train-from: not allowed with --max-q-values")
+    for option, name in (('-1/--p1', args.p1), ('-2/--p2', args.p2)):
+        if getattr(get_player_class(name), 'MODEL_ONLY', False) and not args.load_model:
+            parser.error("argument {}: {} plays a model file only, so it requires "
+                         "--load-model".format(option, name))
+    if args.cprofile:
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+    try:
+        main(args.p1, args.p2, 
+             args.number_of_training_games,
+             args.number_of_test_games,
+             play_after_train=args.play_after_train,
+             engine=args.engine,
+             batch_size=args.batch_size,
+             num_of_workers=args.workers,
+             sync_interval=args.sync_interval,
+             load_model=args.load_model,
+             save_model=args.save_model,
+             profile=args.profile,
+             record=args.record,
+             train_from=args.train_from,
+             offline_batch_size=args.offline_batch_size,
+             freeze=args.freeze,
+             max_q_values=args.max_q_values,
+             eviction=args.eviction,
+             hogwild=args.hogwild,
+             shared_capacity=args.shared_capacity)
+    finally:
+        # e.g. the pools of workers of the MCTS players
+        for player in all_players:
+            if hasattr(player['instance'], 'close'):
+                player['instance'].close()
+        if args.cprofile:
+            cprofiler.disable()
+            cprofiler.dump_stats(args.cprofile)
@@ -0,0 +1,181 @@
+"""
+Serve games of remote players against a trained player over TCP,
+e.g. play with 'nc localhost 8765' (see TicTacToeServer for the protocol)
+"""
+from __future__ import print_function
+
+import argparse
+import importlib
+import os
+import signal
+import socket
+
+from games import TicTacToeGame, TicTacToeRecorder, TicTacToeServer
+from players import get_player_class, get_player_names, TicTacToeComputerFrozen
+
+from run import get_model_path, play_training_games
+
+
+def create_player(name, num_of_training_games, load_model=None, freeze=False, learn=False):
+    """
+    Create the hosted player, either loading its model or training it against the Random player
+
+    @param name: the registered name of the player
+    @param num_of_training_games: the number of training games, if no model is loaded
+    @param load_model: the prefix of the model file of the player, or None
+    @param freeze: boolean value, True for compiling the greedy policy of a tabular player
+    @param learn: boolean value, True for letting a tabular player learn from the served games
+                  instead of keeping its Q-Values read-only
+    @return: the instance of the player
+    """
+    player = get_player_class(name)()
+    if load_model:
+        player.load_model(get_model_path(load_model, 1))
+    elif num_of_training_games:
+        play_training_games([player, get_player_class('Random')()], num_of_training_games,
+                            TicTacToeGame.ENGINE_BITBOARD, 0)
+    player.epsilon = 0.0
+    if hasattr(player, 'frozen'):
+        player.frozen = not learn
+    if freeze and hasattr(player, 'get_best_move'):
+        player = TicTacToeComputerFrozen.compile_player(player)
+    return player
+
+
+def serve(player, host, port, max_connections, idle_timeout, write_timeout, record=None,
+          sock=None, label=''):
+    """
+    Serve the games of the player until interrupted
+
+    @param player: the instance of the hosted player
+    @param host: the address of the server
+    @param port: the port of the server
+    @param max_connections: the maximum number of concurrent connections
+    @param idle_timeout: the seconds a connection may wait before its next command
+    @param write_timeout: the seconds a reply may wait for the client to read it
+    @param record: the path of the game log of the finished games, or None
+    @param sock: a listening socket to serve instead of the address, or None
+    @param label: the prefix of the printed statistics
+    """
+    recorder = TicTacToeRecorder(record) if record else None
+    server = TicTacToeServer(player, max_connections=max_connections, idle_timeout=idle_timeout,
+                             write_timeout=write_timeout, recorder=recorder)
+    try:
+        server.serve_forever(host, port, sock)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if recorder is not None:
+            recorder.close()
+        print("{}Games: {} - {}".format(label, server.num_of_games, ' - '.join(
+            '{}: {}'.format(result, count) for result, count in sorted(server.results.items()))))
+
+
+def main(name, num_of_training_games, host, port, max_connections, idle_timeout, write_timeout,
+         load_model=None, record=None, freeze=False, learn=False, num_of_workers=1):
+    player = create_player(name, num_of_training_games, load_model, freeze, learn)
+    print("Serving {} on {}:{}".format(name, host, port))
+    if num_of_workers <= 1:
+        serve(player, host, port, max_connections, idle_timeout, write_timeout, record)
+        return
+    # the workers are forked after loading the player, so they share its pages
+    # (copy-on-write pages that a frozen player never writes) and the listening socket
+    sock = socket.create_server((host, port), backlog=min(max_connections, 4096))
+    pids = []
+    for worker in range(num_of_workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve(player, host, port, max_connections, idle_timeout, write_timeout,
+                      record and '{}.{}'.format(record, worker), sock,
+                      'Worker {}: '.format(worker))
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    sock.close()
+    try:
+        for pid in pids:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGINT)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+
+
+if __name__ == '__main__':
+    # the plugins are imported first, so the players they register are valid choices
+    plugin_parser = argparse.ArgumentParser(add_help=False)
+    plugin_parser.add_argument('--plugin',
+                          action='append',
+                          dest='plugins',
+                          default=[],
+                          metavar='MODULE',
+                          help='Import a module that registers more players (can be repeated)',)
+    for plugin in plugin_parser.parse_known_args()[0].plugins:
+        importlib.import_module(plugin)
+
+    parser = argparse.ArgumentParser(description='Tic-Tac-Toe game server',
+                                     parents=[plugin_parser])
+    parser.add_argument('-a', '--player',
+                          dest='player',
+                          choices=get_player_names(),
+                          default='Q-Learning',
+                          help='Type of the hosted player',)
+    parser.add_argument('-n', '--number-of-training-games',
+                          type=int,
+                          dest='number_of_training_games',
+                          default=20000,
+                          help='Number of training games against the Random player, if no model is loaded',)
+    parser.add_argument('--load-model',
+                          dest='load_model',
+                          metavar='PREFIX',
+                          help='Load the model of the player from PREFIX-p1.model',)
+    parser.add_argument('--freeze',
+                          action='store_true',
+                          dest='freeze',
+                          help='Serve the compiled greedy policy of a tabular player, which does not learn from the games',)
+    parser.add_argument('--learn',
+                          action='store_true',
+                          dest='learn',
+                          help='Let a tabular player learn from the served games (one process only), instead of keeping its Q-Values read-only',)
+    parser.add_argument('-w', '--workers',
+                          type=int,
+                          dest='workers',
+                          default=1,
+                          help='Number of forked processes serving the connections',)
+    parser.add_argument('--host',
+                          dest='host',
+                          default='127.0.0.1',
+                          help='Address of the server',)
+    parser.add_argument('--port',
+                          type=int,
+                          dest='port',
+                          default=8765,
+                          help='Port of the server',)
+    parser.add_argument('--max-connections',
+                          type=int,
+                          dest='max_connections',
+                          default=10000,
+                          help='Maximum number of concurrent connections',)
+    parser.add_argument('--idle-timeout',
+                          type=float,
+                          dest='idle_timeout',
+                          default=60.0,
+                          help='Seconds a connection may stay idle before it is closed',)
+    parser.add_argument('--write-timeout',
+                          type=float,
+                          dest='write_timeout',
+                          default=10.0,
+                          help='Seconds a reply may wait for the client to read it before the connection is closed',)
+    parser.add_argument('--record',
+                          dest='record',
+                          metavar='PATH',
+                          help='Append the finished games to the game log at PATH (PATH.N per worker process)',)
+    args = parser.parse_args()
+    main(args.player, args.number_of_training_games, args.host, args.port,
+         args.max_connections, args.idle_timeout, args.write_timeout,
+         load_model=args.load_model, record=args.record, freeze=args.freeze,
+         learn=args.learn, num_of_workers=args.workers)
@@ -0,0 +1,339 @@
+"""
+Round-robin tournament of the Tic-Tac-Toe players, with Elo ratings
+"""
+from __future__ import print_function
+
+from datetime import datetime
+import argparse
+import ast
+import importlib
+import json
+import math
+import multiprocessing
+import random
+import re
+
+from games import TicTacToeGame
+from players import get_player_class, get_player_names, TicTacToeComputerRandom
+from run import train_shard
+
+ELO_SCALE = 400.
+ELO_ITERATIONS = 200
+
+
+def parse_entry(entry):
+    """
+    Parse a tournament entry: the name of a registered player, optionally followed by
+    the parameters of its constructor in brackets, e.g. 'MCTS[num_of_simulations=200]'
+
+    @param entry: the string with the entry
+    @return: a tuple with the name of the player and a dictionary with the parameters
+    """
+    match = re.match(r'^([^\[\]]+?)(?:\[(.*)\])?$', entry.strip())
+    if match is None:
+        raise ValueError("Invalid entry: {}".format(entry))
+    name, parameters = match.group(1), {}
+    for parameter in filter(None, (match.group(2) or '').split(',')):
+        key, value = parameter.split('=', 1)
+        try:
+            parameters[key.strip()] = ast.literal_eval(value.strip())
+        except (SyntaxError, ValueError):
+            parameters[key.strip()] = value.strip()
+    return name, parameters
+
+
+def get_entry_model_path(prefix, entry):
+    """
+    Get the path of the model file of a tournament entry
+
+    @param prefix: the prefix of the model files
+    @param entry: the string with the entry
+    @return: the path of the model file
+    """
+    return '{}-{}.model'.format(prefix, re.sub(r'[^\w.-]+', '_', entry).strip('_'))
+
+
+def get_default_entries(load_model=None):
+    """
+    Get the entries of a tournament between all the registered players
+    that can be played in this environment
+
+    @param load_model: the prefix of the model files to load, or None
+    @return: a list with the strings of the entries
+    """
+    entries = []
+    for name in get_player_names():
+        try:
+            player_class = get_player_class(name)
+        except ImportError as e:
+            print("Skipping {} ({})".format(name, e))
+            continue
+        if getattr(player_class, 'MODEL_ONLY', False) and not load_model:
+            continue
+        entries.append(name)
+    return entries
+
+
+def create_player(entry):
+    """
+    Create the player of a tournament entry
+
+    @param entry: the string with the entry
+    @return: the instance of the player
+    """
+    name, parameters = parse_entry(entry)
+    return get_player_class(name)(**parameters)
+
+
+def play_match(match):
+    """
+    Play the games of a pairing with fixed seats, in a worker process
+
+    @param match: a tuple with the instances of the first and the second player,
+                  the number of games, the random seed and the engine
+    @return: a tuple with the wins of the first player, the draws
+             and the wins of the second player
+    """
+    import numpy as np
+
+    p1, p2, num_of_games, seed, engine = match
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    results = [0, 0, 0]
+    for _ in range(num_of_games):
+        res = TicTacToeGame(p1, p2, be_verbose=False, engine=engine).play()
+        results[1 if res is None else 2 * res] += 1
+    return tuple(results)
+
+
+def fit_elo_ratings(num_of_entries, pairing_results):
+    """
+    Fit the Elo ratings of the entries to the results of their games
+    (Bradley-Terry model, fitted with the minorization-maximization algorithm).
+    A draw counts as half a win for each player, and every pairing gets one
+    more virtual draw, so the ratings stay finite when an entry wins or loses all its games.
+
+    @param num_of_entries: the number of entries
+    @param pairing_results: a dictionary that maps a pair of entry indexes (i, j), i < j,
+                            to the wins of i, the draws and the wins of j
+    @return: a list with the rating of every entry, with a mean of zero
+    """
+    scores = [0.] * num_of_entries
+    num_of_games = {}
+    for (i, j), (wins, draws, losses) in pairing_results.items():
+        scores[i] += wins + 0.5 * draws + 0.5
+        scores[j] += losses + 0.5 * draws + 0.5
+        num_of_games[(i, j)] = wins + draws + losses + 1
+    strengths = [1.] * num_of_entries
+    for _ in range(ELO_ITERATIONS):
+        denominators = [0.] * num_of_entries
+        for (i, j), n in num_of_games.items():
+            denominator = n / (strengths[i] + strengths[j])
+            denominators[i] += denominator
+            denominators[j] += denominator
+        strengths = [scores[x] / denominators[x] if denominators[x] else strengths[x]
+                     for x in range(num_of_entries)]
+        log_mean = sum(math.log(x) for x in strengths) / num_of_entries
+        strengths = [x / math.exp(log_mean) for x in strengths]
+    return [ELO_SCALE * math.log10(x) for x in strengths]
+
+
+def bootstrap_elo_ratings(num_of_entries, pairing_results, num_of_samples, confidence=0.95):
+    """
+    Get the confidence intervals of the Elo ratings by resampling the games of every pairing
+
+    @param num_of_entries: the number of entries
+    @param pairing_results: a dictionary with the results of every pairing, as in fit_elo_ratings
+    @param num_of_samples: the number of bootstrap samples
+    @param confidence: the confidence level of the intervals
+    @return: a list with a tuple (lower bound, upper bound) per entry
+    """
+    samples = [[] for _ in range(num_of_entries)]
+    for _ in range(num_of_samples):
+        resampled_results = {}
+        for pairing, results in pairing_results.items():
+            outcomes = random.choices(range(3), weights=results, k=sum(results)) \
+                       if sum(results) else []
+            resampled_results[pairing] = tuple(outcomes.count(x) for x in range(3))
+        for x, rating in enumerate(fit_elo_ratings(num_of_entries, resampled_results)):
+            samples[x].append(rating)
+    lower_rank = int((1. - confidence) / 2. * (num_of_samples - 1))
+    upper_rank = num_of_samples - 1 - lower_rank
+    return [(sorted(x)[lower_rank], sorted(x)[upper_rank]) for x in samples]
+
+
+def prepare_players(entries, num_of_training_games, pool, load_model=None, save_model=None):
+    """
+    Create the players of the entries and load or train the learning ones.
+    Every learning player is trained against the random player in a worker process.
+
+    @param entries: a list with the strings of the entries
+    @param num_of_training_games: the number of training games per learning player
+    @param pool: the pool of worker processes
+    @param load_model: the prefix of the model files to load, or None
+    @param save_model: the prefix of the model files to save, or None
+    @return: a list with the instances of the players
+    """
+    players = [create_player(x) for x in entries]
+    if load_model:
+        for entry, player in zip(entries, players):
+            if hasattr(player, 'load_model'):
+                player.load_model(get_entry_model_path(load_model, entry))
+
+    learning_players = [x for x, player in enumerate(players)
+                        if getattr(player, 'epsilon', 0) > 0 and num_of_training_games]
+    shards = [([players[x], TicTacToeComputerRandom()], num_of_training_games,
+               random.getrandbits(64), TicTacToeGame.ENGINE_BITBOARD, 0)
+              for x in learning_players]
+    for x, trained_players in zip(learning_players, pool.map(train_shard, shards)):
+        players[x] = trained_players[0]
+
+    if save_model:
+        for entry, player in zip(entries, players):
+            if hasattr(player, 'save_model'):
+                player.save_model(get_entry_model_path(save_model, entry))
+    for player in players:
+        player.epsilon = 0.0
+    return players
+
+
+def print_report(entries, pairing_results, ratings, intervals):
+    """
+    Print the win/draw/loss matrix and the Elo ratings
+
+    @param entries: a list with the strings of the entries
+    @param pairing_results: a dictionary with the results of every pairing, as in fit_elo_ratings
+    @param ratings: a list with the Elo rating of every entry
+    @param intervals: a list with the confidence interval of every rating
+    """
+    rows = []
+    for i in range(len(entries)):
+        cells = []
+        for j in range(len(entries)):
+            if i == j:
+                cells.append('-')
+            elif i < j:
+                cells.append('{}-{}-{}'.format(*pairing_results[(i, j)]))
+            else:
+                cells.append('{2}-{1}-{0}'.format(*pairing_results[(j, i)]))
+        rows.append(cells)
+    width = max(len(x) for x in entries) + 4
+    cell_width = max(len(x) for cells in rows for x in cells) + 2
+    print("W-D-L of the row entry against the column entry (both seat orders)")
+    print(' ' * width + ''.join('{:>{}}'.format(x, cell_width) for x in range(len(entries))))
+    for i, cells in enumerate(rows):
+        print('{:<{}}'.format('{} {}'.format(i, entries[i]), width)
+              + ''.join('{:>{}}'.format(x, cell_width) for x in cells))
+    print()
+    print("{:<{}} {:>8} {:>20}".format('Entry', width, 'Elo', '95% CI'))
+    for x in sorted(range(len(entries)), key=lambda x: -ratings[x]):
+        print("{:<{}} {:>8.1f} {:>20}".format(entries[x], width, ratings[x],
+                                              '[{:.1f}, {:.1f}]'.format(*intervals[x])))
+
+
+def main(entries, num_of_games, num_of_training_games, num_of_workers=0,
+         engine=TicTacToeGame.ENGINE_BITBOARD, num_of_samples=200, load_model=None,
+         save_model=None, output=None):
+    start_time = datetime.now()
+    pool = multiprocessing.Pool(num_of_workers or None)
+    players = prepare_players(entries, num_of_training_games, pool, load_model, save_model)
+
+    # every pairing is played with both seat orders
+    pairings = [(i, j) for i in range(len(players)) for j in range(len(players)) if i != j]
+    matches = [(players[i], players[j], num_of_games, random.getrandbits(64), engine)
+               for i, j in pairings]
+    pairing_results = {}
+    for (i, j), (wins, draws, losses) in zip(pairings, pool.map(play_match, matches)):
+        if i > j:
+            i, j, wins, losses = j, i, losses, wins
+        previous_results = pairing_results.get((i, j), (0, 0, 0))
+        pairing_results[(i, j)] = (previous_results[0] + wins, previous_results[1] + draws,
+                                   previous_results[2] + losses)
+    pool.close()
+    pool.join()
+    for player in players:
+        if hasattr(player, 'close'):
+            player.close()
+
+    ratings = fit_elo_ratings(len(entries), pairing_results)
+    intervals = bootstrap_elo_ratings(len(entries), pairing_results, num_of_samples)
+    print_report(entries, pairing_results, ratings, intervals)
+    print("Elapsed time: {}".format(datetime.now() - start_time))
+
+    if output:
+        report = {'entries': entries,
+                  'results': [{'entry': entries[i], 'opponent': entries[j], 'wins': wins,
+                               'draws': draws, 'losses': losses}
+                              for (i, j), (wins, draws, losses) in sorted(pairing_results.items())],
+                  'elo': [{'entry': entry, 'rating': rating, 'ci': interval}
+                          for entry, rating, interval in zip(entries, ratings, intervals)]}
+        with open(output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    # the plugins are imported first, so the players they register are valid entries
+    plugin_parser = argparse.ArgumentParser(add_help=False)
+    plugin_parser.add_argument('--plugin',
+                          action='append',
+                          dest='plugins',
+                          default=[],
+                          metavar='MODULE',
+                          help='Import a module that registers more players (can be repeated)',)
+    for plugin in plugin_parser.parse_known_args()[0].plugins:
+        importlib.import_module(plugin)
+
+    parser = argparse.ArgumentParser(description='Round-robin tournament of the Tic-Tac-Toe players',
+                                     parents=[plugin_parser])
+    parser.add_argument('entries',
+                          nargs='*',
+                          metavar='ENTRY',
+                          help='A registered player, optionally with the parameters of its constructor, '
+                               'e.g. "MCTS[num_of_simulations=200]" (default: all the registered players)',)
+    parser.add_argument('-g', '--games',
+                          type=int,
+                          dest='games',
+                          default=100,
+                          help='Number of games per pairing and seat order',)
+    parser.add_argument('-n', '--number-of-training-games',
+                          type=int,
+                          dest='number_of_training_games',
+                          default=5000,
+                          help='Number of training games of every learning player against the random player',)
+    parser.add_argument('-w', '--workers',
+                          type=int,
+                          dest='workers',
+                          default=0,
+                          help='Number of worker processes (default: the number of CPUs)',)
+    parser.add_argument('-e', '--engine',
+                          dest='engine',
+                          choices=(TicTacToeGame.ENGINE_LIST, TicTacToeGame.ENGINE_BITBOARD),
+                          default=TicTacToeGame.ENGINE_BITBOARD,
+                          help='Game engine used for checking the winning lines',)
+    parser.add_argument('--bootstrap-samples',
+                          type=int,
+                          dest='bootstrap_samples',
+                          default=200,
+                          help='Number of bootstrap samples of the Elo confidence intervals',)
+    parser.add_argument('--load-model',
+                          dest='load_model',
+                          metavar='PREFIX',
+                          help='Load the models of the entries from PREFIX-<entry>.model instead of training them',)
+    parser.add_argument('--save-model',
+                          dest='save_model',
+                          metavar='PREFIX',
+                          help='Save the models of the entries after training to PREFIX-<entry>.model',)
+    parser.add_argument('-o', '--output',
+                          dest='output',
+                          metavar='PATH',
+                          help='Write the results and the ratings as JSON to PATH',)
+    args = parser.parse_args()
+    main(args.entries or get_default_entries(args.load_model),
+         args.games,
+         0 if args.load_model else args.number_of_training_games,
+         num_of_workers=args.workers,
+         engine=args.engine,
+         num_of_samples=args.bootstrap_samples,
+         load_model=args.load_model,
+         save_model=args.save_model,
+         output=args.output)